@@ -0,0 +1,15 @@
+"""
+Benchmarks for redset.
+
+Measures the throughput and latency of set operations from one or more
+processes, against a redis-server spawned for the run (or the in-memory
+backend), and writes the results as JSON so that releases and
+configurations can be compared.
+
+Usage::
+
+    python -m benchmarks --processes 1,2,4 --output results.json
+    python -m benchmarks --cases scheduled_take --lock token
+    python -m benchmarks --help
+
+"""
@@ -0,0 +1,225 @@
+"""
+The operations benchmarked, and the configurations they're run under.
+
+"""
+
+import abc
+import collections
+import random
+import string
+import time
+
+from redset import SortedSet, ScheduledSet
+from redset.locks import Lock, TokenLock
+from redset.serializers import (
+    CompressingSerializer,
+    PositionalSerializer,
+    StructSerializer,
+)
+
+
+SET_NAME = 'redset_benchmark'
+
+SERIALIZERS = ('str', 'positional', 'struct', 'compressed')
+
+LOCKS = {
+    'none': None,
+    'lock': Lock,
+    'token': TokenLock,
+}
+
+
+# Everything a worker process needs to build its set. Must stay picklable.
+Config = collections.namedtuple('Config', [
+    'backend',
+    'port',
+    'serializer',
+    'payload_size',
+    'chunk_size',
+    'lock',
+    'offload',
+])
+
+
+class Case(object):
+    """
+    A benchmarked operation. Each timed op handles ``batch`` items.
+
+    """
+    __metaclass__ = abc.ABCMeta
+
+    set_class = SortedSet
+    name = None
+
+    def __init__(self, batch=1):
+        self.batch = batch
+
+    def __repr__(self):
+        return "<%s %s>" % (self.__class__.__name__, self.label)
+
+    @property
+    def label(self):
+        if self.batch == 1:
+            return self.name
+
+        return '%s(%d)' % (self.name, self.batch)
+
+    def prefill_count(self, total_ops):
+        """How many items must be in the set before the run starts."""
+        return 0
+
+    def prefill_scores(self, num):
+        # scores of 0 would be replaced by the set's scorer
+        return range(1, num + 1)
+
+    @abc.abstractmethod
+    def run_op(self, ss, config, index):
+        """
+        Perform the ``index``th op of the run.
+
+        :returns: int -- the number of items handled.
+
+        """
+
+
+class AddCase(Case):
+    name = 'add'
+
+    def run_op(self, ss, config, index):
+        ss.add(make_item(config, index), index + 1)
+        return 1
+
+
+class AddManyCase(Case):
+    name = 'add_many'
+
+    def run_op(self, ss, config, index):
+        start = index * self.batch
+        indexes = range(start, start + self.batch)
+        items = [make_item(config, i) for i in indexes]
+
+        ss.add_many(
+            items,
+            range(start + 1, start + self.batch + 1),
+            chunk_size=config.chunk_size,
+        )
+        return self.batch
+
+
+class TakeCase(Case):
+    name = 'take'
+
+    def prefill_count(self, total_ops):
+        return total_ops * self.batch
+
+    def run_op(self, ss, config, index):
+        with locked(ss, config):
+            return len(ss.take(self.batch))
+
+
+class PopCase(Case):
+    name = 'pop'
+
+    def prefill_count(self, total_ops):
+        return total_ops
+
+    def run_op(self, ss, config, index):
+        with locked(ss, config):
+            ss.pop()
+
+        return 1
+
+
+class PeekCase(Case):
+    name = 'peek'
+
+    def prefill_count(self, total_ops):
+        return min(total_ops, 1000)
+
+    def run_op(self, ss, config, index):
+        ss.peek()
+        return 1
+
+
+class ScheduledTakeCase(TakeCase):
+    set_class = ScheduledSet
+    name = 'scheduled_take'
+
+    def prefill_scores(self, num):
+        # all due, in order
+        now = time.time()
+        return [now - num + i for i in range(num)]
+
+
+CASES = collections.OrderedDict(
+    (case.name, case) for case in
+    (AddCase, AddManyCase, TakeCase, PopCase, PeekCase, ScheduledTakeCase)
+)
+
+# cases that are run once per batch size
+BATCHED_CASES = ('add_many', 'take', 'scheduled_take')
+
+
+def make_set(case, config, client):
+    return case.set_class(
+        client,
+        SET_NAME,
+        serializer=make_serializer(config),
+        lock_class=LOCKS[config.lock],
+        offload=config.offload,
+    )
+
+
+def make_serializer(config):
+    if config.serializer == 'str':
+        return None
+    if config.serializer == 'positional':
+        return PositionalSerializer()
+    if config.serializer == 'struct':
+        return StructSerializer('q%ds' % config.payload_size)
+    if config.serializer == 'compressed':
+        return CompressingSerializer(PositionalSerializer(), threshold=256)
+
+    raise ValueError('Unknown serializer %s' % config.serializer)
+
+
+def make_item(config, index):
+    payload = _payload(config.payload_size)
+
+    if config.serializer == 'str':
+        return '%d:%s' % (index, payload)
+    if config.serializer == 'struct':
+        return (index, payload.encode('ascii'))
+
+    return (index, payload)
+
+
+def locked(ss, config):
+    """
+    The set's lock if ops are to be wrapped in it, to measure what a
+    caller's own locking adds; set operations never take it themselves.
+
+    """
+    return ss.lock if LOCKS[config.lock] else _NoLock()
+
+
+class _NoLock(object):
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+_payloads = {}
+
+
+def _payload(size):
+    """Some text of ``size`` chars, the same for every item of a run."""
+    if size not in _payloads:
+        rand = random.Random(size)
+        _payloads[size] = ''.join(
+            rand.choice(string.ascii_letters) for __ in range(size))
+
+    return _payloads[size]
@@ -0,0 +1,365 @@
+"""
+Run benchmark cases from several processes and collect their results.
+
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import math
+import multiprocessing
+import platform
+import sys
+import time
+
+import redis
+
+import redset
+from benchmarks import cases
+from benchmarks.server import RedisServer
+from redset.memory import MemoryRedis
+from redset.metrics import _clock
+
+
+# how long workers are given to start before the run begins
+START_TIMEOUT = 30
+
+# the memory backend's client, shared by the single worker and the runner
+_memory_client = None
+
+
+def run(case_names=None,
+        processes=(1,),
+        ops=1000,
+        batch_sizes=(1, 10, 100),
+        chunk_size=redset.sets.DEFAULT_CHUNK_SIZE,
+        serializer='str',
+        payload_size=64,
+        lock='none',
+        offload=False,
+        backend='redis',
+        redis_server='redis-server',
+        ):
+    """
+    Run each case from each number of processes.
+
+    :param case_names: which of `cases.CASES` to run. Defaults to all.
+    :param processes: the numbers of concurrent processes to run each case
+        from.
+    :param ops: how many ops each process performs per case.
+    :param batch_sizes: the batch sizes to run batched cases with.
+    :param chunk_size: ``chunk_size`` for :func:`SortedSet.add_many`.
+    :param serializer: one of `cases.SERIALIZERS`.
+    :param payload_size: the size of each item's payload in chars.
+    :param lock: one of `cases.LOCKS`. Unless 'none', takes and pops are
+        wrapped in the set's lock of that kind, which the operations
+        themselves never take, to measure the cost of a caller's locking.
+    :param offload: use the sets' ``offload`` storage.
+    :param backend: 'redis' to spawn a redis-server, or 'memory' for
+        `redset.memory.MemoryRedis`, which only runs in one process.
+    :param redis_server: the redis-server binary to spawn.
+
+    :returns: dict -- 'meta' describing the run and 'results', a list with a
+        dict per case and number of processes.
+
+    """
+    case_names = list(case_names or cases.CASES)
+    processes = list(processes)
+
+    if backend == 'memory' and processes != [1]:
+        raise ValueError('The memory backend only runs in one process')
+
+    if serializer not in cases.SERIALIZERS:
+        raise ValueError('Unknown serializer %s' % serializer)
+
+    if lock not in cases.LOCKS:
+        raise ValueError('Unknown lock %s' % lock)
+
+    bench_cases = []
+
+    for name in case_names:
+        if name in cases.BATCHED_CASES:
+            bench_cases.extend(
+                cases.CASES[name](batch) for batch in batch_sizes)
+        else:
+            bench_cases.append(cases.CASES[name]())
+
+    def run_all(port=None):
+        config = cases.Config(
+            backend=backend,
+            port=port,
+            serializer=serializer,
+            payload_size=payload_size,
+            chunk_size=chunk_size,
+            lock=lock,
+            offload=offload,
+        )
+        client = _client(config)
+        meta = {
+            'redset_version': redset.__version__,
+            'python_version': platform.python_version(),
+            'redis_version': client.info('server')['redis_version'],
+            'started': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'config': dict(config._asdict(), ops=ops),
+        }
+        results = [
+            run_case(case, config, num_procs, ops)
+            for case in bench_cases
+            for num_procs in processes
+        ]
+
+        return {'meta': meta, 'results': results}
+
+    if backend == 'memory':
+        return run_all()
+
+    with RedisServer(redis_server) as server:
+        return run_all(server.port)
+
+
+def run_case(case, config, num_procs, ops):
+    """
+    Run ``ops`` ops of ``case`` from each of ``num_procs`` processes, on a
+    freshly filled set.
+
+    :returns: dict
+
+    """
+    ss = cases.make_set(case, config, _client(config))
+    ss.clear()
+
+    prefill = case.prefill_count(ops * num_procs)
+
+    if prefill:
+        ss.add_many(
+            [cases.make_item(config, i) for i in range(prefill)],
+            case.prefill_scores(prefill),
+            chunk_size=config.chunk_size,
+        )
+
+    try:
+        if config.backend == 'memory':
+            worker_results = [_run_ops(case, config, 0, ops)]
+        else:
+            worker_results = _run_processes(case, config, num_procs, ops)
+    finally:
+        ss.clear()
+
+    return summarize(case, num_procs, ops, worker_results)
+
+
+def summarize(case, num_procs, ops, worker_results):
+    """
+    Combine the results of a case's workers.
+
+    :param worker_results: (started, finished, latencies, items, errors)
+        from each worker.
+    :returns: dict
+
+    """
+    started = min(res[0] for res in worker_results)
+    finished = max(res[1] for res in worker_results)
+    latencies = sorted(
+        latency for res in worker_results for latency in res[2])
+    items = sum(res[3] for res in worker_results)
+    errors = sum(res[4] for res in worker_results)
+    seconds = max(finished - started, 1e-9)
+
+    return {
+        'case': case.name,
+        'batch': case.batch,
+        'processes': num_procs,
+        'ops': len(latencies),
+        'items': items,
+        'errors': errors,
+        'seconds': seconds,
+        'ops_per_sec': len(latencies) / seconds,
+        'items_per_sec': items / seconds,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': latencies[-1] * 1000 if latencies else 0,
+    }
+
+
+def percentile(sorted_values, pct):
+    """The nearest-rank percentile of a sorted list."""
+    if not sorted_values:
+        return 0
+
+    rank = int(math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[max(rank, 1) - 1]
+
+
+def _run_processes(case, config, num_procs, ops):
+    ready = multiprocessing.Queue()
+    start = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(
+            target=_worker,
+            args=(case, config, i, ops, ready, start, results),
+        )
+        for i in range(num_procs)
+    ]
+
+    for worker in workers:
+        worker.start()
+
+    # workers connect, then wait so that they all begin together
+    for __ in workers:
+        ready.get(timeout=START_TIMEOUT)
+
+    start.set()
+    worker_results = [results.get() for __ in workers]
+
+    for worker in workers:
+        worker.join()
+
+    return worker_results
+
+
+def _worker(case, config, worker_num, ops, ready, start, results):
+    _client(config).ping()
+    ready.put(worker_num)
+    start.wait(START_TIMEOUT)
+    results.put(_run_ops(case, config, worker_num, ops))
+
+
+def _run_ops(case, config, worker_num, ops):
+    """
+    :returns: (started, finished, latencies, items, errors)
+
+    """
+    ss = cases.make_set(case, config, _client(config))
+    latencies = []
+    items = 0
+    errors = 0
+
+    started = time.time()
+
+    for index in range(worker_num * ops, (worker_num + 1) * ops):
+        op_started = _clock()
+
+        try:
+            items += case.run_op(ss, config, index)
+        except Exception:
+            errors += 1
+
+        latencies.append(_clock() - op_started)
+
+    return (started, time.time(), latencies, items, errors)
+
+
+def _client(config):
+    global _memory_client
+
+    if config.backend != 'memory':
+        return redis.Redis(port=config.port)
+
+    if _memory_client is None:
+        _memory_client = MemoryRedis()
+
+    return _memory_client
+
+
+def format_results(report):
+    lines = ['%-20s %5s %9s %12s %12s %9s %9s %6s' % (
+        'case', 'procs', 'ops', 'ops/s', 'items/s', 'p50 ms', 'p99 ms',
+        'errors')]
+
+    for res in report['results']:
+        label = res['case'] if res['batch'] == 1 else \
+            '%s(%d)' % (res['case'], res['batch'])
+        lines.append('%-20s %5d %9d %12.0f %12.0f %9.3f %9.3f %6d' % (
+            label, res['processes'], res['ops'], res['ops_per_sec'],
+            res['items_per_sec'], res['p50_ms'], res['p99_ms'],
+            res['errors']))
+
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Benchmark redset against a spawned redis-server.')
+    parser.add_argument(
+        '--cases', type=_names(cases.CASES), default=list(cases.CASES),
+        help='comma-separated cases to run, from: %s. Default: all' %
+        ', '.join(cases.CASES))
+    parser.add_argument(
+        '--processes', type=_ints, default=[1],
+        help='comma-separated numbers of processes, e.g. 1,2,4. Default: 1')
+    parser.add_argument(
+        '--ops', type=int, default=1000,
+        help='ops per process per case. Default: 1000')
+    parser.add_argument(
+        '--batch-sizes', type=_ints, default=[1, 10, 100],
+        help='batch sizes for add_many and takes. Default: 1,10,100')
+    parser.add_argument(
+        '--chunk-size', type=int, default=redset.sets.DEFAULT_CHUNK_SIZE,
+        help='members per ZADD in add_many. Default: %(default)s')
+    parser.add_argument(
+        '--serializer', choices=cases.SERIALIZERS, default='str')
+    parser.add_argument(
+        '--payload-size', type=int, default=64,
+        help='chars of payload per item. Default: %(default)s')
+    parser.add_argument(
+        '--lock', choices=sorted(cases.LOCKS), default='none',
+        help='wrap each take and pop in the set\'s lock of this kind, to '
+        'measure what a caller\'s own locking costs; the operations '
+        'themselves never take it')
+    parser.add_argument(
+        '--offload', action='store_true',
+        help='store items with the sets\' offload option')
+    parser.add_argument(
+        '--backend', choices=('redis', 'memory'), default='redis')
+    parser.add_argument(
+        '--redis-server', default='redis-server',
+        help='the redis-server binary to spawn. Default: %(default)s')
+    parser.add_argument(
+        '--output', default=None,
+        help='write JSON results to this file rather than stdout')
+
+    args = parser.parse_args(argv)
+
+    report = run(
+        case_names=args.cases,
+        processes=args.processes,
+        ops=args.ops,
+        batch_sizes=args.batch_sizes,
+        chunk_size=args.chunk_size,
+        serializer=args.serializer,
+        payload_size=args.payload_size,
+        lock=args.lock,
+        offload=args.offload,
+        backend=args.backend,
+        redis_server=args.redis_server,
+    )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+        print(format_results(report))
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+
+def _ints(value):
+    return [int(part) for part in value.split(',')]
+
+
+def _names(choices):
+    def parse(value):
+        names = value.split(',')
+        unknown = [name for name in names if name not in choices]
+
+        if unknown:
+            raise argparse.ArgumentTypeError(
+                'Unknown cases: %s' % ', '.join(unknown))
+
+        return names
+
+    return parse
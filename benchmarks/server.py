@@ -0,0 +1,97 @@
+"""
+A throwaway redis-server for a benchmark run.
+
+"""
+
+import os
+import socket
+import subprocess
+import time
+
+import redis
+
+
+class RedisServer(object):
+    """
+    Context manager that runs a redis-server, without persistence, on a
+    free local port for the duration of the block.
+
+    Usage::
+
+        with RedisServer() as server:
+            client = redis.Redis(port=server.port)
+
+    """
+    def __init__(self, executable='redis-server', port=None, timeout=10):
+        """
+        :param executable: the redis-server binary to run.
+        :type executable: str
+        :param port: the port to listen on. Defaults to a free port.
+        :type port: int
+        :param timeout: how long to wait in seconds for the server to
+            accept connections.
+        :type timeout: Number
+
+        """
+        self.executable = executable
+        self.port = port
+        self.timeout = timeout
+        self._process = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        if self.port is None:
+            self.port = _free_port()
+
+        with open(os.devnull, 'w') as devnull:
+            self._process = subprocess.Popen(
+                [self.executable,
+                 '--port', str(self.port),
+                 '--save', '',
+                 '--appendonly', 'no'],
+                stdout=devnull,
+                stderr=subprocess.STDOUT,
+            )
+
+        client = redis.Redis(port=self.port)
+        deadline = time.time() + self.timeout
+
+        while True:
+            try:
+                client.ping()
+                return
+            except redis.ConnectionError:
+                if self._process.poll() is not None or \
+                        time.time() > deadline:
+                    self.stop()
+                    raise RuntimeError(
+                        "Couldn't start %s on port %s" %
+                        (self.executable, self.port))
+
+                time.sleep(0.05)
+
+    def stop(self):
+        if self._process is None:
+            return
+
+        if self._process.poll() is None:
+            self._process.terminate()
+            self._process.wait()
+
+        self._process = None
+
+
+def _free_port():
+    sock = socket.socket()
+
+    try:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+    finally:
+        sock.close()
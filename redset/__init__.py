@@ -10,3 +10,4 @@ Simple redis-backed, distributed sorted sets.
 __version__ = '0.5.1'
 
 from redset.sets import *
+from redset.sharded import *
@@ -0,0 +1,533 @@
+"""
+asyncio counterparts to the sets in `redset.sets` and the lock in
+`redset.locks`, for use with a `redis.asyncio.Redis` client.
+
+Python 3 only.
+
+"""
+
+import asyncio
+import math
+import time
+
+from redset import scripts
+from redset.exceptions import LockTimeout
+from redset.locks import REDIS_TIME_PRECISION
+from redset.sets import (
+    DEFAULT_CHUNK_SIZE,
+    FLOAT_TIMEOUT_VERSION,
+    MIN_BLOCK_TIMEOUT,
+    ZPOPMIN_VERSION,
+    SortedSet,
+    _DefaultSerializer,
+    _aligned_scores,
+    _default_scorer,
+    _hash_tagged,
+    _parse_version,
+    _py3_compat_decode,
+)
+
+import logging
+log = logging.getLogger(__name__)
+
+
+__all__ = (
+    'AsyncLock',
+    'AsyncSortedSet',
+    'AsyncTimeSortedSet',
+    'AsyncScheduledSet',
+    'pop_any',
+)
+
+
+class AsyncLock(object):
+    """
+    Async context manager that implements a distributed lock with redis.
+
+    See :class:`locks.Lock <locks.Lock>`; waiting on the lock yields to the
+    event loop instead of sleeping.
+
+    """
+    def __init__(self,
+                 redis,
+                 key,
+                 expires=None,
+                 timeout=None,
+                 poll_interval=None,
+                 ):
+        """
+        Usage::
+
+            async with AsyncLock(redis, 'my_lock'):
+                print("Critical section")
+
+        See :class:`locks.Lock <locks.Lock>` for the parameters.
+
+        """
+        self.redis = redis
+        self.key = key
+        self.timeout = timeout or 10
+        self.expires = expires or 20
+        self.poll_interval = poll_interval or 0.2
+
+    async def __aenter__(self):
+        timeout = self.timeout
+
+        while timeout >= 0:
+            expires = time.time() + self.expires
+
+            if await self.redis.setnx(self.key, expires):
+                # We gained the lock; enter critical section
+                return
+
+            current_value = await self.redis.get(self.key)
+
+            # We found an expired lock and nobody raced us to replacing it
+            has_expired = (
+                current_value and
+                (float(current_value) + REDIS_TIME_PRECISION) < time.time() and
+                await self.redis.getset(self.key, expires) == current_value
+            )
+            if has_expired:
+                return
+
+            timeout -= self.poll_interval
+            await asyncio.sleep(self.poll_interval)
+
+        raise LockTimeout("Timeout while waiting for lock '%s'" % self.key)
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.redis.delete(self.key)
+
+
+class AsyncSortedSet(object):
+    """
+    An asyncio counterpart to :class:`SortedSet <redset.SortedSet>`.
+
+    Every method that talks to redis is a coroutine. Since ``len()`` and
+    ``in`` can't be awaited, use :func:`size` and :func:`contains` instead.
+
+    """
+    def __init__(self,
+                 redis_client,
+                 name,
+                 scorer=None,
+                 serializer=None,
+                 lock_timeout=None,
+                 lock_expires=None,
+                 hash_tag=False,
+                 ):
+        """
+        See :class:`SortedSet <redset.SortedSet>`.
+
+        :param redis_client: Used to communicate with a Redis server.
+        :type redis_client: redis.asyncio.Redis instance
+
+        """
+        self._name = _hash_tagged(name) if hash_tag else name
+        self.redis = redis_client
+        self.scorer = scorer or _default_scorer
+        self.serializer = serializer or _DefaultSerializer()
+        self.lock = AsyncLock(
+            self.redis,
+            '%s__lock' % self.name,
+            expires=lock_expires,
+            timeout=lock_timeout)
+        self._redis_version = None
+
+    def __repr__(self):
+        return "<%s name='%s'>" % (self.__class__.__name__, self.name)
+
+    __str__ = __repr__
+
+    @property
+    def name(self):
+        """
+        The name of this set and the string that identifies the redis key
+        where this set is stored.
+
+        :returns: str
+
+        """
+        return self._name
+
+    async def size(self):
+        """
+        How many values are the in the set?
+
+        :returns: int
+
+        """
+        return int(await self.redis.zcard(self.name))
+
+    async def contains(self, item):
+        return (await self.score(item) is not None)
+
+    async def add(self, item, score=None):
+        """
+        See :func:`SortedSet.add <redset.SortedSet.add>`.
+
+        """
+        score = score or self.scorer(item)
+
+        log.debug(
+            'Adding %s to set %s with score: %s' % (item, self.name, score)
+        )
+        await self._add_strs([self._dump_item(item)], [score])
+
+        return score
+
+    async def add_many(self, items, scores=None,
+                       chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        See :func:`SortedSet.add_many <redset.SortedSet.add_many>`.
+
+        """
+        items = list(items)
+
+        scores = _aligned_scores(items, scores)
+
+        scores = [
+            score or self.scorer(item) for item, score in zip(items, scores)
+        ]
+
+        if not items:
+            return scores
+
+        item_strs = self._dump_items(items)
+
+        log.debug(
+            'Adding %d items to set %s' % (len(item_strs), self.name)
+        )
+        await self._add_strs(item_strs, scores, chunk_size)
+
+        return scores
+
+    async def pop(self, block=False, timeout=None):
+        """
+        See :func:`SortedSet.pop <redset.SortedSet.pop>`.
+
+        """
+        if block:
+            item_str = await self._blocking_get_and_remove_item(timeout)
+            item_strs = [] if item_str is None else [item_str]
+        else:
+            item_strs = await self._get_and_remove_items(1)
+
+        res_list = self._load_items(item_strs)
+        item = res_list[0] if res_list else None
+
+        if not item:
+            raise KeyError('%s is empty' % self)
+
+        return item
+
+    async def take(self, num, block=False, timeout=None):
+        """
+        See :func:`SortedSet.take <redset.SortedSet.take>`.
+
+        """
+        num = int(num)
+
+        if num < 1:
+            return []
+
+        item_strs = await self._get_and_remove_items(num)
+
+        if block and not item_strs:
+            item_str = await self._blocking_get_and_remove_item(timeout)
+
+            if item_str is None:
+                return []
+
+            item_strs = [item_str]
+
+            if num > 1:
+                item_strs.extend(await self._get_and_remove_items(num - 1))
+
+        return self._load_items(item_strs)
+
+    async def clear(self):
+        """
+        Empty the set of all scores and ID strings.
+
+        :returns: bool
+
+        """
+        log.debug('Flushing set %s' % self.name)
+        return await self.redis.delete(self.name)
+
+    async def discard(self, item):
+        """
+        Remove a given item from the set.
+
+        :returns: bool -- success of removal
+
+        """
+        return await self._discard_by_str(self._dump_item(item))
+
+    async def peek(self, position=0):
+        """
+        See :func:`SortedSet.peek <redset.SortedSet.peek>`.
+
+        """
+        results = await self._get_item(position)
+
+        if not results:
+            raise KeyError("%s is empty" % self.name)
+
+        return self._load_item(results[0])
+
+    async def score(self, item):
+        """
+        See what the score for an item is.
+
+        :returns: Number or None.
+
+        """
+        return await self.redis.zscore(self.name, self._dump_item(item))
+
+    async def peek_score(self):
+        """
+        What is the score of the next item to be processed?
+
+        :returns: Number
+
+        """
+        res = await self._get_item(0, with_score=True)
+
+        return res[0][1] if res else None
+
+    async def _add_strs(self, item_strs, scores,
+                        chunk_size=DEFAULT_CHUNK_SIZE):
+        chunk_size = max(int(chunk_size), 1)
+        pipe = self.redis.pipeline(transaction=False)
+
+        for start in range(0, len(item_strs), chunk_size):
+            pipe.zadd(self.name, dict(zip(
+                item_strs[start:start + chunk_size],
+                scores[start:start + chunk_size])))
+
+        self._after_add(pipe, scores)
+        await pipe.execute()
+
+    def _after_add(self, pipe, scores):
+        pass
+
+    async def _get_and_remove_items(self, num_items):
+        if await self._server_supports(ZPOPMIN_VERSION):
+            return [
+                item_str for item_str, __ in
+                await self.redis.zpopmin(self.name, num_items)
+            ]
+
+        pipe = self.redis.pipeline()
+        pipe.zrange(self.name, 0, num_items - 1)
+        pipe.zremrangebyrank(self.name, 0, num_items - 1)
+
+        return (await pipe.execute())[0]
+
+    async def _blocking_get_and_remove_item(self, timeout=None):
+        res = await self.redis.bzpopmin(
+            self.name, await self._block_timeout(timeout))
+
+        # BZPOPMIN replies with (key, member, score)
+        return res[1] if res else None
+
+    async def _discard_by_str(self, *item_strs):
+        pipe = self.redis.pipeline(transaction=False)
+
+        for item in item_strs:
+            pipe.zrem(self.name, item)
+
+        return all(await pipe.execute())
+
+    async def _get_item(self, position, with_score=False):
+        return await self.redis.zrange(
+            self.name,
+            position,
+            position,
+            withscores=with_score,
+        )
+
+    async def _server_supports(self, version):
+        if self._redis_version is None:
+            info = await self.redis.info('server')
+            self._redis_version = _parse_version(info['redis_version'])
+
+        return self._redis_version >= version
+
+    async def _block_timeout(self, timeout):
+        if timeout is None:
+            return 0
+
+        if await self._server_supports(FLOAT_TIMEOUT_VERSION):
+            return max(timeout, MIN_BLOCK_TIMEOUT)
+
+        return max(int(math.ceil(timeout)), 1)
+
+    # (de)serialization doesn't touch redis, so it's shared with SortedSet
+    # instrumentation is only supported by the blocking sets
+    metrics = None
+
+    serializer = SortedSet.serializer
+    _decode = SortedSet._decode
+    _load_items = SortedSet._load_items
+    _load_item = SortedSet._load_item
+    _dump_item = SortedSet._dump_item
+    _dump_items = SortedSet._dump_items
+
+
+class AsyncTimeSortedSet(AsyncSortedSet):
+    """
+    An asyncio counterpart to :class:`TimeSortedSet <redset.TimeSortedSet>`.
+
+    """
+    def __init__(self, *args, **kwargs):
+        """
+        See :class:`TimeSortedSet <redset.TimeSortedSet>`.
+
+        """
+        if not kwargs.get('scorer'):
+            kwargs['scorer'] = lambda i: time.time()
+
+        super(AsyncTimeSortedSet, self).__init__(*args, **kwargs)
+
+
+class AsyncScheduledSet(AsyncTimeSortedSet):
+    """
+    An asyncio counterpart to :class:`ScheduledSet <redset.ScheduledSet>`.
+
+    """
+    def __init__(self, *args, **kwargs):
+        """
+        See :class:`ScheduledSet <redset.ScheduledSet>`.
+
+        """
+        self.notify = kwargs.pop('notify', True)
+        super(AsyncScheduledSet, self).__init__(*args, **kwargs)
+        self.notify_channel = '%s__notify' % self.name
+        self._pop_script = self.redis.register_script(scripts.POP_BY_SCORE)
+
+    async def available(self):
+        """
+        The count of items with a score less than now.
+
+        """
+        return await self.redis.zcount(self.name, '-inf', time.time())
+
+    async def wait_and_take(self, num, max_wait=None):
+        """
+        See :func:`ScheduledSet.wait_and_take
+        <redset.ScheduledSet.wait_and_take>`.
+
+        """
+        num = int(num)
+
+        if num < 1:
+            return []
+
+        return self._load_items(await self._wait_and_get_items(num, max_wait))
+
+    async def _wait_and_get_items(self, num_items, max_wait=None):
+        deadline = None if max_wait is None else time.time() + max_wait
+        item_strs = await self._get_and_remove_items(num_items)
+
+        # only pay for a subscription when there's something to wait for
+        if item_strs or (deadline is not None and time.time() >= deadline):
+            return item_strs
+
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+
+        try:
+            # subscribe before looking again so we can't miss an add
+            await pubsub.subscribe(self.notify_channel)
+
+            while True:
+                item_strs = await self._get_and_remove_items(num_items)
+
+                if item_strs:
+                    return item_strs
+
+                now = time.time()
+
+                if deadline is not None and now >= deadline:
+                    return []
+
+                next_score = await self._get_first_score()
+                waits = []
+
+                if next_score is not None:
+                    waits.append(next_score - now)
+                if deadline is not None:
+                    waits.append(deadline - now)
+
+                # with nothing scheduled and no deadline, wait for an add
+                wait = max(min(waits), 0) if waits else None
+
+                if wait is None or wait > 0:
+                    await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=wait)
+        finally:
+            # `aclose` replaced `reset` in redis-py 5.0.1
+            await getattr(pubsub, 'aclose', pubsub.reset)()
+
+    async def _get_first_score(self):
+        res = await self.redis.zrange(self.name, 0, 0, withscores=True)
+
+        return res[0][1] if res else None
+
+    def _after_add(self, pipe, scores):
+        if self.notify and scores:
+            pipe.publish(self.notify_channel, min(scores))
+
+    async def _get_and_remove_items(self, num_items):
+        # the script replies with alternating members and scores
+        res = await self._pop_script(
+            keys=[self.name],
+            args=[time.time(), num_items],
+        )
+
+        return res[::2]
+
+    async def _blocking_get_and_remove_item(self, timeout=None):
+        item_strs = await self._wait_and_get_items(1, timeout)
+
+        return item_strs[0] if item_strs else None
+
+    async def _get_item(self, position=0, with_score=False):
+        return await self.redis.zrangebyscore(
+            self.name,
+            '-inf',
+            time.time(),
+            start=position,
+            num=1,
+            withscores=with_score,
+        )
+
+
+async def pop_any(sets, timeout=None):
+    """
+    See :func:`redset.pop_any <redset.pop_any>`.
+
+    """
+    sets = list(sets)
+
+    if not sets:
+        raise ValueError('No sets to pop from')
+
+    for ss in sets:
+        if isinstance(ss, AsyncScheduledSet):
+            raise TypeError("Can't block on %s" % ss)
+
+    res = await sets[0].redis.bzpopmin(
+        [ss.name for ss in sets], await sets[0]._block_timeout(timeout))
+
+    if not res:
+        raise KeyError('%s are empty' % ', '.join(ss.name for ss in sets))
+
+    name, item_str = _py3_compat_decode(res[0]), res[1]
+    ss = next(ss for ss in sets if ss.name == name)
+    res_list = ss._load_items([item_str])
+
+    return ss, (res_list[0] if res_list else None)
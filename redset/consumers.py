@@ -0,0 +1,169 @@
+"""
+Consumers that sit between a set and the code processing its items.
+
+"""
+
+import collections
+import time
+
+import logging
+log = logging.getLogger(__name__)
+
+
+__all__ = (
+    'PrefetchingConsumer',
+)
+
+
+class PrefetchingConsumer(object):
+    """
+    Serves :func:`pop` from a local buffer, filled by claiming batches of
+    items from a set with a single atomic take.
+
+    The batch size adapts to the rate of consumption: it doubles each time a
+    full batch is used up, and halves whenever buffered items are held for
+    longer than ``max_hold`` and have to be returned to the set.
+
+    Buffered items are invisible to other consumers until they're returned
+    to the set, which happens on :func:`close` (or on leaving a ``with``
+    block) and when they've been held for longer than ``max_hold``. Items
+    go back exactly as they were stored, with the scores they were taken
+    with.
+
+    Not safe to share between threads; use one consumer per thread.
+
+    Usage::
+
+        with PrefetchingConsumer(task_set, max_batch=500) as consumer:
+            while True:
+                do_work_on_task(consumer.pop())
+
+    """
+    def __init__(self,
+                 sorted_set,
+                 min_batch=1,
+                 max_batch=100,
+                 max_hold=None,
+                 ):
+        """
+        :param sorted_set: the set to consume from.
+        :type sorted_set: :class:`SortedSet <SortedSet>`
+        :param min_batch: the smallest (and first) batch to claim.
+        :type min_batch: int
+        :param max_batch: the largest batch to claim.
+        :type max_batch: int
+        :param max_hold: the maximum time in seconds that items may sit in
+            the buffer before they're returned to the set. Checked on each
+            :func:`pop`. Unbounded if None.
+        :type max_hold: Number
+
+        """
+        self.sorted_set = sorted_set
+        self.min_batch = max(int(min_batch), 1)
+        self.max_batch = max(int(max_batch), self.min_batch)
+        self.max_hold = max_hold
+        self.batch_size = self.min_batch
+        self._buffer = collections.deque()
+        self._claimed_at = None
+        self._last_batch_full = False
+
+    def __repr__(self):
+        return (
+            "<%s set=%s, buffered=%s, batch_size=%s>" %
+            (self.__class__.__name__, self.sorted_set.name, len(self),
+             self.batch_size)
+        )
+
+    __str__ = __repr__
+
+    def __len__(self):
+        """
+        How many items are buffered locally?
+
+        :returns: int
+
+        """
+        return len(self._buffer)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def pop(self):
+        """
+        Return the next item, claiming a new batch from the set if the
+        buffer is empty.
+
+        :raises: KeyError -- if the buffer and the set are empty
+
+        :returns: object.
+
+        """
+        if self._buffer and self._held_too_long():
+            self._return_items()
+            self.batch_size = max(self.batch_size // 2, self.min_batch)
+
+        if not self._buffer:
+            self._claim_batch()
+
+        if not self._buffer:
+            raise KeyError('%s is empty' % self.sorted_set)
+
+        item, __, __ = self._buffer.popleft()
+        return item
+
+    def close(self):
+        """
+        Return any buffered items to the set.
+
+        """
+        self._return_items()
+
+    def _claim_batch(self):
+        """
+        Take the next batch from the set, growing the batch size if the
+        last full batch was used up.
+
+        """
+        if self._last_batch_full:
+            self.batch_size = min(self.batch_size * 2, self.max_batch)
+
+        claimed = self.sorted_set._get_and_remove_items(
+            self.batch_size, with_scores=True)
+        # keep each raw str alongside its item, so that returning it doesn't
+        # depend on the item surviving a round trip through the serializer
+        batch = self.sorted_set._load_items(
+            [(item_str, (item_str, score)) for item_str, score in claimed],
+            with_scores=True)
+
+        self._buffer.extend(
+            (item, item_str, score) for item, (item_str, score) in batch)
+        self._claimed_at = time.time()
+        self._last_batch_full = (len(batch) >= self.batch_size)
+
+    def _held_too_long(self):
+        return (
+            self.max_hold is not None and
+            time.time() - self._claimed_at > self.max_hold
+        )
+
+    def _return_items(self):
+        """
+        Put buffered items back in the set as they were stored, with the
+        scores they were taken with.
+
+        """
+        if not self._buffer:
+            return
+
+        __, item_strs, scores = zip(*self._buffer)
+        self._buffer.clear()
+        self._last_batch_full = False
+
+        log.debug(
+            'Returning %d items to set %s' %
+            (len(item_strs), self.sorted_set.name)
+        )
+        self.sorted_set.add_many(item_strs, scores, serialized=True)
@@ -11,6 +11,11 @@ class Serializer(object):
     """
     __metaclass__ = abc.ABCMeta
 
+    #: Serializers that produce bytes which aren't valid UTF-8 should set
+    #: this so that sets pass them the raw bytes from redis to load, rather
+    #: than decoded strs.
+    binary = False
+
     @abc.abstractmethod
     def loads(self, str_from_redis):
         """
@@ -31,3 +36,56 @@ class Serializer(object):
         :returns: str
 
         """
+
+    def loads_many(self, strs_from_redis):
+        """
+        Optionally, deserialize a list of strs from redis in one pass.
+
+        Sets use this, when present, to load the results of a take or peek.
+        If it raises, they fall back to calling :func:`loads` on each item
+        so that only the items that can't be deserialized are skipped.
+
+        :param strs_from_redis: the strs corresponding with items in redis
+        :type strs_from_redis: list of str
+        :returns: list of objects, aligned with ``strs_from_redis``
+
+        """
+        return [self.loads(s) for s in strs_from_redis]
+
+    def dumps_many(self, objs):
+        """
+        Optionally, serialize a list of Python objects in one pass.
+
+        Sets use this, when present, to serialize items for bulk adds.
+
+        :param objs: the Python objects to be stored in a sorted set
+        :type objs: list of objects
+        :returns: list of str, aligned with ``objs``
+
+        """
+        return [self.dumps(obj) for obj in objs]
+
+
+class Metrics(object):
+    """
+    This is a guideline for receiving measurements of the operations on a
+    set, which is passed to the set as ``metrics``. Implementations need not
+    subclass this directly, but should match the interface defined here.
+
+    See :class:`metrics.HistogramMetrics <redset.metrics.HistogramMetrics>`.
+
+    """
+    __metaclass__ = abc.ABCMeta
+
+    @abc.abstractmethod
+    def record(self, measurement):
+        """
+        Receive the measurement of a completed operation. Called in the
+        thread that performed the operation, so it should be quick;
+        exceptions it raises are logged and swallowed.
+
+        :param measurement:
+        :type measurement: :class:`metrics.Measurement
+            <redset.metrics.Measurement>`
+
+        """
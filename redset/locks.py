@@ -3,18 +3,30 @@ Locks used to synchronize mutations on queues.
 
 """
 
+import random
+import threading
 import time
+import uuid
 
+from redset import scripts
 from redset.exceptions import LockTimeout
+from redset.metrics import LockMeasurement, _clock
+
+import logging
+log = logging.getLogger(__name__)
 
 __all__ = (
     'Lock',
+    'TokenLock',
 )
 
 
 # redis or redis-py truncates timestamps to the hundredth
 REDIS_TIME_PRECISION = 0.01
 
+# shortest wait we'll ask of BLPOP on a lock's release signal
+MIN_RELEASE_WAIT = 0.001
+
 
 class Lock(object):
     """
@@ -30,6 +42,8 @@ class Lock(object):
                  expires=None,
                  timeout=None,
                  poll_interval=None,
+                 notify=False,
+                 metrics=None,
                  ):
         """
         Distributed locking using Redis SETNX and GETSET.
@@ -52,6 +66,16 @@ class Lock(object):
             Note that poll intervals below 0.01 don't make sense since
             timestamps stored in redis are truncated to the hundredth.
             Defaults to 0.2.
+        :param notify: signal waiters on release so that they wake up
+            immediately rather than at their next poll, which remains as a
+            fallback. Waiters block with BLPOP on ``<key>__released``,
+            which requires redis >= 6.0 for sub-second timeouts.
+            Defaults to False.
+        :param metrics: receives a :class:`metrics.LockMeasurement
+            <redset.metrics.LockMeasurement>` of each acquisition once the
+            lock is released, and of each timeout. Must match the interface
+            of `redset.interfaces.Metrics`, e.g. :class:`metrics.LockCounters
+            <redset.metrics.LockCounters>`. Nothing is measured if None.
         :raises: LockTimeout
 
         """
@@ -60,15 +84,25 @@ class Lock(object):
         self.timeout = timeout or 10
         self.expires = expires or 20
         self.poll_interval = poll_interval or 0.2
+        self.release_key = _release_key(key) if notify else None
+        self.metrics = metrics
+        # holds the measurement of the current acquisition in each thread
+        self._local = threading.local()
 
     def __enter__(self):
-        timeout = self.timeout
+        # a deadline rather than a countdown of poll intervals, since waiters
+        # woken by a release they then lose haven't waited a whole interval
+        deadline = time.time() + self.timeout
+        started = _clock()
+        polls = 0
 
-        while timeout >= 0:
+        while True:
             expires = time.time() + self.expires
+            polls += 1
 
             if self.redis.setnx(self.key, expires):
                 # We gained the lock; enter critical section
+                _acquired(self, started, polls)
                 return
 
             current_value = self.redis.get(self.key)
@@ -82,12 +116,224 @@ class Lock(object):
                 self.redis.getset(self.key, expires) == current_value
             )
             if has_expired:
+                _acquired(self, started, polls, stolen=True)
                 return
 
-            timeout -= self.poll_interval
-            time.sleep(self.poll_interval)
+            remaining = deadline - time.time()
+
+            if remaining < 0:
+                _timed_out(self, started, polls)
+                raise LockTimeout(
+                    "Timeout while waiting for lock '%s'" % self.key)
 
-        raise LockTimeout("Timeout while waiting for lock '%s'" % self.key)
+            _wait_for_release(
+                self.redis, self.release_key,
+                min(self.poll_interval, remaining))
 
     def __exit__(self, exc_type, exc_value, traceback):
-        self.redis.delete(self.key)
+        if not self.release_key:
+            self.redis.delete(self.key)
+        else:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.delete(self.key)
+            (pipe
+             .rpush(self.release_key, 1)
+             .ltrim(self.release_key, -1, -1)
+             .pexpire(self.release_key, int(self.expires * 1000))
+             )
+            pipe.execute()
+
+        if self.metrics is not None:
+            # we can't tell whether it was stolen from us, only that it could
+            # have been
+            _released(self, lambda held: held > self.expires)
+
+
+class TokenLock(object):
+    """
+    Context manager that implements a distributed lock with redis, owned by
+    a random token.
+
+    The lock is acquired with a single ``SET key token NX PX`` and expires
+    on the server, so there's no client clock involved. Releasing only
+    deletes the key if it still holds our token, so a client whose lock
+    expired can't release a lock that was since acquired by another.
+
+    Waiters retry with exponential backoff and full jitter so that many
+    contending clients don't wake in lockstep.
+
+    """
+    def __init__(self,
+                 redis,
+                 key,
+                 expires=None,
+                 timeout=None,
+                 poll_interval=None,
+                 max_poll_interval=None,
+                 notify=False,
+                 metrics=None,
+                 ):
+        """
+        Usage::
+
+            with TokenLock(redis, 'my_lock'):
+                print "Critical section"
+
+        :param redis: the redis client
+        :param key: the key the lock is labeled with
+        :param timeout: If another client has already obtained the lock,
+            wait for a maximum of ``timeout`` seconds before
+            giving up. A value of 0 means we never wait. Defaults to 10.
+        :param expires: the lock expires on the server after ``expires``
+            seconds in order to recover from crashed clients. This value
+            must be higher than it takes the critical section to execute.
+            Defaults to 20.
+        :param poll_interval: the initial upper bound on the time we sleep
+            between acquisition attempts; it doubles after each failed
+            attempt. Defaults to 0.005.
+        :param max_poll_interval: the most the upper bound on sleeping
+            between attempts grows to. Defaults to 0.2.
+        :param notify: signal a waiter on release so that it wakes up
+            immediately. Waiters then block on the signal for up to
+            ``max_poll_interval`` between attempts instead of backing off.
+            See :class:`Lock <Lock>`. Defaults to False.
+        :param metrics: receives a measurement of each acquisition and
+            timeout. See :class:`Lock <Lock>`.
+        :raises: LockTimeout
+
+        """
+        self.redis = redis
+        self.key = key
+        self.timeout = timeout or 10
+        self.expires = expires or 20
+        self.poll_interval = poll_interval or 0.005
+        self.max_poll_interval = max_poll_interval or 0.2
+        self.release_key = _release_key(key) if notify else None
+        self._release_script = self.redis.register_script(
+            scripts.RELEASE_LOCK)
+        self.metrics = metrics
+        # tokens are per-thread so that threads can share a lock instance
+        self._local = threading.local()
+
+    def __enter__(self):
+        token = uuid.uuid4().hex
+        expires_ms = int(self.expires * 1000)
+        deadline = time.time() + self.timeout
+        poll_interval = self.poll_interval
+        started = _clock()
+        polls = 0
+
+        while True:
+            polls += 1
+
+            if self.redis.set(self.key, token, px=expires_ms, nx=True):
+                # We gained the lock; enter critical section
+                self._local.token = token
+                _acquired(self, started, polls)
+                return
+
+            remaining = deadline - time.time()
+
+            if remaining < 0:
+                _timed_out(self, started, polls)
+                raise LockTimeout(
+                    "Timeout while waiting for lock '%s'" % self.key)
+
+            if self.release_key:
+                # we'll be woken on release; polling is only a fallback
+                wait = self.max_poll_interval
+            else:
+                wait = random.uniform(0, poll_interval)
+                poll_interval = min(poll_interval * 2, self.max_poll_interval)
+
+            _wait_for_release(
+                self.redis, self.release_key, min(wait, remaining))
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        token = self._local.token
+        self._local.token = None
+
+        keys = [self.key]
+
+        if self.release_key:
+            keys.append(self.release_key)
+
+        released = self._release_script(
+            keys=keys,
+            args=[token, int(self.expires * 1000)])
+
+        if not released:
+            log.warning("Lock '%s' expired before it was released" % self.key)
+
+        if self.metrics is not None:
+            _released(self, lambda held: not released)
+
+
+def _acquired(lock, started, polls, stolen=False):
+    """Begin measuring ``lock``'s hold, if it has metrics."""
+    if lock.metrics is None:
+        return
+
+    now = _clock()
+    measurement = LockMeasurement(lock.key)
+    measurement.acquired = True
+    measurement.wait = now - started
+    measurement.polls = polls
+    measurement.stolen = stolen
+    lock._local.measurement = measurement
+    lock._local.acquired_at = now
+
+
+def _released(lock, has_expired):
+    """
+    Report the measurement of ``lock``'s hold begun by :func:`_acquired`.
+
+    :param has_expired: called with how long the lock was held, returns
+        whether it expired before it was released.
+
+    """
+    measurement = getattr(lock._local, 'measurement', None)
+
+    if measurement is None:
+        return
+
+    lock._local.measurement = None
+    measurement.held = _clock() - lock._local.acquired_at
+    measurement.expired = has_expired(measurement.held)
+    _record(lock, measurement)
+
+
+def _timed_out(lock, started, polls):
+    if lock.metrics is None:
+        return
+
+    measurement = LockMeasurement(lock.key)
+    measurement.wait = _clock() - started
+    measurement.polls = polls
+    _record(lock, measurement)
+
+
+def _record(lock, measurement):
+    try:
+        lock.metrics.record(measurement)
+    except Exception:
+        log.exception("Could not record measurement of lock '%s'" % lock.key)
+
+
+def _release_key(key):
+    """The list a lock's waiters block on to hear of its release."""
+    return '%s__released' % key
+
+
+def _wait_for_release(redis, release_key, timeout):
+    """
+    Sleep for up to ``timeout`` seconds, waking early if ``release_key`` is
+    signalled. Without a ``release_key``, just sleep.
+
+    """
+    if not release_key:
+        time.sleep(timeout)
+        return
+
+    # BLPOP waits forever on a timeout of 0
+    redis.blpop(release_key, timeout=max(timeout, MIN_RELEASE_WAIT))
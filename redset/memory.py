@@ -0,0 +1,1019 @@
+"""
+An in-process stand-in for a redis server, for single-process deployments
+and for tests and benchmarks that shouldn't need one.
+
+"""
+
+import bisect
+import collections
+import functools
+import threading
+import time
+
+from redset import scripts
+
+import logging
+log = logging.getLogger(__name__)
+
+
+__all__ = (
+    'MemoryRedis',
+)
+
+
+# the server version reported by INFO; every optional command is supported
+REDIS_VERSION = '7.0.0'
+
+# the flags of ZADD that are supported
+_ZADD_FLAGS = ('NX', 'XX', 'GT', 'LT', 'CH')
+
+
+def _command(func):
+    """Run a command while holding the client's lock."""
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with self._cond:
+            return func(self, *args, **kwargs)
+
+    return wrapper
+
+
+class MemoryRedis(object):
+    """
+    A thread-safe, in-memory implementation of the subset of the
+    redis.Redis client that redset's sets and locks use.
+
+    Sorted sets are kept as parallel arrays of scores and members, ordered as
+    redis orders them, so lookups by score or rank are binary searches. Like
+    a redis server, every command runs while holding a single lock, so
+    commands, pipelines and scripts are atomic.
+
+    Lua can't be run in-process, so :func:`register_script` only accepts
+    redset's own scripts, for which equivalent Python is run instead.
+
+    Data is shared by the threads of a process, not between processes.
+
+    Usage::
+
+        tasks = SortedSet(MemoryRedis(), 'tasks')
+
+    """
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._channels = collections.defaultdict(list)
+        # blocking commands wait on this for writes
+        self._cond = threading.Condition(threading.RLock())
+
+    def __repr__(self):
+        return "<%s keys=%s>" % (self.__class__.__name__, len(self._data))
+
+    __str__ = __repr__
+
+    # server
+
+    @_command
+    def ping(self):
+        return True
+
+    @_command
+    def info(self, section=None):
+        return {'redis_version': REDIS_VERSION}
+
+    @_command
+    def flushdb(self):
+        self._data.clear()
+        self._expires.clear()
+        return True
+
+    def pipeline(self, transaction=True):
+        """
+        Queue commands to run together. Pipelines always run atomically,
+        whether or not ``transaction`` is asked for.
+
+        """
+        return _Pipeline(self)
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return _PubSub(self, ignore_subscribe_messages)
+
+    def register_script(self, script):
+        """
+        :raises: NotImplementedError -- if ``script`` isn't one of redset's.
+
+        """
+        try:
+            func = _SCRIPTS[script]
+        except KeyError:
+            raise NotImplementedError(
+                "%s can only run redset's own scripts" %
+                self.__class__.__name__)
+
+        return _Script(self, func)
+
+    @_command
+    def execute_command(self, *args):
+        """
+        Run a command that redset sends raw, replying as redis would.
+
+        :raises: NotImplementedError -- for other commands.
+
+        """
+        command = _decode(_encode(args[0])).upper()
+
+        try:
+            handler = self._RAW_COMMANDS[command]
+        except KeyError:
+            raise NotImplementedError(
+                '%s is not supported by %s' %
+                (command, self.__class__.__name__))
+
+        return handler(self, *args[1:])
+
+    # keys
+
+    @_command
+    def delete(self, *names):
+        deleted = 0
+
+        for name in names:
+            if self._get(name) is not None:
+                self._remove(name)
+                deleted += 1
+
+        return deleted
+
+    @_command
+    def exists(self, *names):
+        return sum(1 for name in names if self._get(name) is not None)
+
+    @_command
+    def pexpire(self, name, time_ms):
+        if self._get(name) is None:
+            return False
+
+        self._expires[_encode(name)] = time.time() + int(time_ms) / 1000.0
+        return True
+
+    # strings
+
+    @_command
+    def get(self, name):
+        return self._get(name, bytes)
+
+    @_command
+    def set(self, name, value, ex=None, px=None, nx=False, xx=False):
+        exists = self._get(name) is not None
+
+        if (nx and exists) or (xx and not exists):
+            return None
+
+        self._put(name, _encode(value))
+
+        if ex is not None:
+            self.pexpire(name, int(ex) * 1000)
+        elif px is not None:
+            self.pexpire(name, px)
+
+        return True
+
+    @_command
+    def setnx(self, name, value):
+        return bool(self.set(name, value, nx=True))
+
+    @_command
+    def getset(self, name, value):
+        old = self._get(name, bytes)
+        self._put(name, _encode(value))
+
+        return old
+
+    # lists
+
+    @_command
+    def rpush(self, name, *values):
+        lst = self._get(name, collections.deque)
+
+        if lst is None:
+            lst = self._put(name, collections.deque())
+
+        lst.extend(_encode(value) for value in values)
+        self._cond.notify_all()
+
+        return len(lst)
+
+    @_command
+    def ltrim(self, name, start, end):
+        lst = self._get(name, collections.deque)
+
+        if lst is not None:
+            lo, hi = _index_range(len(lst), start, end)
+            kept = list(lst)[lo:hi]
+            lst.clear()
+            lst.extend(kept)
+            self._remove_if_empty(name)
+
+        return True
+
+    @_command
+    def blpop(self, keys, timeout=0):
+        if isinstance(keys, (bytes, str)):
+            keys = [keys]
+
+        def pop():
+            for key in keys:
+                lst = self._get(key, collections.deque)
+
+                if lst:
+                    value = lst.popleft()
+                    self._remove_if_empty(key)
+                    return (_encode(key), value)
+
+        return self._wait_for(pop, timeout)
+
+    # hashes
+
+    @_command
+    def hset(self, name, key=None, value=None, mapping=None):
+        items = dict(mapping or {})
+
+        if key is not None:
+            items[key] = value
+
+        return self._hset(name, items)
+
+    @_command
+    def hget(self, name, key):
+        return (self._get(name, dict) or {}).get(_encode(key))
+
+    @_command
+    def hmget(self, name, keys, *args):
+        if isinstance(keys, (bytes, str)):
+            keys = [keys]
+
+        hsh = self._get(name, dict) or {}
+
+        return [hsh.get(_encode(key)) for key in list(keys) + list(args)]
+
+    @_command
+    def hdel(self, name, *keys):
+        hsh = self._get(name, dict) or {}
+        deleted = sum(
+            1 for key in keys if hsh.pop(_encode(key), None) is not None)
+        self._remove_if_empty(name)
+
+        return deleted
+
+    @_command
+    def hlen(self, name):
+        return len(self._get(name, dict) or {})
+
+    @_command
+    def hgetall(self, name):
+        return dict(self._get(name, dict) or {})
+
+    # sorted sets
+
+    @_command
+    def zadd(self, name, *args, **kwargs):
+        """
+        Add members, given as alternating members and scores or as
+        ``member=score`` keyword arguments, as for the legacy redis.Redis
+        client.
+
+        """
+        if len(args) % 2:
+            raise ValueError('ZADD requires an equal number of members and '
+                             'scores')
+
+        pairs = list(zip(args[::2], args[1::2])) + list(kwargs.items())
+        zset = self._get(name, _SortedSet)
+
+        if zset is None:
+            zset = self._put(name, _SortedSet())
+
+        added = sum(
+            zset.add(_encode(member), _score(score))
+            for member, score in pairs
+        )
+        self._cond.notify_all()
+
+        return added
+
+    @_command
+    def zrem(self, name, *values):
+        zset = self._get(name, _SortedSet)
+
+        if zset is None:
+            return 0
+
+        removed = sum(zset.remove(_encode(value)) for value in values)
+        self._remove_if_empty(name)
+
+        return removed
+
+    @_command
+    def zscore(self, name, value):
+        zset = self._get(name, _SortedSet)
+
+        return None if zset is None else zset.score(_encode(value))
+
+    @_command
+    def zcard(self, name):
+        zset = self._get(name, _SortedSet)
+
+        return 0 if zset is None else len(zset)
+
+    @_command
+    def zcount(self, name, min, max):
+        zset = self._get(name, _SortedSet)
+
+        if zset is None:
+            return 0
+
+        lo, hi = zset.score_range(min, max)
+        return hi - lo
+
+    @_command
+    def zrange(self, name, start, end, desc=False, withscores=False,
+               score_cast_func=float):
+        zset = self._get(name, _SortedSet)
+
+        if zset is None:
+            return []
+
+        lo, hi = _index_range(len(zset), start, end)
+
+        if desc:
+            lo, hi = len(zset) - hi, len(zset) - lo
+            items = zset.items(lo, hi)[::-1]
+        else:
+            items = zset.items(lo, hi)
+
+        return _range_reply(items, withscores, score_cast_func)
+
+    @_command
+    def zrangebyscore(self, name, min_score, max_score, start=None, num=None,
+                      withscores=False, score_cast_func=float):
+        zset = self._get(name, _SortedSet)
+
+        if zset is None:
+            return []
+
+        lo, hi = zset.score_range(min_score, max_score)
+
+        if start is not None and num is not None:
+            lo = min(lo + max(int(start), 0), hi)
+
+            if int(num) >= 0:
+                hi = min(hi, lo + int(num))
+
+        return _range_reply(zset.items(lo, hi), withscores, score_cast_func)
+
+    @_command
+    def zremrangebyrank(self, name, min, max):
+        zset = self._get(name, _SortedSet)
+
+        if zset is None:
+            return 0
+
+        removed = zset.delete(*_index_range(len(zset), min, max))
+        self._remove_if_empty(name)
+
+        return removed
+
+    @_command
+    def zremrangebyscore(self, name, min, max):
+        zset = self._get(name, _SortedSet)
+
+        if zset is None:
+            return 0
+
+        removed = zset.delete(*zset.score_range(min, max))
+        self._remove_if_empty(name)
+
+        return removed
+
+    # pub/sub
+
+    @_command
+    def publish(self, channel, message):
+        subscribers = self._channels.get(_encode(channel), [])
+
+        for pubsub in subscribers:
+            pubsub._messages.append({
+                'type': 'message',
+                'pattern': None,
+                'channel': _encode(channel),
+                'data': _encode(message),
+            })
+
+        self._cond.notify_all()
+
+        return len(subscribers)
+
+    # raw commands, which reply with flat lists of strs
+
+    def _zpopmin(self, name, count=1):
+        zset = self._get(name, _SortedSet)
+
+        if zset is None:
+            return []
+
+        items = zset.items(0, int(count))
+        zset.delete(0, len(items))
+        self._remove_if_empty(name)
+
+        return _flat_reply(items)
+
+    def _bzpopmin(self, *args):
+        keys, timeout = args[:-1], args[-1]
+
+        def pop():
+            for key in keys:
+                res = self._zpopmin(key)
+
+                if res:
+                    return [_encode(key)] + res
+
+        return self._wait_for(pop, float(timeout))
+
+    def _raw_hset(self, name, *args):
+        return self._hset(name, dict(zip(args[::2], args[1::2])))
+
+    def _raw_zadd(self, name, *args):
+        """ZADD with its NX, XX, GT, LT and CH flags, but not INCR."""
+        flags = set()
+
+        while args and _decode(_encode(args[0])).upper() in _ZADD_FLAGS:
+            flags.add(_decode(_encode(args[0])).upper())
+            args = args[1:]
+
+        zset = self._get(name, _SortedSet)
+
+        if zset is None:
+            zset = self._put(name, _SortedSet())
+
+        added = changed = 0
+
+        for score, member in zip(args[::2], args[1::2]):
+            member, score = _encode(member), _score(score)
+            old = zset.score(member)
+
+            if old is None:
+                if 'XX' in flags:
+                    continue
+            elif 'NX' in flags or \
+                    ('GT' in flags and score <= old) or \
+                    ('LT' in flags and score >= old):
+                continue
+
+            if zset.add(member, score):
+                added += 1
+            elif old != score:
+                changed += 1
+
+        self._remove_if_empty(name)
+        self._cond.notify_all()
+
+        return added + changed if 'CH' in flags else added
+
+    def _zmscore(self, name, *members):
+        zset = self._get(name, _SortedSet)
+        scores = [
+            None if zset is None else zset.score(_encode(member))
+            for member in members
+        ]
+
+        return [None if score is None else _encode(score) for score in scores]
+
+    _RAW_COMMANDS = {
+        'ZPOPMIN': _zpopmin,
+        'BZPOPMIN': _bzpopmin,
+        'HSET': _raw_hset,
+        'ZADD': _raw_zadd,
+        'ZMSCORE': _zmscore,
+    }
+
+    # internals; call these holding the lock
+
+    def _get(self, name, kind=None):
+        """
+        The value at ``name``, or None if there isn't one.
+
+        :raises: TypeError -- if the value isn't of type ``kind``.
+
+        """
+        key = _encode(name)
+        expires = self._expires.get(key)
+
+        if expires is not None and expires <= time.time():
+            self._remove(key)
+
+        value = self._data.get(key)
+
+        if value is not None and kind is not None and \
+                not isinstance(value, kind):
+            raise TypeError(
+                'WRONGTYPE Operation against a key holding the wrong kind '
+                'of value')
+
+        return value
+
+    def _put(self, name, value):
+        key = _encode(name)
+        self._data[key] = value
+        self._expires.pop(key, None)
+
+        return value
+
+    def _remove(self, name):
+        key = _encode(name)
+        self._data.pop(key, None)
+        self._expires.pop(key, None)
+
+    def _remove_if_empty(self, name):
+        if not self._get(name):
+            self._remove(name)
+
+    def _hset(self, name, items):
+        hsh = self._get(name, dict)
+
+        if hsh is None:
+            hsh = self._put(name, {})
+
+        added = 0
+
+        for key, value in items.items():
+            key = _encode(key)
+            added += key not in hsh
+            hsh[key] = _encode(value)
+
+        return added
+
+    def _wait_for(self, func, timeout):
+        """
+        Call ``func`` until it returns something, waiting for writes in
+        between. Waits forever on a ``timeout`` of 0, as redis does.
+
+        """
+        deadline = time.time() + timeout if timeout else None
+
+        while True:
+            res = func()
+
+            if res is not None:
+                return res
+
+            if deadline is None:
+                self._cond.wait()
+                continue
+
+            remaining = deadline - time.time()
+
+            if remaining <= 0:
+                return None
+
+            self._cond.wait(remaining)
+
+
+class _SortedSet(object):
+    """
+    Members ordered by score, then bytewise, in parallel arrays.
+
+    """
+    __slots__ = ('scores', 'members', 'index')
+
+    def __init__(self):
+        self.scores = []
+        self.members = []
+        self.index = {}
+
+    def __len__(self):
+        return len(self.members)
+
+    def add(self, member, score):
+        """:returns: bool -- whether the member is new"""
+        old = self.index.get(member)
+
+        if old is not None:
+            if old == score:
+                return False
+
+            self._pop(member, old)
+
+        position = self._position(member, score)
+        self.scores.insert(position, score)
+        self.members.insert(position, member)
+        self.index[member] = score
+
+        return old is None
+
+    def remove(self, member):
+        """:returns: bool -- whether the member was there"""
+        score = self.index.pop(member, None)
+
+        if score is None:
+            return False
+
+        self._pop(member, score)
+        return True
+
+    def score(self, member):
+        return self.index.get(member)
+
+    def items(self, lo, hi):
+        return list(zip(self.members[lo:hi], self.scores[lo:hi]))
+
+    def delete(self, lo, hi):
+        """Remove the members ranked ``lo`` to ``hi``, exclusive."""
+        if hi <= lo:
+            return 0
+
+        for member in self.members[lo:hi]:
+            del self.index[member]
+
+        del self.scores[lo:hi]
+        del self.members[lo:hi]
+
+        return hi - lo
+
+    def score_range(self, min_bound, max_bound):
+        """
+        The ranks, ``lo`` to ``hi`` exclusive, of members scored between
+        ``min_bound`` and ``max_bound``, given as for ZRANGEBYSCORE.
+
+        """
+        min_score, min_exclusive = _score_bound(min_bound)
+        max_score, max_exclusive = _score_bound(max_bound)
+
+        if min_exclusive:
+            lo = bisect.bisect_right(self.scores, min_score)
+        else:
+            lo = bisect.bisect_left(self.scores, min_score)
+
+        if max_exclusive:
+            hi = bisect.bisect_left(self.scores, max_score)
+        else:
+            hi = bisect.bisect_right(self.scores, max_score)
+
+        return lo, max(hi, lo)
+
+    def _position(self, member, score):
+        lo = bisect.bisect_left(self.scores, score)
+        hi = bisect.bisect_right(self.scores, score, lo)
+
+        return bisect.bisect_left(self.members, member, lo, hi)
+
+    def _pop(self, member, score):
+        position = self._position(member, score)
+        del self.scores[position]
+        del self.members[position]
+
+
+class _Pipeline(object):
+    """
+    Queues commands and runs them all at once, under the client's lock.
+
+    """
+    def __init__(self, client):
+        self.client = client
+        self._commands = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.reset()
+
+    def __len__(self):
+        return len(self._commands)
+
+    def __getattr__(self, command):
+        method = getattr(self.client, command)
+
+        def queue(*args, **kwargs):
+            self._commands.append((method, args, kwargs))
+            return self
+
+        return queue
+
+    def execute(self):
+        commands, self._commands = self._commands, []
+
+        with self.client._cond:
+            return [method(*args, **kwargs)
+                    for method, args, kwargs in commands]
+
+    def reset(self):
+        self._commands = []
+
+
+class _PubSub(object):
+    """
+    Receives messages published to the channels it subscribes to.
+
+    """
+    def __init__(self, client, ignore_subscribe_messages=False):
+        self.client = client
+        self.ignore_subscribe_messages = ignore_subscribe_messages
+        self.channels = set()
+        self._messages = collections.deque()
+
+    def subscribe(self, *channels):
+        with self.client._cond:
+            for channel in channels:
+                channel = _encode(channel)
+
+                if channel in self.channels:
+                    continue
+
+                self.channels.add(channel)
+                self.client._channels[channel].append(self)
+
+                if not self.ignore_subscribe_messages:
+                    self._messages.append({
+                        'type': 'subscribe',
+                        'pattern': None,
+                        'channel': channel,
+                        'data': len(self.channels),
+                    })
+
+    def get_message(self, ignore_subscribe_messages=False, timeout=0):
+        """
+        The next message, waiting up to ``timeout`` seconds for one (or
+        forever if None).
+
+        """
+        with self.client._cond:
+            if timeout is None:
+                # wait forever
+                timeout = 0
+            elif timeout <= 0:
+                return self._messages.popleft() if self._messages else None
+
+            return self.client._wait_for(
+                lambda: self._messages.popleft() if self._messages else None,
+                timeout)
+
+    def close(self):
+        with self.client._cond:
+            for channel in self.channels:
+                self.client._channels[channel].remove(self)
+
+                if not self.client._channels[channel]:
+                    del self.client._channels[channel]
+
+            self.channels.clear()
+            self._messages.clear()
+
+    reset = close
+
+
+class _Script(object):
+    """
+    A registered script, run as Python under the client's lock.
+
+    """
+    def __init__(self, client, func):
+        self.client = client
+        self.func = func
+
+    def __call__(self, keys=[], args=[], client=None):
+        if isinstance(client, _Pipeline):
+            client._commands.append((self, (keys, args), {}))
+            return client
+
+        with self.client._cond:
+            return self.func(self.client, list(keys), list(args))
+
+
+# Python equivalents of `redset.scripts`, which see for their arguments
+
+def _take_body(client, keys, member):
+    body = client.hget(keys[2], member)
+
+    if client.zscore(keys[0], member) is None and \
+            client.zscore(keys[1], member) is None:
+        client.hdel(keys[2], member)
+
+    return body
+
+
+def _pop_by_score(client, keys, args):
+    items = client.zrangebyscore(
+        keys[0], '-inf', args[0], start=0, num=int(args[1]),
+        withscores=True)
+
+    if items:
+        client.zrem(keys[0], *[member for member, __ in items])
+
+    if len(keys) > 2:
+        items = [
+            (_take_body(client, keys, member), score)
+            for member, score in items
+        ]
+
+    return _flat_reply(items)
+
+
+def _peek_body(client, keys, args):
+    ids = client.zrangebyscore(
+        keys[0], '-inf', args[0], start=int(args[1]), num=1)
+
+    if not ids:
+        return []
+
+    return [ids[0], client.hget(keys[1], ids[0])]
+
+
+def _remove_offloaded(client, keys, args):
+    source = keys[1] if len(keys) > 3 else keys[0]
+    removed = 0
+
+    for member in args:
+        if client.zrem(source, member):
+            if len(keys) > 3:
+                client.hdel(keys[3], member)
+
+            _take_body(client, keys, member)
+            removed += 1
+
+    return removed
+
+
+def _remove_by_score(client, keys, args):
+    members = client.zrangebyscore(keys[0], args[0], args[1])
+
+    if members:
+        client.zrem(keys[0], *members)
+
+    for member in members:
+        _take_body(client, keys, member)
+
+    return len(members)
+
+
+def _release_lock(client, keys, args):
+    if client.get(keys[0]) != _encode(args[0]):
+        return 0
+
+    client.delete(keys[0])
+
+    if len(keys) > 1:
+        client.rpush(keys[1], 1)
+        client.ltrim(keys[1], -1, -1)
+        client.pexpire(keys[1], args[1])
+
+    return 1
+
+
+def _claim(client, keys, args):
+    items = client.zrangebyscore(
+        keys[0], '-inf', args[0], start=0, num=int(args[1]),
+        withscores=True)
+
+    for member, score in items:
+        client.zrem(keys[0], member)
+        client.zadd(keys[1], member, args[2])
+        client.hset(keys[2], member, _encode(score))
+
+    return [member for member, __ in items]
+
+
+def _requeue(client, keys, member, score):
+    if not client.zrem(keys[1], member):
+        return 0
+
+    original_score = client.hget(keys[2], member)
+    client.hdel(keys[2], member)
+    client.zadd(keys[0], member, original_score if score is None else score)
+
+    return 1
+
+
+def _requeue_claimed(client, keys, args):
+    score = None if _encode(args[0]) == b'' else args[0]
+
+    return sum(_requeue(client, keys, member, score) for member in args[1:])
+
+
+def _requeue_expired(client, keys, args):
+    expired = client.zrangebyscore(
+        keys[1], '-inf', '(%r' % float(args[0]), start=0, num=int(args[1]))
+
+    return sum(_requeue(client, keys, member, None) for member in expired)
+
+
+def _add_if(client, keys, args):
+    mode = _decode(_encode(args[0]))
+    step = 3 if len(keys) > 1 else 2
+    old_scores = []
+
+    for i in range(1, len(args), step):
+        member, score = args[i], _score(args[i + 1])
+        old = client.zscore(keys[0], member)
+
+        if old is None:
+            write = mode != 'xx'
+        elif mode == 'gt':
+            write = score > old
+        elif mode == 'lt':
+            write = score < old
+        else:
+            write = mode == 'xx'
+
+        if write:
+            if len(keys) > 1:
+                client.hset(keys[1], member, args[i + 2])
+
+            client.zadd(keys[0], member, score)
+
+        old_scores.append(None if old is None else _encode(old))
+
+    return old_scores
+
+
+_SCRIPTS = {
+    scripts.ADD_IF: _add_if,
+    scripts.POP_BY_SCORE: _pop_by_score,
+    scripts.PEEK_BODY: _peek_body,
+    scripts.REMOVE_OFFLOADED: _remove_offloaded,
+    scripts.REMOVE_BY_SCORE: _remove_by_score,
+    scripts.RELEASE_LOCK: _release_lock,
+    scripts.CLAIM: _claim,
+    scripts.REQUEUE_CLAIMED: _requeue_claimed,
+    scripts.REQUEUE_EXPIRED: _requeue_expired,
+}
+
+
+def _encode(value):
+    """Encode a value as redis-py would before sending it."""
+    if isinstance(value, bytes):
+        return value
+
+    if isinstance(value, float):
+        return repr(value).encode('utf-8')
+
+    if not isinstance(value, str):
+        value = str(value)
+
+    return value.encode('utf-8')
+
+
+def _decode(value):
+    return value.decode('utf-8')
+
+
+def _score(value):
+    return float(value)
+
+
+def _score_bound(value):
+    """
+    A ZRANGEBYSCORE bound, like 1.5, '-inf' or '(1.5', as a float and
+    whether it's exclusive.
+
+    """
+    if isinstance(value, (bytes, str)):
+        value = _decode(_encode(value))
+
+        if value.startswith('('):
+            return float(value[1:]), True
+
+    return float(value), False
+
+
+def _index_range(length, start, end):
+    """
+    The python slice bounds of redis' inclusive, possibly negative,
+    ``start`` and ``end`` indexes into a sequence of ``length``.
+
+    """
+    start, end = int(start), int(end)
+
+    if start < 0:
+        start = max(start + length, 0)
+    if end < 0:
+        end += length
+
+    end = min(end, length - 1)
+
+    return (start, end + 1) if start <= end else (0, 0)
+
+
+def _range_reply(items, withscores, score_cast_func=float):
+    if withscores:
+        return [(member, score_cast_func(score)) for member, score in items]
+
+    return [member for member, __ in items]
+
+
+def _flat_reply(items):
+    """Alternating members and scores, as redis replies to a script."""
+    res = []
+
+    for member, score in items:
+        res.extend((member, _encode(score)))
+
+    return res
@@ -0,0 +1,446 @@
+"""
+Measurements of set and lock operations, for sets and locks created with
+``metrics``.
+
+"""
+
+import bisect
+import threading
+import time
+
+from redset.interfaces import Metrics
+
+
+__all__ = (
+    'Measurement',
+    'HistogramMetrics',
+    'LockMeasurement',
+    'LockCounters',
+)
+
+
+# time.perf_counter is Python 3 only
+_clock = getattr(time, 'perf_counter', time.time)
+
+
+# upper bounds, in seconds, of the latency buckets of HistogramMetrics
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0,
+)
+
+
+class Measurement(object):
+    """
+    The measurement of one operation on a set, passed to
+    :func:`Metrics.record <redset.interfaces.Metrics.record>`.
+
+    :ivar set_name: the name of the set operated on.
+    :ivar operation: the name of the method called, e.g. 'take'.
+    :ivar latency: how long the operation took in seconds, including any
+        time spent blocking.
+    :ivar items: how many items were serialized or deserialized.
+    :ivar round_trips: how many commands, pipelines and scripts were sent
+        to redis.
+    :ivar nbytes: the total size of the serialized items written or read.
+    :ivar failures: how many items couldn't be deserialized.
+    :ivar error: the exception the operation raised, if any.
+
+    """
+    __slots__ = (
+        'set_name',
+        'operation',
+        'latency',
+        'items',
+        'round_trips',
+        'nbytes',
+        'failures',
+        'error',
+    )
+
+    def __init__(self, set_name, operation):
+        self.set_name = set_name
+        self.operation = operation
+        self.latency = 0.0
+        self.items = 0
+        self.round_trips = 0
+        self.nbytes = 0
+        self.failures = 0
+        self.error = None
+
+    def __repr__(self):
+        return (
+            "<%s %s.%s latency=%.6f, items=%s, round_trips=%s>" %
+            (self.__class__.__name__, self.set_name, self.operation,
+             self.latency, self.items, self.round_trips)
+        )
+
+    __str__ = __repr__
+
+
+class HistogramMetrics(Metrics):
+    """
+    Aggregates measurements in-process, per operation, into counters and a
+    histogram of latencies, for scraping with :func:`snapshot`.
+
+    Safe to share between the threads of a process and between sets.
+
+    Usage::
+
+        metrics = HistogramMetrics()
+        tasks = SortedSet(redis.Redis(), 'tasks', metrics=metrics)
+        ...
+        metrics.snapshot()['take']['count']
+
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        :param buckets: the upper bounds, in seconds, of the latency
+            buckets. An unbounded bucket is always added.
+        :type buckets: sorted sequence of Numbers
+
+        """
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def __repr__(self):
+        return (
+            "<%s operations=%s>" %
+            (self.__class__.__name__, sorted(self._stats))
+        )
+
+    __str__ = __repr__
+
+    def record(self, measurement):
+        bucket = bisect.bisect_left(self.buckets, measurement.latency)
+
+        with self._lock:
+            stats = self._stats.get(measurement.operation)
+
+            if stats is None:
+                stats = self._stats[measurement.operation] = _Stats(
+                    len(self.buckets) + 1)
+
+            stats.count += 1
+            stats.errors += measurement.error is not None
+            stats.latency_sum += measurement.latency
+            stats.latency_max = max(stats.latency_max, measurement.latency)
+            stats.bucket_counts[bucket] += 1
+            stats.items += measurement.items
+            stats.round_trips += measurement.round_trips
+            stats.nbytes += measurement.nbytes
+            stats.failures += measurement.failures
+
+    def snapshot(self):
+        """
+        The totals for each operation recorded so far.
+
+        :returns: dict of operation name to a dict with keys ``count``,
+            ``errors``, ``latency_sum``, ``latency_max``, ``items``,
+            ``round_trips``, ``nbytes``, ``failures``, and ``buckets``: a list
+            of (upper bound, cumulative count) pairs, the last bounded by
+            ``float('inf')``.
+
+        """
+        bounds = self.buckets + (float('inf'),)
+
+        with self._lock:
+            return dict(
+                (operation, stats.as_dict(bounds))
+                for operation, stats in self._stats.items()
+            )
+
+    def percentile(self, operation, pct):
+        """
+        An upper bound on the ``pct`` percentile latency of ``operation``:
+        the bound of the bucket it falls in.
+
+        :returns: Number or None, if ``operation`` wasn't recorded
+
+        """
+        with self._lock:
+            stats = self._stats.get(operation)
+
+            if stats is None or not stats.count:
+                return None
+
+            rank = max(pct / 100.0 * stats.count, 1)
+            seen = 0
+
+            for bound, count in zip(self.buckets, stats.bucket_counts):
+                seen += count
+
+                if seen >= rank:
+                    return bound
+
+            return stats.latency_max
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class _Stats(object):
+    __slots__ = (
+        'count',
+        'errors',
+        'latency_sum',
+        'latency_max',
+        'bucket_counts',
+        'items',
+        'round_trips',
+        'nbytes',
+        'failures',
+    )
+
+    def __init__(self, num_buckets):
+        self.count = 0
+        self.errors = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.bucket_counts = [0] * num_buckets
+        self.items = 0
+        self.round_trips = 0
+        self.nbytes = 0
+        self.failures = 0
+
+    def as_dict(self, bounds):
+        cumulative = []
+        seen = 0
+
+        for bound, count in zip(bounds, self.bucket_counts):
+            seen += count
+            cumulative.append((bound, seen))
+
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'latency_sum': self.latency_sum,
+            'latency_max': self.latency_max,
+            'buckets': cumulative,
+            'items': self.items,
+            'round_trips': self.round_trips,
+            'nbytes': self.nbytes,
+            'failures': self.failures,
+        }
+
+
+class LockMeasurement(object):
+    """
+    The measurement of one acquisition of a lock, or of a failure to
+    acquire it, passed to :func:`Metrics.record
+    <redset.interfaces.Metrics.record>` by locks created with ``metrics``.
+
+    :ivar key: the key of the lock.
+    :ivar acquired: whether the lock was acquired. If not, acquiring it
+        timed out and raised :class:`LockTimeout
+        <redset.exceptions.LockTimeout>`.
+    :ivar wait: how long was spent acquiring the lock, or until giving up,
+        in seconds.
+    :ivar polls: how many attempts were made to acquire the lock.
+    :ivar stolen: whether the lock was acquired by replacing another
+        client's expired lock.
+    :ivar held: how long the lock was held in seconds, or None if it wasn't
+        acquired.
+    :ivar expired: whether the lock (possibly) expired before it was
+        released, i.e. it's held for longer than its ``expires``.
+
+    """
+    __slots__ = (
+        'key',
+        'acquired',
+        'wait',
+        'polls',
+        'stolen',
+        'held',
+        'expired',
+    )
+
+    def __init__(self, key):
+        self.key = key
+        self.acquired = False
+        self.wait = 0.0
+        self.polls = 0
+        self.stolen = False
+        self.held = None
+        self.expired = False
+
+    def __repr__(self):
+        return (
+            "<%s %s acquired=%s, wait=%.6f, polls=%s>" %
+            (self.__class__.__name__, self.key, self.acquired, self.wait,
+             self.polls)
+        )
+
+    __str__ = __repr__
+
+
+class LockCounters(Metrics):
+    """
+    Aggregates lock measurements in-process into counters per lock key, for
+    scraping with :func:`snapshot`.
+
+    Safe to share between the threads of a process and between locks.
+
+    Usage::
+
+        counters = LockCounters()
+        lock = TokenLock(redis.Redis(), 'reports', metrics=counters)
+        ...
+        counters.snapshot()['reports']['timeouts']
+
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def __repr__(self):
+        return (
+            "<%s keys=%s>" %
+            (self.__class__.__name__, sorted(self._counters))
+        )
+
+    __str__ = __repr__
+
+    def record(self, measurement):
+        with self._lock:
+            counters = self._counters.get(measurement.key)
+
+            if counters is None:
+                counters = self._counters[measurement.key] = dict(
+                    acquisitions=0,
+                    timeouts=0,
+                    steals=0,
+                    expirations=0,
+                    polls=0,
+                    wait_sum=0.0,
+                    wait_max=0.0,
+                    held_sum=0.0,
+                    held_max=0.0,
+                )
+
+            counters['polls'] += measurement.polls
+            counters['wait_sum'] += measurement.wait
+            counters['wait_max'] = max(counters['wait_max'], measurement.wait)
+
+            if not measurement.acquired:
+                counters['timeouts'] += 1
+                return
+
+            counters['acquisitions'] += 1
+            counters['steals'] += measurement.stolen
+            counters['expirations'] += measurement.expired
+            counters['held_sum'] += measurement.held
+            counters['held_max'] = max(counters['held_max'], measurement.held)
+
+    def snapshot(self):
+        """
+        The totals for each lock recorded so far.
+
+        :returns: dict of lock key to a dict with keys ``acquisitions``,
+            ``timeouts``, ``steals``, ``expirations``, ``polls``,
+            ``wait_sum``, ``wait_max``, ``held_sum`` and ``held_max``. Waits
+            include those that timed out.
+
+        """
+        with self._lock:
+            return dict(
+                (key, dict(counters))
+                for key, counters in self._counters.items()
+            )
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+
+class RoundTripCounter(object):
+    """
+    Wraps a redis client, counting the round trips made while a measurement
+    is in progress in the calling thread.
+
+    """
+    def __init__(self, client, local):
+        """
+        :param client: the redis client to wrap.
+        :param local: a threading.local whose ``measurement``, if set, is
+            credited with round trips.
+
+        """
+        self._client = client
+        self._local = local
+
+    def __repr__(self):
+        return "<%s %r>" % (self.__class__.__name__, self._client)
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+
+        if name == 'pipeline':
+            return lambda *args, **kwargs: _CountedPipeline(
+                attr(*args, **kwargs), self._local)
+
+        if name == 'register_script':
+            return lambda script: _CountedScript(attr(script), self._local)
+
+        if name == 'pubsub' or not callable(attr):
+            return attr
+
+        return _CountedCall(attr, self._local)
+
+
+class _CountedCall(object):
+
+    def __init__(self, func, local):
+        self._func = func
+        self._local = local
+
+    def __call__(self, *args, **kwargs):
+        _count_round_trip(self._local)
+        return self._func(*args, **kwargs)
+
+
+class _CountedScript(object):
+    """
+    A registered script, counted as a round trip unless it's queued on a
+    pipeline.
+
+    """
+    def __init__(self, script, local):
+        self._script = script
+        self._local = local
+
+    def __call__(self, keys=[], args=[], client=None):
+        if isinstance(client, _CountedPipeline):
+            # scripts only recognize the client's own pipelines
+            client = client.pipe
+        else:
+            _count_round_trip(self._local)
+
+        return self._script(keys=keys, args=args, client=client)
+
+
+class _CountedPipeline(object):
+
+    def __init__(self, pipe, local):
+        # the wrapped pipeline, which scripts queue themselves on
+        self.pipe = pipe
+        self._local = local
+
+    def __getattr__(self, name):
+        return getattr(self.pipe, name)
+
+    def execute(self, *args, **kwargs):
+        _count_round_trip(self._local)
+        return self.pipe.execute(*args, **kwargs)
+
+
+def _count_round_trip(local):
+    measurement = getattr(local, 'measurement', None)
+
+    if measurement is not None:
+        measurement.round_trips += 1
@@ -0,0 +1,250 @@
+"""
+Producers that sit between the code adding items and a set.
+
+"""
+
+import threading
+import time
+
+from redset.sets import DEFAULT_CHUNK_SIZE, _aligned_scores
+
+import logging
+log = logging.getLogger(__name__)
+
+
+__all__ = (
+    'BufferedProducer',
+)
+
+
+class BufferedProducer(object):
+    """
+    Coalesces :func:`add` calls, from any number of threads, into bulk adds
+    of many items in a single round trip.
+
+    Items are buffered locally and written to the set when ``max_batch`` of
+    them have been buffered, when the oldest of them has waited for
+    ``max_age``, on :func:`flush`, and on :func:`close` (or on leaving a
+    ``with`` block). Until then they're invisible to consumers, and they're
+    lost if the process dies.
+
+    The thread whose add fills the buffer writes it out, and flushes run
+    one at a time, so adding blocks while the set can't keep up rather than
+    letting the buffer grow: at most ``max_batch`` items, plus one per
+    blocked thread, are buffered at once.
+
+    Items are serialized and scored when they're added, so those errors
+    are raised by :func:`add`. They're written with
+    :func:`SortedSet.add_many <SortedSet.add_many>`, so flushes are measured
+    by the set's metrics. Batches that can't be written are handed, with the
+    exception, to ``on_failure`` and dropped.
+
+    Usage::
+
+        with BufferedProducer(task_set, max_batch=500) as tasks:
+            for task in incoming_tasks():
+                tasks.add(task)
+
+    """
+    def __init__(self,
+                 sorted_set,
+                 max_batch=1000,
+                 max_age=0.1,
+                 on_failure=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE,
+                 ):
+        """
+        :param sorted_set: the set to add to.
+        :type sorted_set: :class:`SortedSet <SortedSet>`
+        :param max_batch: write the buffer out once it holds this many
+            items.
+        :type max_batch: int
+        :param max_age: the maximum time in seconds an item may be buffered
+            for, enforced by a background thread. Items are only written
+            when the buffer fills or is flushed if None.
+        :type max_age: Number
+        :param on_failure: called with a list of the (item, score) pairs of
+            a batch that couldn't be written, and the exception raised. If
+            None, the failure is only logged.
+        :type on_failure: callable
+        :param chunk_size: maximum number of members per ZADD command. See
+            :func:`SortedSet.add_many <SortedSet.add_many>`.
+        :type chunk_size: int
+
+        """
+        self.sorted_set = sorted_set
+        self.max_batch = max(int(max_batch), 1)
+        self.max_age = max_age
+        self.on_failure = on_failure
+        self.chunk_size = chunk_size
+        self._buffer = []
+        self._oldest = None
+        self._closed = False
+        # guards the buffer, and wakes the flusher when it's added to
+        self._cond = threading.Condition(threading.Lock())
+        # held for the whole of a flush, so that flushes are serialized
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+
+        if max_age is not None:
+            self._flusher = threading.Thread(
+                target=self._flush_when_old,
+                name='%s flusher' % self.__class__.__name__,
+            )
+            self._flusher.daemon = True
+            self._flusher.start()
+
+    def __repr__(self):
+        return (
+            "<%s set=%s, buffered=%s>" %
+            (self.__class__.__name__, self.sorted_set.name, len(self))
+        )
+
+    __str__ = __repr__
+
+    def __len__(self):
+        """
+        How many items are buffered locally?
+
+        :returns: int
+
+        """
+        with self._cond:
+            return len(self._buffer)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add(self, item, score=None):
+        """
+        Buffer the item to be added to the set. See
+        :func:`SortedSet.add <SortedSet.add>`.
+
+        :raises: ValueError -- if the producer is closed
+
+        :returns: Number -- score the item will be added with
+
+        """
+        score = score or self.sorted_set.scorer(item)
+        # as the set serializes, since serializers needn't have dumps
+        dumps = getattr(self.sorted_set.serializer, 'dumps', None)
+        entry = (item, item if dumps is None else dumps(item), score)
+
+        with self._cond:
+            if self._closed:
+                raise ValueError(
+                    '%s for set %s is closed' %
+                    (self.__class__.__name__, self.sorted_set.name))
+
+            if not self._buffer:
+                self._oldest = time.time()
+                self._cond.notify()
+
+            self._buffer.append(entry)
+            full = len(self._buffer) >= self.max_batch
+
+        if full:
+            self.flush()
+
+        return score
+
+    def add_many(self, items, scores=None):
+        """
+        Buffer many items to be added to the set.
+
+        :returns: list of Numbers -- scores the items will be added with
+
+        """
+        items = list(items)
+
+        scores = _aligned_scores(items, scores)
+
+        return [self.add(item, score) for item, score in zip(items, scores)]
+
+    def flush(self):
+        """
+        Write out the buffered items, waiting for any flush in progress.
+
+        :returns: int -- the number of items written
+
+        """
+        with self._flush_lock:
+            with self._cond:
+                batch, self._buffer = self._buffer, []
+                self._oldest = None
+
+            if not batch:
+                return 0
+
+            __, item_strs, scores = zip(*batch)
+
+            log.debug(
+                'Flushing %d items to set %s' %
+                (len(batch), self.sorted_set.name)
+            )
+
+            try:
+                self.sorted_set.add_many(
+                    item_strs, scores, chunk_size=self.chunk_size,
+                    serialized=True)
+            except Exception as e:
+                self._failed(batch, e)
+                return 0
+
+            return len(batch)
+
+    def close(self):
+        """
+        Write out the buffered items and stop accepting more.
+
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+        if self._flusher is not None and \
+                self._flusher is not threading.current_thread():
+            self._flusher.join()
+
+        self.flush()
+
+    def _flush_when_old(self):
+        """
+        Run by the flusher thread: flush whenever the oldest buffered item
+        reaches ``max_age``.
+
+        """
+        while True:
+            with self._cond:
+                while not self._buffer and not self._closed:
+                    self._cond.wait()
+
+                if self._closed:
+                    return
+
+                wait = self._oldest + self.max_age - time.time()
+
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+
+            self.flush()
+
+    def _failed(self, batch, error):
+        log.exception(
+            'Could not add %d items to set %s' %
+            (len(batch), self.sorted_set.name)
+        )
+
+        if self.on_failure is None:
+            return
+
+        try:
+            self.on_failure(
+                [(item, score) for item, __, score in batch], error)
+        except Exception:
+            log.exception('on_failure raised for set %s' %
+                          self.sorted_set.name)
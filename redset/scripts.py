@@ -0,0 +1,268 @@
+"""
+Lua scripts run server-side to make multi-step operations atomic.
+
+"""
+
+# Redis' Lua `unpack` is bounded by the size of the C stack, so variadic
+# commands issued from scripts are sent in chunks of this many arguments.
+UNPACK_CHUNK_SIZE = 1000
+
+
+# Returns the body of an offloaded item, deleting it unless the item's id is
+# still in the sorted set or its set of claimed items.
+_TAKE_BODY_FUNCTION = """
+local function take_body(member)
+    local body = redis.call('HGET', KEYS[3], member)
+
+    if not redis.call('ZSCORE', KEYS[1], member) and
+            not redis.call('ZSCORE', KEYS[2], member) then
+        redis.call('HDEL', KEYS[3], member)
+    end
+
+    return body
+end
+"""
+
+
+# KEYS[1]: the sorted set
+# KEYS[2]: optionally, the sorted set of claimed items
+# KEYS[3]: optionally, a hash of offloaded items' bodies by id; if given,
+#   removed ids are replaced by their bodies
+# ARGV[1]: maximum score (inclusive) of items to remove
+# ARGV[2]: maximum number of items to remove
+#
+# :returns: the removed items and their scores, alternating, lowest score
+#   first
+POP_BY_SCORE = _TAKE_BODY_FUNCTION + """
+local items = redis.call(
+    'ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1],
+    'WITHSCORES', 'LIMIT', 0, ARGV[2])
+
+local members = {}
+for i = 1, #items, 2 do
+    members[#members + 1] = items[i]
+end
+
+for i = 1, #members, %(chunk)d do
+    redis.call(
+        'ZREM', KEYS[1],
+        unpack(members, i, math.min(i + %(chunk)d - 1, #members)))
+end
+
+if KEYS[3] then
+    for i = 1, #items, 2 do
+        items[i] = take_body(items[i])
+    end
+end
+
+return items
+""" % {'chunk': UNPACK_CHUNK_SIZE}
+
+
+# KEYS[1]: the set
+# KEYS[2]: the hash of offloaded item bodies
+# ARGV[1]: maximum score (inclusive) of items to peek at
+# ARGV[2]: position of the item to peek at, among those
+#
+# :returns: the item's id and its body, nil if it has none, or an empty
+#   list if there's no item at that position
+PEEK_BODY = """
+local ids = redis.call(
+    'ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', ARGV[2], 1)
+
+if not ids[1] then
+    return {}
+end
+
+return {ids[1], redis.call('HGET', KEYS[2], ids[1])}
+"""
+
+
+# KEYS: as for POP_BY_SCORE, all required
+# ARGV[1]: minimum score (inclusive unless prefixed by '(')
+# ARGV[2]: maximum score (inclusive unless prefixed by '(')
+#
+# :returns: the number of items removed
+REMOVE_BY_SCORE = _TAKE_BODY_FUNCTION + """
+local members = redis.call('ZRANGEBYSCORE', KEYS[1], ARGV[1], ARGV[2])
+
+for i = 1, #members, %(chunk)d do
+    redis.call(
+        'ZREM', KEYS[1],
+        unpack(members, i, math.min(i + %(chunk)d - 1, #members)))
+end
+
+for i = 1, #members do
+    take_body(members[i])
+end
+
+return #members
+""" % {'chunk': UNPACK_CHUNK_SIZE}
+
+
+# KEYS[1:3]: as for POP_BY_SCORE, all required
+# KEYS[4]: optionally, the hash of claimed items' original scores; if given,
+#   items are acked from the claimed set rather than discarded from the set
+# ARGV: ids of offloaded items to remove
+#
+# :returns: the number of items removed
+REMOVE_OFFLOADED = _TAKE_BODY_FUNCTION + """
+local from = KEYS[4] and KEYS[2] or KEYS[1]
+local removed = 0
+
+for i = 1, #ARGV do
+    if redis.call('ZREM', from, ARGV[i]) == 1 then
+        if KEYS[4] then
+            redis.call('HDEL', KEYS[4], ARGV[i])
+        end
+
+        take_body(ARGV[i])
+        removed = removed + 1
+    end
+end
+
+return removed
+"""
+
+
+# KEYS[1]: the lock
+# KEYS[2]: optionally, a list to signal waiters on once released
+# ARGV[1]: the token the lock was acquired with
+# ARGV[2]: milliseconds before an unconsumed release signal expires
+#
+# :returns: 1 if the lock was released, 0 if it's no longer ours
+RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+
+    if KEYS[2] then
+        redis.call('RPUSH', KEYS[2], 1)
+        redis.call('LTRIM', KEYS[2], -1, -1)
+        redis.call('PEXPIRE', KEYS[2], ARGV[2])
+    end
+
+    return 1
+end
+
+return 0
+"""
+
+
+# KEYS[1]: the sorted set
+# KEYS[2]: the sorted set of claimed items, scored by lease expiry
+# KEYS[3]: a hash of claimed items' original scores
+# ARGV[1]: maximum score (inclusive) of items to claim
+# ARGV[2]: maximum number of items to claim
+# ARGV[3]: when the claims' leases expire
+#
+# :returns: the claimed items, lowest score first
+CLAIM = """
+local items = redis.call(
+    'ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1],
+    'WITHSCORES', 'LIMIT', 0, ARGV[2])
+
+local members = {}
+for i = 1, #items, 2 do
+    redis.call('ZREM', KEYS[1], items[i])
+    redis.call('ZADD', KEYS[2], ARGV[3], items[i])
+    redis.call('HSET', KEYS[3], items[i], items[i + 1])
+    members[#members + 1] = items[i]
+end
+
+return members
+"""
+
+
+# Moves a claimed item back into the sorted set, with its original score
+# unless `score` is given. Does nothing if the item isn't claimed.
+_REQUEUE_FUNCTION = """
+local function requeue(member, score)
+    if redis.call('ZREM', KEYS[2], member) == 0 then
+        return 0
+    end
+
+    local original_score = redis.call('HGET', KEYS[3], member)
+    redis.call('HDEL', KEYS[3], member)
+    redis.call('ZADD', KEYS[1], score or original_score, member)
+
+    return 1
+end
+"""
+
+
+# KEYS: as for CLAIM
+# ARGV[1]: the score to requeue with, or '' to use the original scores
+# ARGV[2:]: the claimed items to requeue
+#
+# :returns: the number of items requeued
+REQUEUE_CLAIMED = _REQUEUE_FUNCTION + """
+local score = ARGV[1] ~= '' and ARGV[1] or nil
+local requeued = 0
+
+for i = 2, #ARGV do
+    requeued = requeued + requeue(ARGV[i], score)
+end
+
+return requeued
+"""
+
+
+# KEYS: as for CLAIM
+# ARGV[1]: now; leases expiring before now are requeued
+# ARGV[2]: maximum number of items to requeue
+#
+# :returns: the number of items requeued
+REQUEUE_EXPIRED = _REQUEUE_FUNCTION + """
+local expired = redis.call(
+    'ZRANGEBYSCORE', KEYS[2], '-inf', '(' .. ARGV[1], 'LIMIT', 0, ARGV[2])
+local requeued = 0
+
+for i = 1, #expired do
+    requeued = requeued + requeue(expired[i], nil)
+end
+
+return requeued
+"""
+
+
+# KEYS[1]: the set
+# KEYS[2]: optionally, the hash of offloaded item bodies
+# ARGV[1]: the add mode, one of 'nx', 'xx', 'gt' or 'lt', as for ZADD's flags
+# ARGV[2:]: members and scores to add, each followed by its body if KEYS[2]
+#
+# For servers without ZADD's GT and LT flags (redis < 6.2).
+#
+# :returns: the scores the members had before, nil for those not in the set
+ADD_IF = """
+local mode = ARGV[1]
+local step = KEYS[2] and 3 or 2
+local old_scores = {}
+
+for i = 2, #ARGV, step do
+    local member = ARGV[i]
+    local old = redis.call('ZSCORE', KEYS[1], member)
+    local write
+
+    if not old then
+        write = mode ~= 'xx'
+    elseif mode == 'gt' then
+        write = tonumber(ARGV[i + 1]) > tonumber(old)
+    elseif mode == 'lt' then
+        write = tonumber(ARGV[i + 1]) < tonumber(old)
+    else
+        write = mode == 'xx'
+    end
+
+    if write then
+        if KEYS[2] then
+            redis.call('HSET', KEYS[2], member, ARGV[i + 2])
+        end
+
+        redis.call('ZADD', KEYS[1], ARGV[i + 1], member)
+    end
+
+    old_scores[#old_scores + 1] = old
+end
+
+return old_scores
+"""
@@ -1,20 +1,86 @@
 
+import functools
+import hashlib
+import math
+import threading
 import time
 
+from redset import scripts
 from redset.interfaces import Serializer
 from redset.locks import Lock
+from redset.metrics import Measurement, RoundTripCounter, _clock
 
 import logging
 log = logging.getLogger(__name__)
 
 
+# how many members to send per variadic ZADD in bulk operations
+DEFAULT_CHUNK_SIZE = 1000
+
+# minimum redis server versions for optional commands
+ZPOPMIN_VERSION = (5, 0, 0)
+FLOAT_TIMEOUT_VERSION = (6, 0, 0)
+ZADD_GT_VERSION = (6, 2, 0)
+ZMSCORE_VERSION = (6, 2, 0)
+
+# modes of conditional adds, as for ZADD's flags
+NX = 'nx'  # only add items that aren't in the set
+XX = 'xx'  # only update items that are in the set
+GT = 'gt'  # add items, or update them to greater scores
+LT = 'lt'  # add items, or update them to lesser scores
+ADD_MODES = (NX, XX, GT, LT)
+
+# outcomes of conditional adds
+INSERTED = 'inserted'
+UPDATED = 'updated'
+SKIPPED = 'skipped'
+
+# shortest wait we'll ask of a blocking command; 0 would mean forever
+MIN_BLOCK_TIMEOUT = 0.001
+
+# length of the content ids that stand in for offloaded items
+OFFLOAD_ID_LENGTH = 20
+
+
 __all__ = (
     'SortedSet',
     'TimeSortedSet',
     'ScheduledSet',
+    'pop_any',
 )
 
 
+def _instrumented(func):
+    """
+    Measure calls of a set's method, named by the method, for the set's
+    metrics. Calls made while measuring another are counted towards it.
+
+    """
+    operation = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if self.metrics is None or \
+                getattr(self._local, 'measurement', None) is not None:
+            return func(self, *args, **kwargs)
+
+        measurement = Measurement(self.name, operation)
+        self._local.measurement = measurement
+        started = _clock()
+
+        try:
+            return func(self, *args, **kwargs)
+        except Exception as e:
+            measurement.error = e
+            raise
+        finally:
+            measurement.latency = _clock() - started
+            self._local.measurement = None
+            self._record(measurement)
+
+    return wrapper
+
+
 class SortedSet(object):
     """
     A Redis-backed sorted set safe for multiprocess consumption.
@@ -24,6 +90,16 @@ class SortedSet(object):
     A serializer can be specified to ease packing/unpacking of items.
     Otherwise, items are cast to and returned as strings.
 
+    Every operation is atomic on the server, by a single command, script or
+    transaction, so none of them take the set's :attr:`lock`. The exception
+    is blocking pops, which can't be made atomic with offloaded bodies and
+    so aren't supported on offloaded sets. The lock remains for callers
+    whose own critical sections span several operations, e.g.::
+
+        with tasks.lock:
+            if tasks.peek_score() < cutoff:
+                tasks.clear()
+
     """
     def __init__(self,
                  redis_client,
@@ -32,6 +108,10 @@ class SortedSet(object):
                  serializer=None,
                  lock_timeout=None,
                  lock_expires=None,
+                 lock_class=None,
+                 hash_tag=False,
+                 offload=False,
+                 metrics=None,
                  ):
         """
         :param redis_client: an object matching the interface of the
@@ -49,23 +129,78 @@ class SortedSet(object):
             Defines how objects are marshalled into redis.
         :type serializer: :class:`interfaces.Serializer
             <interfaces.Serializer>`
-        :param lock_timeout: maximum time we should wait on a lock in seconds.
-            Defaults to value set in :class:`locks.Lock <locks.Lock>`
+        :param lock_timeout: maximum time we should wait on the set's
+            :attr:`lock` in seconds. Defaults to value set in
+            :class:`locks.Lock <locks.Lock>`
         :type lock_timeout: Number
-        :param lock_expires: maximum time we should hold the lock in seconds
-            Defaults to value set in :class:`locks.Lock <locks.Lock>`
+        :param lock_expires: maximum time we should hold the set's
+            :attr:`lock` in seconds. Defaults to value set in
+            :class:`locks.Lock <locks.Lock>`
         :type lock_expires: Number
+        :param lock_class: the kind of the set's :attr:`lock`, e.g.
+            :class:`locks.TokenLock <locks.TokenLock>`. Defaults to
+            :class:`locks.Lock <locks.Lock>`. The set's own operations
+            don't take it.
+        :type lock_class: type
+        :param hash_tag: store the set under ``{name}`` (unless ``name``
+            already contains a hash tag) so that on Redis Cluster the set,
+            its lock and any other keys derived from its name are assigned
+            to the same slot, e.g. behind a cluster-aware proxy. Cluster
+            clients such as redis.RedisCluster aren't supported.
+        :type hash_tag: bool
+        :param offload: store serialized items in a companion hash,
+            ``<name>__bodies``, keyed by a short content id, and keep only
+            the ids in the sorted set. This keeps sorted set operations
+            cheap when items are large. Items are moved in and out of the
+            hash atomically with their ids. Items with equal scores are
+            ordered by their ids rather than by their serialized form.
+            Blocking pops, and :func:`pop_any`, aren't supported. Requires
+            redis >= 4.0.
+        :type offload: bool
+        :param metrics: receives a measurement of each operation on the set:
+            its latency, round trips to redis, and the items, bytes and
+            deserialization failures involved. Must match the interface of
+            `redset.interfaces.Metrics`, e.g.
+            :class:`metrics.HistogramMetrics
+            <redset.metrics.HistogramMetrics>`. Nothing is measured if None.
+        :type metrics: :class:`interfaces.Metrics <interfaces.Metrics>`
 
         """
-        self._name = name
-        self.redis = redis_client
+        self._name = _hash_tagged(name) if hash_tag else name
+        self.metrics = metrics
+        # holds the measurement of the operation in progress in each thread
+        self._local = threading.local()
+
+        if metrics is None:
+            self.redis = redis_client
+        else:
+            self.redis = RoundTripCounter(redis_client, self._local)
+
         self.scorer = scorer or _default_scorer
         self.serializer = serializer or _DefaultSerializer()
-        self.lock = Lock(
+        # for callers' own critical sections; set operations don't take it
+        self.lock = (lock_class or Lock)(
             self.redis,
             '%s__lock' % self.name,
             expires=lock_expires,
             timeout=lock_timeout)
+        self.inflight_key = '%s__inflight' % self.name
+        self.claims_key = '%s__claims' % self.name
+        self.bodies_key = '%s__bodies' % self.name if offload else None
+        self._pop_script = self.redis.register_script(scripts.POP_BY_SCORE)
+        self._add_if_script = self.redis.register_script(scripts.ADD_IF)
+        self._peek_body_script = self.redis.register_script(
+            scripts.PEEK_BODY)
+        self._remove_offloaded_script = self.redis.register_script(
+            scripts.REMOVE_OFFLOADED)
+        self._remove_by_score_script = self.redis.register_script(
+            scripts.REMOVE_BY_SCORE)
+        self._claim_script = self.redis.register_script(scripts.CLAIM)
+        self._requeue_claimed_script = self.redis.register_script(
+            scripts.REQUEUE_CLAIMED)
+        self._requeue_expired_script = self.redis.register_script(
+            scripts.REQUEUE_EXPIRED)
+        self._redis_version = None
 
     def __repr__(self):
         return (
@@ -87,6 +222,25 @@ class SortedSet(object):
     def __contains__(self, item):
         return (self.score(item) is not None)
 
+    @property
+    def serializer(self):
+        """
+        How items are marshalled into redis. See
+        `redset.interfaces.Serializer`.
+
+        """
+        return self._serializer
+
+    @serializer.setter
+    def serializer(self, serializer):
+        # look up the serializer's routines once rather than on every item
+        self._serializer = serializer
+        self._loads = getattr(serializer, 'loads', None)
+        self._dumps = getattr(serializer, 'dumps', None)
+        self._loads_many = getattr(serializer, 'loads_many', None)
+        self._dumps_many = getattr(serializer, 'dumps_many', None)
+        self._binary = getattr(serializer, 'binary', False)
+
     @property
     def name(self):
         """
@@ -98,7 +252,8 @@ class SortedSet(object):
         """
         return self._name
 
-    def add(self, item, score=None):
+    @_instrumented
+    def add(self, item, score=None, mode=None):
         """
         Add the item to the set. If the item is already in the set, update its
         score.
@@ -108,20 +263,108 @@ class SortedSet(object):
         :param score: optionally specify the score for the item
             to be added.
         :type score: Number
-
-        :returns: Number -- score the item was added with
+        :param mode: add or update the item only on a condition, checked
+            atomically in the same round trip: `NX` only adds it if it isn't
+            in the set, `XX` only updates it if it is, and `GT` and `LT` add
+            it, or only update it if ``score`` is greater or lesser than its
+            current score. E.g. ``mode=LT`` schedules an item on a
+            ScheduledSet unless it's already scheduled earlier.
+        :type mode: one of `ADD_MODES`
+
+        :returns: Number -- score the item was added with or, with a
+            ``mode``, `INSERTED`, `UPDATED` if its score changed, or
+            `SKIPPED`
 
         """
+        _check_mode(mode)
         score = score or self.scorer(item)
 
         log.debug(
             'Adding %s to set %s with score: %s' % (item, self.name, score)
         )
-        self.redis.zadd(self.name, self._dump_item(item), score)
+
+        if mode is not None:
+            return self._add_strs_if([self._dump_item(item)], [score], mode)[0]
+
+        self._add_strs([self._dump_item(item)], [score])
 
         return score
 
-    def pop(self):
+    @_instrumented
+    def add_many(self,
+                 items,
+                 scores=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE,
+                 mode=None,
+                 serialized=False,
+                 ):
+        """
+        Add many items to the set in as few round trips as possible. Items
+        already in the set have their scores updated.
+
+        The items are written with variadic ZADDs of at most ``chunk_size``
+        members each, all sent within a single pipeline.
+
+        :param items:
+        :type items: iterable of objects
+        :param scores: optionally specify the scores for the items, aligned
+            with ``items``.
+        :type scores: iterable of Numbers
+        :param chunk_size: maximum number of members per ZADD command.
+        :type chunk_size: int
+        :param mode: add or update each item only on a condition. See
+            :func:`add <SortedSet.add>`. Items repeated in ``items`` are
+            checked in order.
+        :type mode: one of `ADD_MODES`
+        :param serialized: the items were already serialized with the set's
+            serializer, e.g. as they arrived. Their ``scores`` are then
+            required and used as given, since the scorer takes unserialized
+            items.
+        :type serialized: bool
+
+        :returns: list of Numbers -- scores the items were added with or,
+            with a ``mode``, the outcome for each item. See
+            :func:`add <SortedSet.add>`.
+
+        """
+        _check_mode(mode)
+        items = list(items)
+
+        if serialized and scores is None:
+            raise ValueError('Scores are required for serialized items')
+
+        scores = _aligned_scores(items, scores)
+
+        if not serialized:
+            scores = [
+                score or self.scorer(item)
+                for item, score in zip(items, scores)
+            ]
+
+        if not items:
+            return scores
+
+        if serialized:
+            item_strs = items
+
+            if self.metrics is not None:
+                self._note_items(item_strs)
+        else:
+            item_strs = self._dump_items(items)
+
+        log.debug(
+            'Adding %d items to set %s' % (len(item_strs), self.name)
+        )
+
+        if mode is not None:
+            return self._add_strs_if(item_strs, scores, mode, chunk_size)
+
+        self._add_strs(item_strs, scores, chunk_size)
+
+        return scores
+
+    @_instrumented
+    def pop(self, block=False, timeout=None):
         """
         Atomically remove and return the next item eligible for processing in
         the set.
@@ -129,19 +372,31 @@ class SortedSet(object):
         If, for some reason, deserializing the object fails, None is returned
         and the object is deleted from redis.
 
+        :param block: if the set is empty, wait on the server (using
+            BZPOPMIN, which requires redis >= 5.0) until an item is added.
+        :type block: bool
+        :param timeout: when blocking, the maximum time to wait in seconds.
+            Waits forever if None.
+        :type timeout: Number
         :raises: KeyError -- if no items left
+        :raises: TypeError -- if blocking on an offloaded set
 
         :returns: object.
 
         """
-        item = self._pop_item()
+        if block:
+            self._check_blocking()
+            item = self._blocking_pop_item(timeout)
+        else:
+            item = self._pop_item()
 
         if not item:
             raise KeyError('%s is empty' % self)
 
         return item
 
-    def take(self, num):
+    @_instrumented
+    def take(self, num, block=False, timeout=None):
         """
         Atomically remove and return the next ``num`` items for processing in
         the set.
@@ -149,6 +404,14 @@ class SortedSet(object):
         Will return at most ``min(num, len(self))`` items. If certain items
         fail to deserialize, the falsey value returned will be filtered out.
 
+        :param block: if the set is empty, wait on the server until an item
+            is added, then return whatever is available.
+        :type block: bool
+        :param timeout: when blocking, the maximum time to wait in seconds.
+            Waits forever if None.
+        :type timeout: Number
+        :raises: TypeError -- if blocking on an offloaded set
+
         :returns: list of objects
 
         """
@@ -157,18 +420,43 @@ class SortedSet(object):
         if num < 1:
             return []
 
-        return self._pop_items(num)
+        if not block:
+            return self._pop_items(num)
+
+        self._check_blocking()
+
+        item_strs = self._get_and_remove_items(num)
+
+        if not item_strs:
+            item_str = self._blocking_get_and_remove_item(timeout)
+
+            if item_str is None:
+                return []
+
+            item_strs = [item_str]
+
+            if num > 1:
+                item_strs.extend(self._get_and_remove_items(num - 1))
+
+        return self._load_items(item_strs)
 
+    @_instrumented
     def clear(self):
         """
-        Empty the set of all scores and ID strings.
+        Empty the set of all scores and ID strings, including claimed items.
 
         :returns: bool
 
         """
         log.debug('Flushing set %s' % self.name)
-        return self.redis.delete(self.name)
+        keys = [self.name, self.inflight_key, self.claims_key]
 
+        if self.bodies_key:
+            keys.append(self.bodies_key)
+
+        return self.redis.delete(*keys)
+
+    @_instrumented
     def discard(self, item):
         """
         Remove a given item from the set.
@@ -180,6 +468,27 @@ class SortedSet(object):
         """
         return self._discard_by_str(self._dump_item(item))
 
+    @_instrumented
+    def discard_many(self, items, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Remove many items from the set, with variadic ZREMs of at most
+        ``chunk_size`` members each, all sent within a single pipeline.
+
+        :param items:
+        :type items: iterable of objects
+        :param chunk_size: maximum number of members per ZREM command.
+        :type chunk_size: int
+        :returns: int -- the number of items removed
+
+        """
+        item_strs = self._dump_items(list(items))
+
+        if not item_strs:
+            return 0
+
+        return self._remove_strs(item_strs, chunk_size)
+
+    @_instrumented
     def peek(self, position=0):
         """
         Return the an item without removing it.
@@ -190,8 +499,14 @@ class SortedSet(object):
         :returns: object
 
         """
-        return self._load_item(self._peek_str(position))
+        item_str = self._peek_str(position)
+
+        if self.metrics is not None:
+            self._note_items([item_str])
+
+        return self._load_item(item_str)
 
+    @_instrumented
     def score(self, item):
         """
         See what the score for an item is.
@@ -199,7 +514,63 @@ class SortedSet(object):
         :returns: Number or None.
 
         """
-        return self.redis.zscore(self.name, self._dump_item(item))
+        return self.redis.zscore(
+            self.name, self._member(self._dump_item(item)))
+
+    @_instrumented
+    def scores_many(self, items, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        See what the scores for many items are, in a single round trip.
+
+        Uses ZMSCORE, which requires redis >= 6.2, with at most
+        ``chunk_size`` members each; older servers are sent a ZSCORE per
+        item within a pipeline.
+
+        :param items:
+        :type items: iterable of objects
+        :param chunk_size: maximum number of members per ZMSCORE command.
+        :type chunk_size: int
+        :returns: list of Numbers or Nones, aligned with ``items``
+
+        """
+        item_strs = self._dump_items(list(items))
+
+        if not item_strs:
+            return []
+
+        members = self._members(item_strs)
+        pipe = self.redis.pipeline(transaction=False)
+
+        if not self._server_supports(ZMSCORE_VERSION):
+            for member in members:
+                pipe.zscore(self.name, member)
+
+            return pipe.execute()
+
+        chunk_size = max(int(chunk_size), 1)
+
+        for start in range(0, len(members), chunk_size):
+            pipe.execute_command(
+                'ZMSCORE', self.name, *members[start:start + chunk_size])
+
+        return [
+            None if score is None else float(score)
+            for reply in pipe.execute()
+            for score in reply
+        ]
+
+    def contains_many(self, items, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Which of many items are in the set? See :func:`scores_many
+        <SortedSet.scores_many>`.
+
+        :returns: list of bools, aligned with ``items``
+
+        """
+        return [
+            score is not None
+            for score in self.scores_many(items, chunk_size)
+        ]
 
     def peek_score(self):
         """
@@ -213,11 +584,360 @@ class SortedSet(object):
 
         return res[0][1] if res else None
 
+    @_instrumented
+    def peek_many(self, num, with_scores=True):
+        """
+        Return the next ``num`` items eligible for processing without
+        removing them, in a single round trip.
+
+        :param num:
+        :type num: int
+        :param with_scores: return (item, score) pairs.
+        :type with_scores: bool
+
+        :returns: list of (object, Number) pairs, or of objects
+
+        """
+        num = int(num)
+
+        if num < 1:
+            return []
+
+        page = self._get_items(num, with_score=True)
+
+        return self._load_page(page, with_scores)
+
+    @_instrumented
+    def items_between(self,
+                      min_score,
+                      max_score,
+                      limit=None,
+                      with_scores=False,
+                      ):
+        """
+        Return the items scored between ``min_score`` and ``max_score``,
+        lowest score first, without removing them.
+
+        :param min_score: inclusive, unless given as a str prefixed by '('.
+        :type min_score: Number or str, e.g. '-inf' or '(1.5'
+        :param max_score: inclusive, unless given as a str prefixed by '('.
+        :type max_score: Number or str, e.g. '+inf' or '(1.5'
+        :param limit: the maximum number of items to return. Unbounded if
+            None.
+        :type limit: int
+        :param with_scores: return (item, score) pairs.
+        :type with_scores: bool
+
+        :returns: list of objects, or of (object, Number) pairs
+
+        """
+        if limit is None:
+            start = num = None
+        else:
+            start, num = 0, int(limit)
+
+            if num < 1:
+                return []
+
+        page = self.redis.zrangebyscore(
+            self.name,
+            min_score,
+            max_score,
+            start=start,
+            num=num,
+            withscores=True,
+        )
+
+        return self._load_page(page, with_scores)
+
+    @_instrumented
+    def count_between(self, min_score, max_score):
+        """
+        The count of items scored between ``min_score`` and ``max_score``.
+        See :func:`items_between`.
+
+        :returns: int
+
+        """
+        return int(self.redis.zcount(self.name, min_score, max_score))
+
+    @_instrumented
+    def remove_between(self, min_score, max_score):
+        """
+        Remove the items scored between ``min_score`` and ``max_score``.
+        See :func:`items_between`. Claimed items aren't affected.
+
+        :returns: int -- the number of items removed
+
+        """
+        log.debug(
+            'Removing items scored %s to %s from set %s' %
+            (min_score, max_score, self.name)
+        )
+
+        if self.bodies_key:
+            return self._remove_by_score_script(
+                keys=[self.name, self.inflight_key, self.bodies_key],
+                args=[min_score, max_score],
+            )
+
+        return int(self.redis.zremrangebyscore(
+            self.name, min_score, max_score))
+
+    @_instrumented
+    def claim(self, num, lease):
+        """
+        Atomically move the next ``num`` items eligible for processing into
+        a companion set of claimed items, and return them.
+
+        Unlike :func:`take`, claimed items aren't lost if the consumer
+        crashes: each must be passed to :func:`ack` once processed, or to
+        :func:`nack` to put it back. Claims not acked within ``lease``
+        seconds are put back by :func:`requeue_expired`.
+
+        Items that fail to deserialize are acked and filtered out.
+
+        :param num:
+        :type num: int
+        :param lease: how many seconds the consumer has to process the items.
+        :type lease: Number
+
+        :returns: list of objects
+
+        """
+        num = int(num)
+
+        if num < 1:
+            return []
+
+        members = self._claim_script(
+            keys=self._claim_keys(),
+            args=[self._claimable_max_score(), num, time.time() + lease],
+        )
+
+        if self.bodies_key and members:
+            # claimed bodies stay put until the items are acked
+            item_strs = self.redis.hmget(self.bodies_key, members)
+        else:
+            item_strs = members
+
+        res = []
+        failed = []
+
+        for member, item_str in zip(members, item_strs):
+            try:
+                res.append(self._load_item(self._decode(item_str)))
+            except Exception:
+                log.exception("Could not deserialize '%s'" % item_str)
+                failed.append(member)
+
+        if self.metrics is not None:
+            self._note_items(item_strs, failures=len(failed))
+
+        if failed:
+            self._ack_members(failed)
+
+        return res
+
+    @_instrumented
+    def ack(self, items):
+        """
+        Mark claimed items as processed, removing them for good.
+
+        :param items:
+        :type items: iterable of objects
+        :returns: int -- the number of items that were still claimed
+
+        """
+        return self._ack_members(self._members(self._dump_items(list(items))))
+
+    @_instrumented
+    def nack(self, items, delay=None):
+        """
+        Put claimed items back in the set for processing by another consumer.
+
+        :param items:
+        :type items: iterable of objects
+        :param delay: if given, items are put back with a score of
+            ``time.time() + delay``, which for a
+            :class:`ScheduledSet <ScheduledSet>` defers them by ``delay``
+            seconds. Otherwise, items keep the score they were claimed with.
+        :type delay: Number
+        :returns: int -- the number of items that were still claimed
+
+        """
+        members = self._members(self._dump_items(list(items)))
+
+        if not members:
+            return 0
+
+        score = '' if delay is None else time.time() + delay
+
+        return self._requeue_claimed_script(
+            keys=self._claim_keys(),
+            args=[score] + members,
+        )
+
+    @_instrumented
+    def requeue_expired(self, limit=DEFAULT_CHUNK_SIZE):
+        """
+        Put claimed items whose lease expired back in the set, with the
+        scores they were claimed with. Run this periodically from any
+        process to recover the claims of crashed consumers.
+
+        :param limit: the maximum number of items to requeue.
+        :type limit: int
+        :returns: int -- the number of items requeued
+
+        """
+        return self._requeue_expired_script(
+            keys=self._claim_keys(),
+            args=[time.time(), int(limit)],
+        )
+
+    def in_flight(self):
+        """
+        The count of items claimed but not yet acked or requeued.
+
+        :returns: int
+
+        """
+        return int(self.redis.zcard(self.inflight_key))
+
+    def iter_items(self, with_scores=False, page_size=DEFAULT_CHUNK_SIZE):
+        """
+        Iterate over every item in the set, lowest score first, without
+        removing them. Items are fetched by rank, ``page_size`` at a time,
+        and deserialized a page at a time, so memory use doesn't grow with
+        the size of the set.
+
+        Items added or removed while iterating shift the ranks of the items
+        after them, which may then be skipped or seen twice; see
+        :func:`iter_range` for iterating over a set that's in use.
+
+        :param with_scores: yield (item, score) pairs.
+        :type with_scores: bool
+        :param page_size: how many items to fetch per round trip.
+        :type page_size: int
+
+        :returns: iterator of objects, or of (object, Number) pairs
+
+        """
+        page_size = max(int(page_size), 1)
+        start = 0
+
+        while True:
+            page = self.redis.zrange(
+                self.name,
+                start,
+                start + page_size - 1,
+                withscores=True,
+            )
+
+            for item in self._load_page(page, with_scores):
+                yield item
+
+            if len(page) < page_size:
+                return
+
+            start += page_size
+
+    def iter_range(self,
+                   min_score='-inf',
+                   max_score='+inf',
+                   with_scores=False,
+                   page_size=DEFAULT_CHUNK_SIZE,
+                   ):
+        """
+        Iterate over the items scored between ``min_score`` and
+        ``max_score`` (inclusive), lowest score first, without removing
+        them. Pages of ``page_size`` items are fetched with ZRANGEBYSCORE,
+        each resuming after the score and member of the last item seen, and
+        are deserialized a page at a time, so memory use doesn't grow with
+        the size of the set.
+
+        Items are never yielded twice, even if items are added while
+        iterating. Items removed while iterating may cause items sharing the
+        last seen score to be skipped.
+
+        :param min_score:
+        :type min_score: Number or str, e.g. '-inf' or '(1.5'
+        :param max_score:
+        :type max_score: Number or str, e.g. '+inf' or '(1.5'
+        :param with_scores: yield (item, score) pairs.
+        :type with_scores: bool
+        :param page_size: how many items to fetch per round trip.
+        :type page_size: int
+
+        :returns: iterator of objects, or of (object, Number) pairs
+
+        """
+        page_size = max(int(page_size), 1)
+        lower = min_score
+        offset = 0
+        last = None
+
+        while True:
+            page = self.redis.zrangebyscore(
+                self.name,
+                lower,
+                max_score,
+                start=offset,
+                num=page_size,
+                withscores=True,
+            )
+
+            if last is not None:
+                # items added since the last page shift it along; skip any
+                # at or before the last (score, member) already yielded
+                fresh = [
+                    (member, score) for member, score in page
+                    if (score, member) > last
+                ]
+            else:
+                fresh = page
+
+            for item in self._load_page(fresh, with_scores):
+                yield item
+
+            if len(page) < page_size:
+                return
+
+            last_member, last_score = page[-1]
+            ties = sum(1 for __, score in page if score == last_score)
+
+            # resume at the last score, past the members already seen there
+            if last is not None and last[0] == last_score:
+                offset += ties
+            else:
+                offset = ties
+
+            lower = last_score
+            last = (last_score, last_member)
+
     def _peek_str(self, position=0):
         """
         Internal peek to allow peeking by str.
 
         """
+        if self.bodies_key:
+            # the id and its body are read together, so that the item can't
+            # be popped in between
+            res = self._peek_body_script(
+                keys=[self.name, self.bodies_key],
+                args=[self._claimable_max_score(), int(position)],
+            )
+
+            if not res:
+                raise KeyError("%s is empty" % self.name)
+
+            if res[1] is None:
+                raise KeyError(
+                    "%s has no body for the item at position %s" %
+                    (self.name, position))
+
+            return res[1]
+
         results = self._get_item(position)
 
         if not results:
@@ -225,6 +945,121 @@ class SortedSet(object):
 
         return results[0]
 
+    def _add_strs(self, item_strs, scores, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Internal add of serialized items, written with variadic ZADDs of at
+        most ``chunk_size`` members in a single pipeline. When offloading,
+        the pipeline is a transaction, so that a concurrent pop can't delete
+        the body of an id being added again between the two writes.
+
+        """
+        chunk_size = max(int(chunk_size), 1)
+        pipe = self.redis.pipeline(transaction=bool(self.bodies_key))
+
+        for start in range(0, len(item_strs), chunk_size):
+            chunk = item_strs[start:start + chunk_size]
+            members = self._members(chunk)
+            args = []
+
+            if self.bodies_key:
+                for member, item_str in zip(members, chunk):
+                    args.extend((member, item_str))
+
+                pipe.execute_command('HSET', self.bodies_key, *args)
+                args = []
+
+            for member, score in zip(
+                    members, scores[start:start + chunk_size]):
+                args.extend((member, score))
+
+            pipe.zadd(self.name, *args)
+
+        self._after_add(pipe, scores)
+        pipe.execute()
+
+    def _add_strs_if(self,
+                     item_strs,
+                     scores,
+                     mode,
+                     chunk_size=DEFAULT_CHUNK_SIZE,
+                     ):
+        """
+        Internal conditional add of serialized items. Uses ZADD's flags
+        where the server has them all, and otherwise a script, which also
+        keeps offloaded bodies to the items actually added.
+
+        :returns: list of `INSERTED`, `UPDATED` or `SKIPPED`
+
+        """
+        chunk_size = max(int(chunk_size), 1)
+        native = not self.bodies_key and \
+            self._server_supports(ZADD_GT_VERSION)
+        # the scores are read and written in one transaction
+        pipe = self.redis.pipeline(transaction=native)
+        keys = [self.name]
+        num_chunks = 0
+
+        if self.bodies_key:
+            keys.append(self.bodies_key)
+
+        for start in range(0, len(item_strs), chunk_size):
+            chunk = item_strs[start:start + chunk_size]
+            members = self._members(chunk)
+            chunk_scores = scores[start:start + chunk_size]
+            num_chunks += 1
+
+            if native:
+                args = [mode.upper()]
+
+                for member, score in zip(members, chunk_scores):
+                    args.extend((score, member))
+
+                pipe.execute_command('ZMSCORE', self.name, *members)
+                pipe.execute_command('ZADD', self.name, *args)
+                continue
+
+            args = [mode]
+
+            for member, score, item_str in zip(members, chunk_scores, chunk):
+                args.extend((member, score))
+
+                if self.bodies_key:
+                    args.append(item_str)
+
+            self._add_if_script(keys=keys, args=args, client=pipe)
+
+        self._after_add(pipe, scores)
+        replies = pipe.execute()
+
+        step = 2 if native else 1
+        old_scores = [
+            old_score
+            for reply in replies[:num_chunks * step:step]
+            for old_score in reply
+        ]
+
+        # with repeated items, later ones see the scores set by earlier ones
+        seen = {}
+        res = []
+
+        for item_str, score, old_score in zip(item_strs, scores, old_scores):
+            old_score = seen.get(item_str, old_score)
+            outcome = _add_outcome(mode, old_score, score)
+
+            if outcome != SKIPPED:
+                seen[item_str] = score
+
+            res.append(outcome)
+
+        return res
+
+    def _after_add(self, pipe, scores):
+        """
+        Hook for queueing extra commands on the pipeline that adds items.
+
+        """
+        pass
+
     def _pop_item(self):
         """
         Internal method for returning the next item without locking.
@@ -233,34 +1068,125 @@ class SortedSet(object):
         res_list = self._pop_items(1)
         return res_list[0] if res_list else None
 
-    def _pop_items(self, num_items):
+    def _pop_items(self, num_items, with_scores=False):
         """
         Internal method for poping items atomically from redis.
 
-        :returns: [loaded_item, ...]. if we can't deserialize a particular
-            item, just skip it.
+        :returns: [loaded_item, ...] or [(loaded_item, score), ...]. if we
+            can't deserialize a particular item, just skip it.
 
         """
-        res = []
+        return self._load_items(
+            self._get_and_remove_items(num_items, with_scores),
+            with_scores)
 
-        item_strs = self._get_and_remove_items(num_items)
+    def _blocking_pop_item(self, timeout=None):
+        """
+        Internal method for returning the next item, waiting for one to be
+        added if the set is empty.
+
+        """
+        item_str = self._blocking_get_and_remove_item(timeout)
+
+        if item_str is None:
+            return None
+
+        res_list = self._load_items([item_str])
+        return res_list[0] if res_list else None
+
+    def _load_items(self, item_strs, with_scores=False):
+        """
+        Deserialize a list of strs, or of (str, score) pairs if
+        ``with_scores``, popped from redis.
+
+        :returns: [loaded_item, ...] or [(loaded_item, score), ...]. if we
+            can't deserialize a particular item, just skip it.
 
-        for item_str in item_strs:
-            item_str = _py3_compat_decode(item_str)
+        """
+        if with_scores:
+            scores = [score for __, score in item_strs]
+            item_strs = [item_str for item_str, __ in item_strs]
+
+        item_strs = [self._decode(item_str) for item_str in item_strs]
+
+        if self._loads_many is not None and item_strs:
             try:
-                res.append(self._load_item(item_str))
+                items = list(self._loads_many(item_strs))
             except Exception:
-                log.exception("Could not deserialize '%s'" % res)
+                # fall back to loading one at a time to skip the bad ones
+                log.debug('Could not deserialize batch of %d' % len(item_strs))
+                items = None
+
+            if items is not None and len(items) != len(item_strs):
+                # e.g. a member that splits in two would shift later items
+                log.warning(
+                    'Deserialized batch of %d into %d items' %
+                    (len(item_strs), len(items)))
+                items = None
+
+            if items is not None:
+                if self.metrics is not None:
+                    self._note_items(item_strs)
+
+                return list(zip(items, scores)) if with_scores else items
+
+        res = []
+
+        for i, item_str in enumerate(item_strs):
+            try:
+                item = self._load_item(item_str)
+            except Exception:
+                log.exception("Could not deserialize '%s'" % item_str)
+                continue
+
+            res.append((item, scores[i]) if with_scores else item)
+
+        if self.metrics is not None:
+            self._note_items(item_strs, failures=len(item_strs) - len(res))
 
         return res
 
-    def _get_and_remove_items(self, num_items):
+    def _load_page(self, page, with_scores=False):
+        """
+        Deserialize a page of (member, score) pairs read from the set,
+        without removing them.
+
+        :returns: [loaded_item, ...] or [(loaded_item, score), ...]
+
+        """
+        if self.bodies_key and page:
+            bodies = self.redis.hmget(
+                self.bodies_key, [member for member, __ in page])
+            # items popped since the page was read have lost their bodies
+            page = [
+                (body, score)
+                for body, (__, score) in zip(bodies, page)
+                if body is not None
+            ]
+
+        res = self._load_items(page, with_scores=True)
+
+        return res if with_scores else [item for item, __ in res]
+
+    def _get_and_remove_items(self, num_items, with_scores=False):
         """
         get and remove items from the redis store.
 
-        :returns: [str, ...]
+        Uses ZPOPMIN on servers that support it (>= 5.0), otherwise falls
+        back to a ZRANGE and ZREMRANGEBYRANK in a transaction.
+
+        :returns: [str, ...] or [(str, float), ...]
 
         """
+        if self.bodies_key:
+            return self._pop_by_score('+inf', num_items, with_scores)
+
+        if self._server_supports(ZPOPMIN_VERSION):
+            # ZPOPMIN replies with alternating members and scores
+            res = self.redis.execute_command('ZPOPMIN', self.name, num_items)
+
+            return _score_pairs(res) if with_scores else res[::2]
+
         pipe = self.redis.pipeline()
 
         (pipe
@@ -268,7 +1194,7 @@ class SortedSet(object):
              self.name,
              0,
              num_items - 1,
-             withscores=False)
+             withscores=with_scores)
          .zremrangebyrank(
              self.name,
              0,
@@ -277,18 +1203,119 @@ class SortedSet(object):
 
         return pipe.execute()[0]
 
+    def _pop_by_score(self, max_score, num_items, with_scores=False):
+        """
+        Get and remove up to ``num_items`` items scored at most
+        ``max_score`` from the redis store, with a single script.
+
+        :returns: [str, ...] or [(str, float), ...]
+
+        """
+        if self.bodies_key:
+            keys = [self.name, self.inflight_key, self.bodies_key]
+        else:
+            keys = [self.name]
+
+        # the script replies with alternating members and scores
+        res = self._pop_script(keys=keys, args=[max_score, num_items])
+
+        return _score_pairs(res) if with_scores else res[::2]
+
+    def _claim_keys(self):
+        return [self.name, self.inflight_key, self.claims_key]
+
+    def _claimable_max_score(self):
+        """
+        The highest score of items that may be claimed.
+
+        """
+        return '+inf'
+
+    def _ack_members(self, members):
+        """
+        Internal ack by the members of the claimed set.
+
+        """
+        if not members:
+            return 0
+
+        if self.bodies_key:
+            return self._remove_offloaded_script(
+                keys=[self.name, self.inflight_key, self.bodies_key,
+                      self.claims_key],
+                args=members,
+            )
+
+        pipe = self.redis.pipeline()
+        pipe.zrem(self.inflight_key, *members)
+        pipe.hdel(self.claims_key, *members)
+
+        return pipe.execute()[0]
+
+    def _blocking_get_and_remove_item(self, timeout=None):
+        """
+        Remove and return the next item str from the redis store, blocking on
+        the server until one is available.
+
+        :returns: str or None if ``timeout`` elapsed.
+
+        """
+        res = self.redis.execute_command(
+            'BZPOPMIN', self.name, self._block_timeout(timeout))
+
+        if not res:
+            return None
+
+        # BZPOPMIN replies with [key, member, score]
+        return res[1]
+
+    def _check_blocking(self):
+        """
+        Blocking pops wait with BZPOPMIN, which can't take an offloaded
+        body along with its id, so a body could be orphaned between the two.
+
+        :raises: TypeError -- if the set is offloaded
+
+        """
+        if self.bodies_key:
+            raise TypeError("Can't block on offloaded %s" % self)
+
     def _discard_by_str(self, *item_strs):
         """
         Internal discard to allow discarding by the str representation of
         an item.
 
+        :returns: bool -- whether all of the items were removed
+
         """
-        pipe = self.redis.pipeline()
+        return self._remove_strs(item_strs) == len(set(item_strs))
+
+    def _remove_strs(self, item_strs, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Internal removal of serialized items, with variadic ZREMs, or
+        removal scripts when offloading, of at most ``chunk_size`` members
+        in a single pipeline.
+
+        :returns: int -- the number of items removed
+
+        """
+        chunk_size = max(int(chunk_size), 1)
+        members = self._members(item_strs)
+        pipe = self.redis.pipeline(transaction=False)
+
+        for start in range(0, len(members), chunk_size):
+            chunk = members[start:start + chunk_size]
 
-        for item in item_strs:
-            pipe.zrem(self.name, item)
+            if self.bodies_key:
+                self._remove_offloaded_script(
+                    keys=[self.name, self.inflight_key, self.bodies_key],
+                    args=chunk,
+                    client=pipe,
+                )
+            else:
+                pipe.zrem(self.name, *chunk)
 
-        return all(pipe.execute())
+        return sum(pipe.execute())
 
     def _get_item(self, position, with_score=False):
         """
@@ -306,6 +1333,21 @@ class SortedSet(object):
             withscores=with_score,
         )
 
+    def _get_items(self, num_items, with_score=False):
+        """
+        Returns the first ``num_items`` elements eligible for processing from
+        the redis store, without removing them.
+
+        :returns: [str, ...] or [(str, float), ...]
+
+        """
+        return self.redis.zrange(
+            self.name,
+            0,
+            num_items - 1,
+            withscores=with_score,
+        )
+
     def _get_next_item(self, with_score=False):
         """
         :returns: [str] or [str, float]. item optionally with score, without
@@ -314,29 +1356,131 @@ class SortedSet(object):
         """
         return self._get_item(0, with_score)
 
+    def _server_supports(self, version):
+        """
+        Is the redis server at least ``version``? The server's version is
+        looked up once and cached.
+
+        :param version:
+        :type version: tuple of ints
+        :returns: bool
+
+        """
+        if self._redis_version is None:
+            self._redis_version = _parse_version(
+                self.redis.info('server')['redis_version'])
+
+        return self._redis_version >= version
+
+    def _block_timeout(self, timeout):
+        """
+        Convert a timeout in seconds into one for blocking redis commands,
+        which wait forever on a timeout of 0 and, before redis 6.0, only
+        accept whole seconds.
+
+        """
+        if timeout is None:
+            return 0
+
+        if self._server_supports(FLOAT_TIMEOUT_VERSION):
+            return max(timeout, MIN_BLOCK_TIMEOUT)
+
+        return max(int(math.ceil(timeout)), 1)
+
+    def _member(self, item_str):
+        """
+        The sorted set member standing in for a serialized item: the item
+        itself, or its content id if items are offloaded.
+
+        """
+        if not self.bodies_key:
+            return item_str
+
+        if not isinstance(item_str, bytes):
+            # the default serializer leaves it to redis-py to stringify items
+            item_str = str(item_str).encode('utf-8')
+
+        return hashlib.sha1(item_str).hexdigest()[:OFFLOAD_ID_LENGTH]
+
+    def _members(self, item_strs):
+        if not self.bodies_key:
+            return item_strs
+
+        return [self._member(item_str) for item_str in item_strs]
+
+    def _decode(self, item_str):
+        """
+        Decode a str from redis, unless the serializer wants raw bytes.
+        Missing offloaded bodies come back as None, which fails to load.
+
+        """
+        if item_str is None:
+            return None
+
+        return item_str if self._binary else _py3_compat_decode(item_str)
+
     def _load_item(self, item):
         """
         Conditionally deserialize if a routine was specified.
 
         """
-        try:
-            self.serializer.loads
-        except AttributeError:
+        if self._loads is None:
             return _py3_compat_decode(item)
 
-        return self.serializer.loads(item)
+        return self._loads(item)
 
     def _dump_item(self, item):
         """
         Conditionally serialize if a routine was specified.
 
         """
-        try:
-            self.serializer.dumps
-        except AttributeError:
-            return item
+        item_str = item if self._dumps is None else self._dumps(item)
+
+        if self.metrics is not None:
+            self._note_items([item_str])
 
-        return self.serializer.dumps(item)
+        return item_str
+
+    def _dump_items(self, items):
+        """
+        Serialize a list of items, in one call if the serializer supports
+        it.
+
+        """
+        if self._dumps_many is not None:
+            item_strs = list(self._dumps_many(items))
+        elif self._dumps is not None:
+            item_strs = [self._dumps(item) for item in items]
+        else:
+            item_strs = list(items)
+
+        if self.metrics is not None:
+            self._note_items(item_strs)
+
+        return item_strs
+
+    def _note_items(self, item_strs, failures=0):
+        """
+        Count serialized items towards the measurement of the operation in
+        progress, if any.
+
+        """
+        measurement = getattr(self._local, 'measurement', None)
+
+        if measurement is None:
+            return
+
+        measurement.items += len(item_strs) - failures
+        measurement.failures += failures
+        measurement.nbytes += sum(_size(item_str) for item_str in item_strs)
+
+    def _record(self, measurement):
+        try:
+            self.metrics.record(measurement)
+        except Exception:
+            log.exception(
+                'Could not record %s of set %s' %
+                (measurement.operation, self.name))
 
 
 class TimeSortedSet(SortedSet):
@@ -373,22 +1517,130 @@ class ScheduledSet(TimeSortedSet):
     time.time() - to enable you to schedule jobs for the future and let redis
     do the work of defering them until they are ready for consumption.
 
+    Due items are selected and removed by a single server-side script, so
+    consumers don't need to take the set's lock.
+
+    Unless ``notify=False`` is passed, adding items publishes the earliest
+    added score on a pub/sub channel so that consumers waiting in
+    :func:`wait_and_take <ScheduledSet.wait_and_take>` wake up when
+    something is scheduled sooner than they expected.
+
     """
-    def _get_and_remove_items(self, num_items):
-        with self.lock:
-            item_strs = self.redis.zrangebyscore(
-                self.name,
-                '-inf',
-                time.time(),
-                start=0,
-                num=num_items,
-                withscores=False
-            )
+    def __init__(self, *args, **kwargs):
+        """
+        See `redset.sets.TimeSortedSet`.
 
-            if item_strs:
-                self._discard_by_str(*item_strs)
+        :param notify: publish a notification for waiting consumers when
+            items are added. Defaults to True.
+        :type notify: bool
 
-        return item_strs
+        """
+        self.notify = kwargs.pop('notify', True)
+        super(ScheduledSet, self).__init__(*args, **kwargs)
+        self.notify_channel = '%s__notify' % self.name
+
+    @_instrumented
+    def wait_and_take(self, num, max_wait=None):
+        """
+        Atomically remove and return the next ``num`` due items, waiting
+        until at least one is due if none are.
+
+        Rather than polling, this sleeps until the earliest item in the set
+        comes due, waking early if a producer schedules an item sooner.
+
+        :param num:
+        :type num: int
+        :param max_wait: the maximum time to wait in seconds. Waits forever
+            if None.
+        :type max_wait: Number
+
+        :returns: list of objects -- empty if ``max_wait`` elapsed.
+
+        """
+        num = int(num)
+
+        if num < 1:
+            return []
+
+        return self._load_items(self._wait_and_get_items(num, max_wait))
+
+    def _wait_and_get_items(self, num_items, max_wait=None):
+        """
+        Get and remove due items from the redis store, sleeping until some
+        are due or ``max_wait`` elapses.
+
+        :returns: [str, ...]
+
+        """
+        deadline = None if max_wait is None else time.time() + max_wait
+        item_strs = self._get_and_remove_items(num_items)
+
+        # only pay for a subscription when there's something to wait for
+        if item_strs or (deadline is not None and time.time() >= deadline):
+            return item_strs
+
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+
+        try:
+            # subscribe before looking again so we can't miss an add
+            pubsub.subscribe(self.notify_channel)
+
+            while True:
+                item_strs = self._get_and_remove_items(num_items)
+
+                if item_strs:
+                    return item_strs
+
+                now = time.time()
+
+                if deadline is not None and now >= deadline:
+                    return []
+
+                next_score = self._get_first_score()
+                waits = []
+
+                if next_score is not None:
+                    waits.append(next_score - now)
+                if deadline is not None:
+                    waits.append(deadline - now)
+
+                # with nothing scheduled and no deadline, wait for an add
+                wait = max(min(waits), 0) if waits else None
+
+                if wait is None or wait > 0:
+                    pubsub.get_message(timeout=wait)
+        finally:
+            pubsub.close()
+
+    def _claimable_max_score(self):
+        return time.time()
+
+    def _get_first_score(self):
+        """
+        The score of the earliest item in the set, due or not.
+
+        :returns: Number or None
+
+        """
+        res = self.redis.zrange(self.name, 0, 0, withscores=True)
+
+        return res[0][1] if res else None
+
+    def _after_add(self, pipe, scores):
+        if self.notify and scores:
+            pipe.publish(self.notify_channel, min(scores))
+
+    def _get_and_remove_items(self, num_items, with_scores=False):
+        return self._pop_by_score(time.time(), num_items, with_scores)
+
+    def _check_blocking(self):
+        # waits are built on the same atomic pops as everything else
+        pass
+
+    def _blocking_get_and_remove_item(self, timeout=None):
+        item_strs = self._wait_and_get_items(1, timeout)
+
+        return item_strs[0] if item_strs else None
 
     def _get_item(self, position=0, with_score=False):
         return self.redis.zrangebyscore(
@@ -401,6 +1653,16 @@ class ScheduledSet(TimeSortedSet):
             withscores=with_score,
         )
 
+    def _get_items(self, num_items, with_score=False):
+        return self.redis.zrangebyscore(
+            self.name,
+            '-inf',
+            time.time(),
+            start=0,
+            num=num_items,
+            withscores=with_score,
+        )
+
     def _get_next_item(self, with_score=False):
         return self._get_item(with_score=with_score)
 
@@ -412,6 +1674,54 @@ class ScheduledSet(TimeSortedSet):
         return self.redis.zcount(self.name, '-inf', time.time())
 
 
+def pop_any(sets, timeout=None):
+    """
+    Remove and return the next item from the first non-empty set among
+    ``sets``, waiting on the server (using BZPOPMIN) until one of them has
+    an item.
+
+    All of the sets must use the same redis server and, on Redis Cluster,
+    the same hash tag. ScheduledSets aren't
+    supported, since their items may not be due yet; see
+    :func:`ScheduledSet.wait_and_take <ScheduledSet.wait_and_take>`. Nor are
+    offloaded sets.
+
+    :param sets: the sets to pop from, checked in order.
+    :type sets: list of :class:`SortedSet <SortedSet>`
+    :param timeout: the maximum time to wait in seconds. Waits forever if
+        None.
+    :type timeout: Number
+    :raises: KeyError -- if ``timeout`` elapsed with all sets empty
+    :raises: TypeError -- if any of the sets are scheduled or offloaded
+
+    :returns: (set, object) -- the set popped from and its item. The item is
+        None if it couldn't be deserialized.
+
+    """
+    sets = list(sets)
+
+    if not sets:
+        raise ValueError('No sets to pop from')
+
+    for ss in sets:
+        if isinstance(ss, ScheduledSet):
+            raise TypeError("Can't block on %s" % ss)
+
+        ss._check_blocking()
+
+    args = [ss.name for ss in sets] + [sets[0]._block_timeout(timeout)]
+    res = sets[0].redis.execute_command('BZPOPMIN', *args)
+
+    if not res:
+        raise KeyError('%s are empty' % ', '.join(ss.name for ss in sets))
+
+    name = _py3_compat_decode(res[0])
+    ss = next(ss for ss in sets if ss.name == name)
+    res_list = ss._load_items([res[1]])
+
+    return ss, (res_list[0] if res_list else None)
+
+
 class _DefaultSerializer(Serializer):
 
     loads = lambda self, i: _py3_compat_decode(i)
@@ -426,3 +1736,90 @@ def _py3_compat_decode(item_out_of_redis):
     if not isinstance(item_out_of_redis, str):
         return item_out_of_redis.decode('utf-8')
     return item_out_of_redis
+
+
+def _score_pairs(res):
+    """
+    Pair up a flat [member, score, member, score, ...] reply from redis.
+
+    """
+    return [
+        (item_str, float(score))
+        for item_str, score in zip(res[::2], res[1::2])
+    ]
+
+
+def _aligned_scores(items, scores):
+    """
+    One score, or None, per item of a bulk add.
+
+    :raises: ValueError -- if ``scores`` and ``items`` differ in length
+
+    :returns: list
+
+    """
+    if scores is None:
+        return [None] * len(items)
+
+    scores = list(scores)
+
+    if len(scores) != len(items):
+        raise ValueError(
+            'Got %d scores for %d items' % (len(scores), len(items))
+        )
+
+    return scores
+
+
+def _check_mode(mode):
+    if mode is not None and mode not in ADD_MODES:
+        raise ValueError('Unknown add mode %r' % (mode,))
+
+
+def _add_outcome(mode, old_score, score):
+    """
+    The outcome of conditionally adding an item with ``score`` in ``mode``,
+    given its score beforehand.
+
+    """
+    if old_score is None:
+        return SKIPPED if mode == XX else INSERTED
+
+    old_score = float(old_score)
+    score = float(score)
+
+    if mode == NX or score == old_score or \
+            (mode == GT and score < old_score) or \
+            (mode == LT and score > old_score):
+        return SKIPPED
+
+    return UPDATED
+
+
+def _size(item_str):
+    """The size in bytes of a serialized item, as sent to redis."""
+    if item_str is None:
+        return 0
+
+    if not isinstance(item_str, bytes):
+        item_str = str(item_str).encode('utf-8')
+
+    return len(item_str)
+
+
+def _hash_tagged(name):
+    """
+    Wrap ``name`` in a redis cluster hash tag, unless it already has one.
+
+    """
+    start = name.find('{')
+
+    if start != -1 and name.find('}', start + 1) > start + 1:
+        return name
+
+    return '{%s}' % name
+
+
+def _parse_version(version_str):
+    """Turn a redis version string like '5.0.7' into a comparable tuple."""
+    return tuple(int(part) for part in version_str.split('.')[:3])
@@ -0,0 +1,331 @@
+"""
+Sorted sets spread across several redis keys, and optionally several redis
+servers, to avoid a single hot key.
+
+"""
+
+import collections
+import heapq
+import zlib
+
+from redset.sets import SortedSet, ScheduledSet, _aligned_scores
+
+__all__ = (
+    'ShardedSortedSet',
+    'ShardedScheduledSet',
+)
+
+
+class ShardedSortedSet(object):
+    """
+    A sorted set whose items are hashed onto ``num_shards`` underlying
+    :class:`SortedSet <SortedSet>` instances.
+
+    Adding, discarding and looking up an item only touch the item's shard.
+    Taking items merges the shards by score, so ordering is global as long as
+    no other consumer is taking from the same shards at the same time, and
+    approximately global otherwise.
+
+    """
+    set_class = SortedSet
+
+    def __init__(self,
+                 redis_clients,
+                 name,
+                 num_shards=None,
+                 **kwargs
+                 ):
+        """
+        :param redis_clients: the client(s) used to communicate with redis.
+            Shards are assigned to clients round-robin.
+        :type redis_clients: redis.Redis instance or list of them
+        :param name: used to identify the storage location for this set.
+            Shard ``i`` is stored under ``<name>__shard<i>``.
+        :type name: str
+        :param num_shards: how many shards to spread items across. Defaults
+            to the number of clients. Changing it rehashes items onto
+            different shards, so it must stay the same for a given name.
+        :type num_shards: int
+
+        Other keyword arguments are passed to each shard; see
+        :class:`SortedSet <SortedSet>`.
+
+        """
+        if not isinstance(redis_clients, (list, tuple)):
+            redis_clients = [redis_clients]
+
+        num_shards = int(num_shards or len(redis_clients))
+
+        if num_shards < 1:
+            raise ValueError('Need at least one shard')
+
+        self._name = name
+        self.shards = [
+            self.set_class(
+                redis_clients[i % len(redis_clients)],
+                '%s__shard%d' % (name, i),
+                **kwargs)
+            for i in range(num_shards)
+        ]
+
+    def __repr__(self):
+        return (
+            "<%s name='%s', shards=%s, length=%s>" %
+            (self.__class__.__name__, self.name, len(self.shards), len(self))
+        )
+
+    __str__ = __repr__
+
+    def __len__(self):
+        """
+        How many values are in all of the shards?
+
+        :returns: int
+
+        """
+        return sum(len(shard) for shard in self.shards)
+
+    def __contains__(self, item):
+        return item in self._shard_for(item)
+
+    @property
+    def name(self):
+        """
+        The name of this set, from which the shards' names are derived.
+
+        :returns: str
+
+        """
+        return self._name
+
+    def add(self, item, score=None, mode=None):
+        """
+        Add the item to its shard. See :func:`SortedSet.add <SortedSet.add>`.
+
+        :returns: Number -- score the item was added with, or its outcome
+            with a ``mode``
+
+        """
+        return self._shard_for(item).add(item, score, mode=mode)
+
+    def add_many(self, items, scores=None, **kwargs):
+        """
+        Add many items, with one bulk add per shard. See
+        :func:`SortedSet.add_many <SortedSet.add_many>`.
+
+        :returns: list of Numbers -- scores the items were added with, or
+            their outcomes with a ``mode``
+
+        """
+        items = list(items)
+
+        scores = _aligned_scores(items, scores)
+
+        res = [None] * len(items)
+
+        for index, positions in self._positions_by_shard(items).items():
+            added_scores = self.shards[index].add_many(
+                [items[position] for position in positions],
+                [scores[position] for position in positions],
+                **kwargs)
+
+            for position, score in zip(positions, added_scores):
+                res[position] = score
+
+        return res
+
+    def pop(self):
+        """
+        Remove and return the item with the lowest score across all shards.
+
+        :raises: KeyError -- if no items left
+
+        :returns: object.
+
+        """
+        res_list = self.take(1)
+
+        if not res_list:
+            raise KeyError('%s is empty' % self)
+
+        return res_list[0]
+
+    def take(self, num):
+        """
+        Remove and return the ``num`` items with the lowest scores across all
+        shards.
+
+        The lowest ``num`` scores of every shard are merged to work out how
+        many items to take from each, then each shard is taken from
+        atomically and the results are merged by the scores they were
+        taken with.
+
+        :returns: list of objects
+
+        """
+        num = int(num)
+
+        if num < 1:
+            return []
+
+        scores_by_shard = [
+            [score for __, score in shard._get_items(num, with_score=True)]
+            for shard in self.shards
+        ]
+        counts = collections.Counter(
+            index for __, index in heapq.nsmallest(num, (
+                (score, index)
+                for index, scores in enumerate(scores_by_shard)
+                for score in scores
+            ))
+        )
+
+        # merge what we took back into score order, by the scores the items
+        # were actually taken with, since other consumers may have taken
+        # from the shards since we looked; shard index and position break
+        # ties so items themselves are never compared
+        taken = [
+            [
+                (score, index, position, item)
+                for position, (item, score) in enumerate(
+                    self.shards[index]._pop_items(count, with_scores=True))
+            ]
+            for index, count in counts.items()
+        ]
+
+        return [item for __, __, __, item in heapq.merge(*taken)]
+
+    def clear(self):
+        """
+        Empty every shard.
+
+        :returns: bool -- whether anything was removed
+
+        """
+        return any([shard.clear() for shard in self.shards])
+
+    def discard(self, item):
+        """
+        Remove a given item from its shard.
+
+        :returns: bool -- success of removal
+
+        """
+        return self._shard_for(item).discard(item)
+
+    def discard_many(self, items, **kwargs):
+        """
+        Remove many items, with one bulk removal per shard. See
+        :func:`SortedSet.discard_many <SortedSet.discard_many>`.
+
+        :returns: int -- the number of items removed
+
+        """
+        items = list(items)
+
+        return sum(
+            self.shards[index].discard_many(
+                [items[position] for position in positions], **kwargs)
+            for index, positions in self._positions_by_shard(items).items()
+        )
+
+    def score(self, item):
+        """
+        See what the score for an item is.
+
+        :returns: Number or None.
+
+        """
+        return self._shard_for(item).score(item)
+
+    def scores_many(self, items, **kwargs):
+        """
+        See what the scores for many items are, with one bulk lookup per
+        shard. See :func:`SortedSet.scores_many <SortedSet.scores_many>`.
+
+        :returns: list of Numbers or Nones, aligned with ``items``
+
+        """
+        items = list(items)
+        res = [None] * len(items)
+
+        for index, positions in self._positions_by_shard(items).items():
+            scores = self.shards[index].scores_many(
+                [items[position] for position in positions], **kwargs)
+
+            for position, score in zip(positions, scores):
+                res[position] = score
+
+        return res
+
+    def contains_many(self, items, **kwargs):
+        """
+        Which of many items are in the set?
+
+        :returns: list of bools, aligned with ``items``
+
+        """
+        return [
+            score is not None
+            for score in self.scores_many(items, **kwargs)
+        ]
+
+    def peek_score(self):
+        """
+        What is the lowest score across all shards?
+
+        :returns: Number
+
+        """
+        scores = [shard.peek_score() for shard in self.shards]
+        scores = [score for score in scores if score is not None]
+
+        return min(scores) if scores else None
+
+    def _shard_index(self, item):
+        """
+        Which shard does this item belong to? Items are hashed by their
+        serialized form so that equal items always land on the same shard.
+
+        :returns: int
+
+        """
+        item_str = self.shards[0]._dump_item(item)
+
+        if not isinstance(item_str, bytes):
+            item_str = str(item_str).encode('utf-8')
+
+        return (zlib.crc32(item_str) & 0xffffffff) % len(self.shards)
+
+    def _positions_by_shard(self, items):
+        """
+        :returns: dict of shard index to the positions in ``items`` of the
+            items belonging to that shard
+
+        """
+        positions_by_shard = collections.defaultdict(list)
+
+        for position, item in enumerate(items):
+            positions_by_shard[self._shard_index(item)].append(position)
+
+        return positions_by_shard
+
+    def _shard_for(self, item):
+        return self.shards[self._shard_index(item)]
+
+
+class ShardedScheduledSet(ShardedSortedSet):
+    """
+    A :class:`ShardedSortedSet <ShardedSortedSet>` made of
+    :class:`ScheduledSet <ScheduledSet>` shards, so only items with a score
+    less than now are returned.
+
+    """
+    set_class = ScheduledSet
+
+    def available(self):
+        """
+        The count of items with a score less than now, across all shards.
+
+        """
+        return sum(shard.available() for shard in self.shards)
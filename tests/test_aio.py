@@ -0,0 +1,110 @@
+import unittest
+import time
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+from redset.exceptions import LockTimeout
+
+if aioredis:
+    from redset.aio import (
+        AsyncLock, AsyncSortedSet, AsyncScheduledSet, pop_any,
+    )
+
+
+@unittest.skipIf(aioredis is None, 'requires redis.asyncio')
+class AsyncSortedSetTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.key = 'async_ss_test'
+        self.redis = aioredis.Redis()
+        self.ss = AsyncSortedSet(self.redis, self.key)
+
+    async def asyncTearDown(self):
+        await self.ss.clear()
+        await self.redis.aclose()
+
+    async def test_add_and_take(self):
+        for i in range(5):
+            await self.ss.add(i, score=i)
+
+        self.assertEqual(await self.ss.size(), 5)
+        self.assertTrue(await self.ss.contains(0))
+        self.assertFalse(await self.ss.contains(-1))
+        self.assertEqual(await self.ss.peek(position=1), '1')
+        self.assertEqual(await self.ss.peek_score(), 0)
+
+        self.assertEqual(await self.ss.take(2), ['0', '1'])
+        self.assertEqual(await self.ss.pop(), '2')
+        self.assertTrue(await self.ss.discard(3))
+        self.assertEqual(await self.ss.take(100), ['4'])
+
+        with self.assertRaises(KeyError):
+            await self.ss.pop()
+
+    async def test_add_many(self):
+        self.assertEqual(
+            await self.ss.add_many(['a', 'b', 'c'], chunk_size=2),
+            [0, 0, 0],
+        )
+        self.assertEqual(await self.ss.size(), 3)
+
+    async def test_blocking_pop(self):
+        with self.assertRaises(KeyError):
+            await self.ss.pop(block=True, timeout=0.05)
+
+        await self.ss.add('a')
+        self.assertEqual(await self.ss.pop(block=True, timeout=1), 'a')
+
+        other = AsyncSortedSet(self.redis, self.key + '_other')
+        await other.add('b')
+
+        try:
+            self.assertEqual(
+                await pop_any([self.ss, other], timeout=1),
+                (other, 'b'),
+            )
+        finally:
+            await other.clear()
+
+
+@unittest.skipIf(aioredis is None, 'requires redis.asyncio')
+class AsyncScheduledSetTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.key = 'async_scheduled_set_test'
+        self.now = time.time() - 1
+        self.redis = aioredis.Redis()
+        self.ss = AsyncScheduledSet(self.redis, self.key)
+
+    async def asyncTearDown(self):
+        await self.ss.clear()
+        await self.redis.aclose()
+
+    async def test_schedule(self):
+        await self.ss.add(1, self.now)
+        await self.ss.add(2, self.now + 1000)
+
+        self.assertEqual(await self.ss.available(), 1)
+        self.assertEqual(await self.ss.peek(), '1')
+        self.assertEqual(await self.ss.take(2), ['1'])
+
+        with self.assertRaises(KeyError):
+            await self.ss.pop()
+
+        self.assertEqual(await self.ss.size(), 1)
+
+    async def test_wait_and_take(self):
+        self.assertEqual(await self.ss.wait_and_take(1, max_wait=0.05), [])
+
+        await self.ss.add('1', time.time() + 0.05)
+        self.assertEqual(await self.ss.wait_and_take(1, max_wait=5), ['1'])
+
+    async def test_lock(self):
+        async with self.ss.lock:
+            with self.assertRaises(LockTimeout):
+                async with AsyncLock(self.redis, self.ss.lock.key,
+                                     timeout=0.001):
+                    assert False, "shouldn't be able to acquire the lock"
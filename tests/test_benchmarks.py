@@ -0,0 +1,47 @@
+import unittest
+
+from benchmarks import runner
+
+
+class BenchmarkTest(unittest.TestCase):
+    """
+    Smoke test the benchmarks on the memory backend.
+
+    """
+
+    def test_run(self):
+        report = runner.run(
+            ops=5,
+            batch_sizes=[1, 3],
+            serializer='positional',
+            lock='token',
+            backend='memory',
+        )
+
+        self.assertEqual(report['meta']['config']['ops'], 5)
+        self.assertEqual(
+            [(res['case'], res['batch']) for res in report['results']],
+            [('add', 1), ('add_many', 1), ('add_many', 3), ('take', 1),
+             ('take', 3), ('pop', 1), ('peek', 1), ('scheduled_take', 1),
+             ('scheduled_take', 3)],
+        )
+
+        for res in report['results']:
+            self.assertEqual(res['ops'], 5)
+            self.assertEqual(res['errors'], 0)
+            self.assertEqual(res['items'], 5 * res['batch'])
+            self.assertTrue(res['p50_ms'] <= res['p99_ms'] <= res['max_ms'])
+
+        runner.format_results(report)
+
+    def test_memory_backend_is_single_process(self):
+        with self.assertRaises(ValueError):
+            runner.run(processes=[2], backend='memory')
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+
+        self.assertEqual(runner.percentile(values, 50), 50)
+        self.assertEqual(runner.percentile(values, 99), 99)
+        self.assertEqual(runner.percentile([7], 99), 7)
+        self.assertEqual(runner.percentile([], 50), 0)
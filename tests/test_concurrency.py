@@ -6,11 +6,14 @@ Test the use of redset from multiple processeses.
 import unittest
 import multiprocessing
 import itertools
+import threading
+import time
 
 import redis
 
 from redset import SortedSet, ScheduledSet
 from redset.exceptions import LockTimeout
+from redset.locks import Lock, TokenLock
 
 client = redis.Redis()
 
@@ -88,7 +91,7 @@ class MultiprocessTest(unittest.TestCase):
         )
 
 
-class ScheduledMultiprocessTest(unittest.TestCase):
+class ScheduledMultiprocessTest(MultiprocessTest):
     """
     ScheduledSet has slightly different concurrency semantics.
 
@@ -149,3 +152,119 @@ class LockExpiryTest(unittest.TestCase):
                 got_the_lock = True
 
         assert got_the_lock, "`holder` should have acquired the lock"
+
+
+class TokenLockTest(unittest.TestCase):
+    """
+    Ensure token-owned locks time out, expire on the server, and are only
+    released by their owner.
+
+    """
+
+    def setUp(self):
+        self.r = redis.Redis()
+        self.set_name = self.__class__.__name__
+        self.holder = SortedSet(
+            self.r, self.set_name, lock_expires=10, lock_class=TokenLock,
+        )
+        self.chump = SortedSet(
+            self.r,
+            self.set_name,
+            lock_timeout=0.001,
+            lock_expires=0.05,
+            lock_class=TokenLock,
+        )
+
+    def tearDown(self):
+        self.r.delete(self.holder.lock.key)
+        self.holder.clear()
+
+    def test_lock_timeout(self):
+        with self.holder.lock:
+            with self.assertRaises(LockTimeout):
+                with self.chump.lock:
+                    assert False, "shouldn't be able to acquire the lock"
+
+    def test_lock_expires(self):
+        """
+        The chump's lock expires and is taken by the holder; the chump
+        releasing late must not free the holder's lock.
+
+        """
+        self.chump.lock.__enter__()
+
+        with self.holder.lock:
+            self.chump.lock.__exit__(None, None, None)
+            self.assertTrue(self.r.exists(self.holder.lock.key))
+
+        self.assertFalse(self.r.exists(self.holder.lock.key))
+
+
+class LockNotifyTest(unittest.TestCase):
+    """
+    Waiters on a notifying lock wake up as soon as it's released, well before
+    their next poll.
+
+    """
+
+    def setUp(self):
+        self.r = redis.Redis()
+        self.key = self.__class__.__name__
+
+    def tearDown(self):
+        self.r.delete(self.key, self.key + '__released')
+
+    def _assert_handoff(self, make_lock):
+        holder = make_lock()
+        waiter = make_lock()
+
+        acquired = threading.Event()
+
+        def hold():
+            with holder:
+                acquired.set()
+                time.sleep(0.05)
+
+        holder_thread = threading.Thread(target=hold)
+        holder_thread.start()
+        acquired.wait()
+
+        started = time.time()
+        with waiter:
+            self.assertTrue(time.time() - started < 1)
+
+        holder_thread.join()
+        self.assertFalse(self.r.exists(self.key))
+
+    def test_lock_notify_lost_race(self):
+        holder = Lock(self.r, self.key, notify=True)
+        waiter = Lock(
+            self.r, self.key, timeout=2, poll_interval=5, notify=True,
+        )
+
+        def signal_then_release():
+            # a wake-up whose lock is gone again by the time the waiter looks
+            time.sleep(0.05)
+            self.r.rpush(self.key + '__released', 1)
+            time.sleep(0.2)
+            holder.__exit__(None, None, None)
+
+        holder.__enter__()
+        thread = threading.Thread(target=signal_then_release)
+        thread.start()
+
+        started = time.time()
+        with waiter:
+            self.assertTrue(0.2 < time.time() - started < 1)
+
+        thread.join()
+
+    def test_lock_notify(self):
+        self._assert_handoff(lambda: Lock(
+            self.r, self.key, timeout=10, poll_interval=5, notify=True,
+        ))
+
+    def test_token_lock_notify(self):
+        self._assert_handoff(lambda: TokenLock(
+            self.r, self.key, timeout=10, max_poll_interval=5, notify=True,
+        ))
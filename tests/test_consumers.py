@@ -0,0 +1,116 @@
+import unittest
+import time
+import redis
+
+from redset import SortedSet, ScheduledSet
+from redset.consumers import PrefetchingConsumer
+
+
+class PrefetchingConsumerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.key = 'prefetching_consumer_test'
+        self.ss = SortedSet(redis.Redis(), self.key)
+
+    def tearDown(self):
+        self.ss.clear()
+
+    def test_repr(self):
+        str(PrefetchingConsumer(self.ss))
+
+    def test_pop(self):
+        self.ss.add_many(range(20), scores=range(20))
+
+        consumer = PrefetchingConsumer(self.ss, max_batch=8)
+
+        self.assertEqual(
+            [consumer.pop() for __ in range(20)],
+            [str(i) for i in range(20)],
+        )
+        self.assertEqual(consumer.batch_size, 8)
+
+        with self.assertRaises(KeyError):
+            consumer.pop()
+
+    def test_batches_grow(self):
+        self.ss.add_many(range(10), scores=range(10))
+
+        consumer = PrefetchingConsumer(self.ss, min_batch=2, max_batch=4)
+
+        self.assertEqual(consumer.pop(), '0')
+        self.assertEqual((len(consumer), len(self.ss)), (1, 8))
+
+        consumer.pop()
+        self.assertEqual(consumer.pop(), '2')
+        self.assertEqual((len(consumer), len(self.ss)), (3, 4))
+
+    def test_close_returns_items(self):
+        self.ss.add_many(range(10), scores=range(10, 20))
+
+        with PrefetchingConsumer(self.ss, min_batch=5) as consumer:
+            self.assertEqual(consumer.pop(), '0')
+            self.assertEqual(len(self.ss), 5)
+
+        self.assertEqual(len(consumer), 0)
+        self.assertEqual(len(self.ss), 9)
+        self.assertEqual(self.ss.score('1'), 11)
+
+    def test_close_returns_stored_strs(self):
+        class LossySerializer(object):
+            def loads(self, item_str):
+                return item_str.upper()
+
+            def dumps(self, item):
+                return item
+
+        ss = SortedSet(
+            redis.Redis(), self.key,
+            serializer=LossySerializer(), scorer=lambda item: 5)
+        ss.add_many(['a', 'b'], scores=[-1, 0], serialized=True)
+
+        with PrefetchingConsumer(ss, min_batch=2) as consumer:
+            self.assertEqual(consumer.pop(), 'A')
+
+        # 'b' went back as stored, not re-serialized or re-scored
+        self.assertEqual(ss.redis.zscore(self.key, 'b'), 0)
+        self.assertEqual(ss.redis.zscore(self.key, 'B'), None)
+
+    def test_max_hold(self):
+        self.ss.add_many(range(10), scores=range(10))
+
+        consumer = PrefetchingConsumer(
+            self.ss, min_batch=2, max_batch=8, max_hold=0.05)
+
+        for i in range(3):
+            self.assertEqual(consumer.pop(), str(i))
+
+        self.assertEqual(consumer.batch_size, 4)
+        time.sleep(0.1)
+
+        # the stale batch went back and a smaller batch was claimed
+        self.assertEqual(consumer.pop(), '3')
+        self.assertEqual(consumer.batch_size, 2)
+        self.assertEqual((len(consumer), len(self.ss)), (1, 5))
+
+
+class ScheduledPrefetchingConsumerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.key = 'scheduled_prefetching_consumer_test'
+        self.now = time.time() - 1
+        self.ss = ScheduledSet(redis.Redis(), self.key)
+
+    def tearDown(self):
+        self.ss.clear()
+
+    def test_close_returns_items(self):
+        self.ss.add_many(
+            ['a', 'b', 'c'],
+            scores=[self.now, self.now, self.now + 1000],
+        )
+
+        with PrefetchingConsumer(self.ss, min_batch=5) as consumer:
+            self.assertEqual(consumer.pop(), 'a')
+
+        self.assertEqual(self.ss.available(), 1)
+        self.assertEqual(int(self.ss.score('b')), int(self.now))
@@ -0,0 +1,247 @@
+"""
+Test the in-memory client, and run the set and lock tests against it.
+
+"""
+
+import unittest
+import threading
+import time
+
+from redset import SortedSet, TimeSortedSet, ScheduledSet
+from redset.locks import TokenLock
+from redset.memory import MemoryRedis
+from redset.metrics import HistogramMetrics
+from redset.sets import NX, INSERTED, SKIPPED
+
+from tests import test_concurrency, test_sets
+
+
+class MemoryRedisTest(unittest.TestCase):
+
+    def setUp(self):
+        self.r = MemoryRedis()
+
+    def test_repr(self):
+        str(self.r)
+
+    def test_zadd(self):
+        self.assertEqual(self.r.zadd('z', 'a', 2, 'b', 1), 2)
+        self.assertEqual(self.r.zadd('z', 'a', 0, 'c', 1), 1)
+
+        self.assertEqual(self.r.zcard('z'), 3)
+        self.assertEqual(self.r.zscore('z', 'a'), 0)
+        self.assertEqual(self.r.zscore('z', 'x'), None)
+        # equal scores are ordered bytewise
+        self.assertEqual(self.r.zrange('z', 0, -1), [b'a', b'b', b'c'])
+        self.assertEqual(
+            self.r.zrange('z', 0, 0, desc=True, withscores=True),
+            [(b'c', 1)],
+        )
+
+    def test_zrangebyscore(self):
+        self.r.zadd('z', *[x for i in range(10) for x in (i, i)])
+
+        self.assertEqual(self.r.zrangebyscore('z', 2, 4), [b'2', b'3', b'4'])
+        self.assertEqual(
+            self.r.zrangebyscore('z', '(2', '(4', withscores=True),
+            [(b'3', 3)],
+        )
+        self.assertEqual(
+            self.r.zrangebyscore('z', '-inf', '+inf', start=8, num=5),
+            [b'8', b'9'],
+        )
+        self.assertEqual(self.r.zrangebyscore('z', 20, 30), [])
+        self.assertEqual(self.r.zcount('z', '(1', 3), 2)
+
+    def test_zrem(self):
+        self.r.zadd('z', 'a', 1, 'b', 2, 'c', 3, 'd', 4)
+
+        self.assertEqual(self.r.zrem('z', 'a', 'x'), 1)
+        self.assertEqual(self.r.zremrangebyrank('z', 0, 0), 1)
+        self.assertEqual(self.r.zremrangebyscore('z', 3, '+inf'), 2)
+        # empty keys are removed, as in redis
+        self.assertFalse(self.r.exists('z'))
+
+    def test_zpopmin(self):
+        self.r.zadd('z', 'a', 1, 'b', 2)
+
+        self.assertEqual(
+            self.r.execute_command('ZPOPMIN', 'z', 5),
+            [b'a', b'1.0', b'b', b'2.0'],
+        )
+        self.assertEqual(self.r.execute_command('BZPOPMIN', 'z', 0.01), None)
+
+        with self.assertRaises(NotImplementedError):
+            self.r.execute_command('FLUSHALL')
+
+    def test_bzpopmin_wakes(self):
+        adder = threading.Timer(0.05, self.r.zadd, args=('z2', 'a', 1))
+        adder.start()
+
+        self.assertEqual(
+            self.r.execute_command('BZPOPMIN', 'z1', 'z2', 5),
+            [b'z2', b'a', b'1.0'],
+        )
+        adder.join()
+
+    def test_strings(self):
+        self.assertTrue(self.r.setnx('s', 1))
+        self.assertFalse(self.r.setnx('s', 2))
+        self.assertEqual(self.r.getset('s', 3), b'1')
+        self.assertEqual(self.r.set('s', 4, nx=True), None)
+        self.assertEqual(self.r.get('s'), b'3')
+
+        with self.assertRaises(TypeError):
+            self.r.zadd('s', 'a', 1)
+
+    def test_expiry(self):
+        self.r.set('s', 1, px=20)
+        self.r.rpush('l', 1)
+        self.r.pexpire('l', 20)
+        self.r.ltrim('l', -1, -1)
+
+        self.assertEqual(self.r.exists('s', 'l'), 2)
+        time.sleep(0.05)
+        self.assertEqual(self.r.exists('s', 'l'), 0)
+
+    def test_blpop(self):
+        self.assertEqual(self.r.blpop('l', timeout=0.01), None)
+
+        self.r.rpush('l', 'a', 'b')
+        self.assertEqual(self.r.blpop(['x', 'l'], timeout=1), (b'l', b'a'))
+
+    def test_hashes(self):
+        self.assertEqual(
+            self.r.execute_command('HSET', 'h', 'a', 1, 'b', 2), 2)
+        self.assertEqual(self.r.hset('h', 'a', 3), 0)
+
+        self.assertEqual(self.r.hget('h', 'a'), b'3')
+        self.assertEqual(self.r.hmget('h', ['a', 'x']), [b'3', None])
+        self.assertEqual(self.r.hdel('h', 'a', 'b', 'x'), 2)
+        self.assertEqual(self.r.hlen('h'), 0)
+
+    def test_pipeline(self):
+        pipe = self.r.pipeline()
+        pipe.zadd('z', 'a', 1).zcard('z')
+        pipe.execute_command('ZPOPMIN', 'z', 1)
+
+        self.assertEqual(pipe.execute(), [1, 1, [b'a', b'1.0']])
+        self.assertEqual(pipe.execute(), [])
+
+    def test_pubsub(self):
+        pubsub = self.r.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe('c')
+
+        self.assertEqual(self.r.publish('c', 'hi'), 1)
+        self.assertEqual(pubsub.get_message(timeout=1)['data'], b'hi')
+        self.assertEqual(pubsub.get_message(timeout=0.01), None)
+
+        pubsub.close()
+        self.assertEqual(self.r.publish('c', 'hi'), 0)
+
+    def test_unknown_script(self):
+        with self.assertRaises(NotImplementedError):
+            self.r.register_script("return 1")
+
+
+class MemorySortedSetTest(test_sets.SortedSetTest):
+
+    def setUp(self):
+        self.key = 'ss_test'
+        self.ss = SortedSet(MemoryRedis(), self.key)
+
+
+class MemoryOffloadedSortedSetTest(test_sets.OffloadedSortedSetTest):
+
+    def setUp(self):
+        self.key = 'offloaded_ss_test'
+        self.ss = SortedSet(MemoryRedis(), self.key, offload=True)
+
+
+class MemoryMeasuredOffloadedSortedSetTest(
+        test_sets.MeasuredOffloadedSortedSetTest):
+
+    def setUp(self):
+        self.key = 'measured_offloaded_ss_test'
+        self.ss = SortedSet(
+            MemoryRedis(), self.key, offload=True, metrics=HistogramMetrics())
+
+    def test_discard_many_cold_script_cache(self):
+        self.ss.add_many(['a', 'b', 'c'], scores=[1, 2, 3])
+
+        self.assertEquals(self.ss.discard_many(['a', 'b', 'z']), 2)
+        self.assertEquals(self.ss.take(3), ['c'])
+        self.assertEquals(self.ss.redis.hlen(self.ss.bodies_key), 0)
+
+    def test_add_mode_cold_script_cache(self):
+        # MemoryRedis has no script cache, but queues scripts on pipelines
+        self.assertEquals(self.ss.add('c', 5, mode=NX), INSERTED)
+        self.assertEquals(self.ss.add_many(['c', 'd'], [1, 6], mode=NX),
+                          [SKIPPED, INSERTED])
+        self.assertEquals(self.ss.take(2), ['c', 'd'])
+
+
+class MemoryTimeSortedSetTest(test_sets.TimeSortedSetTest):
+
+    def setUp(self):
+        self.key = 'tss_test'
+        self.now = time.time()
+
+        self.tss = TimeSortedSet(MemoryRedis(), self.key)
+
+
+class MemoryScheduledSetTest(test_sets.ScheduledSetTest):
+
+    def setUp(self):
+        self.key = 'scheduled_set_test'
+        self.now = time.time() - 1
+
+        self.ss = ScheduledSet(MemoryRedis(), self.key)
+
+
+class MemoryOffloadedScheduledSetTest(test_sets.OffloadedScheduledSetTest):
+
+    def setUp(self):
+        self.key = 'offloaded_scheduled_set_test'
+        self.now = time.time() - 1
+
+        self.ss = ScheduledSet(MemoryRedis(), self.key, offload=True)
+
+
+class MemoryLockExpiryTest(test_concurrency.LockExpiryTest):
+
+    def setUp(self):
+        self.r = MemoryRedis()
+        self.set_name = self.__class__.__name__
+        self.timeout_length = 0.001
+        self.holder = SortedSet(self.r, self.set_name, lock_expires=10)
+        self.chump = SortedSet(
+            self.r,
+            self.set_name,
+            lock_timeout=self.timeout_length,
+            lock_expires=self.timeout_length,
+        )
+
+
+class MemoryTokenLockTest(test_concurrency.TokenLockTest):
+
+    def setUp(self):
+        self.r = MemoryRedis()
+        self.set_name = self.__class__.__name__
+        self.holder = SortedSet(
+            self.r, self.set_name, lock_expires=10, lock_class=TokenLock,
+        )
+        self.chump = SortedSet(
+            self.r,
+            self.set_name,
+            lock_timeout=0.001,
+            lock_expires=0.05,
+            lock_class=TokenLock,
+        )
+
+
+class MemoryLockNotifyTest(test_concurrency.LockNotifyTest):
+
+    def setUp(self):
+        self.r = MemoryRedis()
+        self.key = self.__class__.__name__
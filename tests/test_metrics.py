@@ -0,0 +1,305 @@
+import json
+import time
+import unittest
+
+import redis
+
+from redset import SortedSet, ScheduledSet
+from redset.exceptions import LockTimeout
+from redset.interfaces import Metrics, Serializer
+from redset.locks import Lock, TokenLock
+from redset.metrics import (
+    HistogramMetrics,
+    LockCounters,
+    LockMeasurement,
+    Measurement,
+)
+
+
+class RecordingMetrics(Metrics):
+
+    def __init__(self):
+        self.measurements = []
+
+    def record(self, measurement):
+        self.measurements.append(measurement)
+
+
+class MetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = RecordingMetrics()
+        self.ss = SortedSet(
+            redis.Redis(), 'metrics_test', metrics=self.metrics)
+
+    def tearDown(self):
+        self.ss.clear()
+
+    def last(self):
+        return self.metrics.measurements[-1]
+
+    def test_add(self):
+        self.ss.add('abc', 1)
+        m = self.last()
+
+        self.assertEqual(m.set_name, 'metrics_test')
+        self.assertEqual(m.operation, 'add')
+        self.assertEqual(m.items, 1)
+        self.assertEqual(m.nbytes, 3)
+        self.assertEqual(m.failures, 0)
+        self.assertEqual(m.round_trips, 1)
+        self.assertTrue(m.latency > 0)
+        self.assertEqual(m.error, None)
+
+    def test_add_many(self):
+        self.ss.add_many(['a', 'bb', 'ccc'], [1, 2, 3])
+        m = self.last()
+
+        self.assertEqual(m.operation, 'add_many')
+        self.assertEqual(m.items, 3)
+        self.assertEqual(m.nbytes, 6)
+
+    def test_take(self):
+        self.ss.add_many(['a', 'b', 'c'], [1, 2, 3])
+        self.ss.take(1)
+        self.assertEqual(self.ss.take(2), ['b', 'c'])
+
+        m = self.last()
+        self.assertEqual(m.operation, 'take')
+        self.assertEqual(m.items, 2)
+        self.assertEqual(m.round_trips, 1)
+
+    def test_nested_calls_are_one_operation(self):
+        self.ss.add('a', 1)
+        del self.metrics.measurements[:]
+
+        self.assertTrue('a' in self.ss)
+        self.assertEqual(
+            [m.operation for m in self.metrics.measurements], ['score'])
+
+    def test_failures(self):
+        ss = SortedSet(
+            redis.Redis(), 'metrics_test',
+            serializer=JsonSerializer(), metrics=self.metrics)
+        ss.add({'a': 1}, 1)
+        ss.redis.zadd('metrics_test', 'not json', 2)
+
+        self.assertEqual(ss.take(2), [{'a': 1}])
+        m = self.last()
+        self.assertEqual(m.items, 1)
+        self.assertEqual(m.failures, 1)
+
+    def test_error(self):
+        ss = ScheduledSet(redis.Redis(), 'metrics_test', metrics=self.metrics)
+
+        with self.assertRaises(ValueError):
+            ss.add_many(['a'], [1, 2])
+
+        m = self.last()
+        self.assertEqual(m.operation, 'add_many')
+        self.assertTrue(isinstance(m.error, ValueError))
+
+    def test_record_errors_are_swallowed(self):
+        class BadMetrics(Metrics):
+            def record(self, measurement):
+                raise RuntimeError
+
+        ss = SortedSet(redis.Redis(), 'metrics_test', metrics=BadMetrics())
+        ss.add('a', 1)
+        self.assertEqual(ss.take(1), ['a'])
+
+    def test_no_metrics(self):
+        ss = SortedSet(redis.Redis(), 'metrics_test')
+        self.assertEqual(ss.metrics, None)
+        self.assertTrue(isinstance(ss.redis, redis.Redis))
+
+
+class HistogramMetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = HistogramMetrics(buckets=(0.1, 1))
+
+    def measure(self, operation, latency, **kwargs):
+        m = Measurement('hist_test', operation)
+        m.latency = latency
+
+        for name, value in kwargs.items():
+            setattr(m, name, value)
+
+        self.metrics.record(m)
+
+    def test_snapshot(self):
+        self.measure('take', 0.05, items=2, round_trips=1)
+        self.measure('take', 0.5, items=1, round_trips=1, nbytes=10)
+        self.measure('take', 5, error=ValueError())
+        self.measure('add', 0.01)
+
+        snap = self.metrics.snapshot()
+        take = snap['take']
+
+        self.assertEqual(sorted(snap), ['add', 'take'])
+        self.assertEqual(take['count'], 3)
+        self.assertEqual(take['errors'], 1)
+        self.assertEqual(take['items'], 3)
+        self.assertEqual(take['round_trips'], 2)
+        self.assertEqual(take['nbytes'], 10)
+        self.assertEqual(take['latency_max'], 5)
+        self.assertAlmostEqual(take['latency_sum'], 5.55)
+        self.assertEqual(
+            take['buckets'], [(0.1, 1), (1, 2), (float('inf'), 3)])
+
+    def test_percentile(self):
+        for __ in range(98):
+            self.measure('take', 0.05)
+
+        self.measure('take', 0.5)
+        self.measure('take', 3)
+
+        self.assertEqual(self.metrics.percentile('take', 50), 0.1)
+        self.assertEqual(self.metrics.percentile('take', 99), 1)
+        self.assertEqual(self.metrics.percentile('take', 100), 3)
+        self.assertEqual(self.metrics.percentile('add', 50), None)
+
+    def test_reset(self):
+        self.measure('take', 0.05)
+        self.metrics.reset()
+        self.assertEqual(self.metrics.snapshot(), {})
+
+    def test_with_set(self):
+        ss = SortedSet(redis.Redis(), 'hist_test', metrics=self.metrics)
+
+        try:
+            ss.add_many(['a', 'b'], [1, 2])
+            ss.take(2)
+        finally:
+            ss.clear()
+
+        snap = self.metrics.snapshot()
+        self.assertEqual(snap['take']['items'], 2)
+        self.assertEqual(snap['add_many']['count'], 1)
+        self.assertEqual(snap['clear']['count'], 1)
+
+
+class LockMetricsTest(unittest.TestCase):
+    """
+    Ensure both kinds of lock measure their acquisitions and timeouts.
+
+    """
+    lock_class = Lock
+
+    def setUp(self):
+        self.r = redis.Redis()
+        self.key = 'lock_metrics_test'
+        self.metrics = RecordingMetrics()
+
+    def tearDown(self):
+        self.r.delete(self.key)
+
+    def make_lock(self, **kwargs):
+        kwargs.setdefault('metrics', self.metrics)
+        return self.lock_class(self.r, self.key, **kwargs)
+
+    def test_acquire(self):
+        with self.make_lock():
+            self.assertEqual(self.metrics.measurements, [])
+
+        m, = self.metrics.measurements
+        self.assertEqual(m.key, self.key)
+        self.assertTrue(m.acquired)
+        self.assertEqual(m.polls, 1)
+        self.assertFalse(m.stolen)
+        self.assertFalse(m.expired)
+        self.assertTrue(m.wait >= 0)
+        self.assertTrue(m.held >= 0)
+
+    def test_timeout(self):
+        with self.make_lock(metrics=None):
+            with self.assertRaises(LockTimeout):
+                with self.make_lock(timeout=0.05, poll_interval=0.01):
+                    pass
+
+        m, = self.metrics.measurements
+        self.assertFalse(m.acquired)
+        self.assertTrue(m.polls > 1)
+        self.assertTrue(m.wait >= 0.04)
+        self.assertEqual(m.held, None)
+
+    def test_expired(self):
+        with self.make_lock(expires=0.01):
+            time.sleep(0.05)
+
+        m, = self.metrics.measurements
+        self.assertTrue(m.expired)
+        self.assertTrue(m.held >= 0.05)
+
+
+class TokenLockMetricsTest(LockMetricsTest):
+    lock_class = TokenLock
+
+
+class LockStealTest(unittest.TestCase):
+
+    def test_steal(self):
+        r = redis.Redis()
+        metrics = RecordingMetrics()
+        lock = Lock(r, 'lock_steal_test', metrics=metrics)
+        r.set('lock_steal_test', time.time() - 1)
+
+        try:
+            with lock:
+                pass
+        finally:
+            r.delete('lock_steal_test')
+
+        m, = metrics.measurements
+        self.assertTrue(m.stolen)
+        self.assertEqual(m.polls, 1)
+
+
+class LockCountersTest(unittest.TestCase):
+
+    def measure(self, key, **kwargs):
+        m = LockMeasurement(key)
+
+        for name, value in kwargs.items():
+            setattr(m, name, value)
+
+        return m
+
+    def test_snapshot(self):
+        counters = LockCounters()
+        counters.record(self.measure(
+            'a', acquired=True, wait=0.5, polls=3, held=1.0))
+        counters.record(self.measure(
+            'a', acquired=True, wait=0.0, polls=1, held=2.0, stolen=True,
+            expired=True))
+        counters.record(self.measure('a', wait=10, polls=50))
+        counters.record(self.measure('b', acquired=True, polls=1, held=0.1))
+
+        snap = counters.snapshot()
+        self.assertEqual(sorted(snap), ['a', 'b'])
+        self.assertEqual(snap['a'], {
+            'acquisitions': 2,
+            'timeouts': 1,
+            'steals': 1,
+            'expirations': 1,
+            'polls': 54,
+            'wait_sum': 10.5,
+            'wait_max': 10,
+            'held_sum': 3.0,
+            'held_max': 2.0,
+        })
+
+        counters.reset()
+        self.assertEqual(counters.snapshot(), {})
+
+
+class JsonSerializer(Serializer):
+
+    @staticmethod
+    def loads(item_str):
+        return json.loads(item_str)
+
+    @staticmethod
+    def dumps(item):
+        return json.dumps(item)
@@ -0,0 +1,129 @@
+import collections
+import threading
+import time
+import unittest
+
+import redis
+
+from redset import SortedSet
+from redset.producers import BufferedProducer
+from redset.serializers import NamedtupleSerializer
+
+
+class BufferedProducerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.key = 'buffered_producer_test'
+        self.ss = SortedSet(redis.Redis(), self.key)
+
+    def tearDown(self):
+        self.ss.clear()
+
+    def test_repr(self):
+        with BufferedProducer(self.ss) as producer:
+            str(producer)
+
+    def test_flush_when_full(self):
+        producer = BufferedProducer(self.ss, max_batch=3, max_age=None)
+
+        self.assertEqual(producer.add('a', 1), 1)
+        producer.add('b', 2)
+        self.assertEqual((len(producer), len(self.ss)), (2, 0))
+
+        producer.add('c', 3)
+        self.assertEqual((len(producer), len(self.ss)), (0, 3))
+
+        self.assertEqual(producer.add_many(['d', 'e'], [5, 4]), [5, 4])
+        self.assertEqual(producer.flush(), 2)
+        self.assertEqual(producer.flush(), 0)
+        self.assertEqual(self.ss.take(5), ['a', 'b', 'c', 'e', 'd'])
+
+    def test_flush_when_old(self):
+        producer = BufferedProducer(self.ss, max_age=0.05)
+        producer.add('a', 1)
+
+        self.assertEqual(len(self.ss), 0)
+        time.sleep(0.3)
+        self.assertEqual((len(producer), len(self.ss)), (0, 1))
+
+        producer.close()
+
+    def test_close(self):
+        with BufferedProducer(self.ss, max_age=10) as producer:
+            producer.add('a', 1)
+
+        self.assertEqual(self.ss.take(1), ['a'])
+        self.assertFalse(producer._flusher.is_alive())
+
+        with self.assertRaises(ValueError):
+            producer.add('b', 2)
+
+    def test_threads(self):
+        producer = BufferedProducer(self.ss, max_batch=50, max_age=0.01)
+
+        def produce(start):
+            for i in range(start, start + 200):
+                producer.add(i, i + 1)
+
+        threads = [
+            threading.Thread(target=produce, args=(start,))
+            for start in range(0, 1000, 200)
+        ]
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        producer.close()
+        self.assertEqual(self.ss.take(1000), [str(i) for i in range(1000)])
+
+    def test_scorer(self):
+        Task = collections.namedtuple('Task', 'name priority')
+        ss = SortedSet(
+            redis.Redis(), self.key, scorer=lambda task: task.priority,
+            serializer=NamedtupleSerializer(Task))
+        failures = []
+
+        with BufferedProducer(
+                ss, max_age=None,
+                on_failure=lambda *args: failures.append(args)) as producer:
+            self.assertEqual(producer.add(Task('a', 0)), 0)
+            self.assertEqual(producer.add(Task('b', 2)), 2)
+            self.assertEqual(producer.add(Task('c', 1)), 1)
+
+        self.assertEqual(failures, [])
+        self.assertEqual(
+            [task.name for task in ss.take(3)], ['a', 'c', 'b'])
+
+    def test_serializer_without_dumps(self):
+        class LoadsOnly(object):
+            loads = int
+
+        ss = SortedSet(redis.Redis(), self.key, serializer=LoadsOnly())
+
+        with BufferedProducer(ss, max_age=None) as producer:
+            producer.add('1', 1)
+
+        self.assertEqual(ss.take(1), [1])
+
+    def test_failure(self):
+        failures = []
+
+        class BrokenRedis(redis.Redis):
+            def pipeline(self, *args, **kwargs):
+                raise redis.ConnectionError('down')
+
+        ss = SortedSet(BrokenRedis(), self.key)
+        producer = BufferedProducer(
+            ss, max_age=None,
+            on_failure=lambda batch, e: failures.append((batch, e)))
+
+        producer.add('a', 1)
+        producer.add('b', 2)
+        self.assertEqual(producer.flush(), 0)
+
+        (batch, error), = failures
+        self.assertEqual(batch, [('a', 1), ('b', 2)])
+        self.assertTrue(isinstance(error, redis.ConnectionError))
+        self.assertEqual(len(producer), 0)
@@ -1,10 +1,22 @@
 
 import unittest
+import json
 import redis
 from collections import namedtuple
 
+try:
+    import dataclasses
+except ImportError:
+    dataclasses = None
+
 from redset import SortedSet
-from redset.serializers import NamedtupleSerializer
+from redset.serializers import (
+    CompressingSerializer,
+    NamedtupleSerializer,
+    PositionalSerializer,
+    RecordSerializer,
+    StructSerializer,
+)
 
 
 DiscoTask = namedtuple('DiscoTask', 'tiger,woods')
@@ -34,3 +46,157 @@ class TestNTSerializer(unittest.TestCase):
             dt,
             self.ss.pop(),
         )
+
+    def test_nt_serializer_many(self):
+        dts = [DiscoTask(tiger=str(i), woods='david') for i in range(5)]
+
+        self.ss.add_many(dts, scores=range(5))
+
+        self.assertEqual(self.ss.take(5), dts)
+
+    def test_nt_serializer_many_bad_item(self):
+        dt = DiscoTask(tiger='larry', woods='david')
+
+        self.ss.add(dt, score=0)
+        self.ss.redis.zadd(self.ss.name, 'garbage', 1)
+
+        self.assertEqual(self.ss.take(2), [dt])
+
+
+Point = namedtuple('Point', 'x,y,label')
+
+
+class TestCompactSerializers(unittest.TestCase):
+
+    def _make_ss(self, serializer):
+        ss = SortedSet(
+            redis.Redis(), self.__class__.__name__, serializer=serializer,
+        )
+        self.addCleanup(ss.clear)
+        return ss
+
+    def test_struct_serializer(self):
+        ser = StructSerializer('iH', schema_id=7)
+        ss = self._make_ss(ser)
+
+        # 255 isn't valid utf-8 on its own, so this must stay bytes
+        records = [(i * 255, 255 + i) for i in range(5)]
+        ss.add_many(records, scores=range(5))
+
+        self.assertEqual(len(ser.dumps(records[0])), 7)
+        self.assertEqual(ss.peek(), records[0])
+        self.assertTrue(records[1] in ss)
+        self.assertEqual(ss.take(4), records[:4])
+        self.assertEqual(ss.pop(), records[4])
+
+    def test_struct_serializer_schema(self):
+        ss = self._make_ss(StructSerializer('i', schema_id=1))
+        other_schema = StructSerializer('i', schema_id=2)
+
+        ss.add((1,), score=0)
+        ss.redis.zadd(ss.name, other_schema.dumps((2,)), 1)
+        ss.add((3,), score=2)
+
+        with self.assertRaises(ValueError):
+            other_schema.loads(ss.serializer.dumps((1,)))
+
+        self.assertEqual(ss.take(3), [(1,), (3,)])
+
+    def test_positional_serializer(self):
+        ser = PositionalSerializer(schema_id=3)
+        ss = self._make_ss(ser)
+
+        self.assertEqual(ser.dumps(('a', 1)), '[3,"a",1]')
+
+        ss.add_many([('a', 1), ('b', 2)], scores=[0, 1])
+        self.assertEqual(ss.take(2), [('a', 1), ('b', 2)])
+
+    def test_record_serializer_namedtuple(self):
+        ss = self._make_ss(RecordSerializer(Point))
+        points = [Point(i, -i, 'p%d' % i) for i in range(3)]
+
+        ss.add_many(points, scores=range(3))
+
+        self.assertEqual(ss.take(3), points)
+
+    def test_record_serializer_namedtuple_struct(self):
+        ser = RecordSerializer(Point, fmt='dd4s')
+        ss = self._make_ss(ser)
+        point = Point(1.5, -2.0, b'home')
+
+        ss.add(point)
+
+        self.assertEqual(ser.fields, ('x', 'y', 'label'))
+        self.assertEqual(ss.pop(), point)
+
+    @unittest.skipIf(dataclasses is None, 'requires dataclasses')
+    def test_record_serializer_dataclass(self):
+        Job = dataclasses.make_dataclass('Job', [('id', int), ('kind', str)])
+        ser = RecordSerializer(Job, schema_id=1)
+        ss = self._make_ss(ser)
+
+        ss.add_many([Job(1, 'a'), Job(2, 'b')], scores=[0, 1])
+
+        self.assertEqual(ser.dumps(Job(1, 'a')), '[1,1,"a"]')
+        self.assertEqual(ss.take(2), [Job(1, 'a'), Job(2, 'b')])
+
+
+class JsonSerializer(object):
+    loads = staticmethod(json.loads)
+    dumps = staticmethod(json.dumps)
+
+
+class TestCompressingSerializer(unittest.TestCase):
+
+    def setUp(self):
+        self.ss = SortedSet(
+            redis.Redis(),
+            self.__class__.__name__,
+            serializer=CompressingSerializer(JsonSerializer(), threshold=64),
+        )
+
+    def tearDown(self):
+        self.ss.clear()
+
+    def test_threshold(self):
+        small = {'a': 1}
+        large = {'a': 'x' * 1000}
+        ser = self.ss.serializer
+
+        self.assertEqual(ser.dumps(small)[:1], b'\x00')
+        self.assertEqual(ser.dumps(large)[:1], b'\x01')
+        self.assertTrue(len(ser.dumps(large)) < 100)
+
+        self.ss.add_many([small, large], scores=[0, 1])
+
+        self.assertTrue(large in self.ss)
+        self.assertEqual(self.ss.peek(position=1), large)
+        self.assertEqual(self.ss.take(2), [small, large])
+
+    def test_zdict(self):
+        zdict = b'"description": "lorem ipsum dolor sit amet"'
+        ser = CompressingSerializer(JsonSerializer(), threshold=0, zdict=zdict)
+        doc = {'description': 'lorem ipsum dolor sit amet'}
+
+        without_zdict = CompressingSerializer(JsonSerializer(), threshold=0)
+
+        self.assertTrue(len(ser.dumps(doc)) < len(without_zdict.dumps(doc)))
+        self.assertEqual(ser.loads(ser.dumps(doc)), doc)
+
+    def test_wraps_namedtuple_serializer(self):
+        self.ss.serializer = CompressingSerializer(
+            NamedtupleSerializer(DiscoTask), threshold=0)
+        dts = [DiscoTask(tiger='larry' * 20, woods=str(i)) for i in range(3)]
+
+        self.ss.add_many(dts, scores=range(3))
+
+        self.assertEqual(self.ss.take(3), dts)
+
+    def test_wraps_binary_serializer(self):
+        self.ss.serializer = CompressingSerializer(
+            StructSerializer('H' * 50), threshold=0)
+        record = tuple(range(200, 250))
+
+        self.ss.add(record)
+
+        self.assertEqual(self.ss.pop(), record)
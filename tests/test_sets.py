@@ -1,11 +1,14 @@
 
 import unittest
+import threading
 import time
 import json
 import redis
 
-from redset import SortedSet, TimeSortedSet, ScheduledSet
+from redset import SortedSet, TimeSortedSet, ScheduledSet, pop_any
 from redset.interfaces import Serializer
+from redset.metrics import HistogramMetrics
+from redset.sets import NX, XX, GT, LT, INSERTED, UPDATED, SKIPPED
 
 
 class SortedSetTest(unittest.TestCase):
@@ -111,6 +114,32 @@ class SortedSetTest(unittest.TestCase):
         self.assertTrue(self.ss.discard(0))
         self.assertFalse(self.ss.discard(0))
 
+    def test_discard_many(self):
+        self.ss.add_many(range(5), scores=range(5))
+
+        self.assertEquals(self.ss.discard_many([0, 2, 4, 7], chunk_size=3), 3)
+        self.assertEquals(self.ss.discard_many([0, 2]), 0)
+        self.assertEquals(self.ss.discard_many([]), 0)
+        self.assertEquals(self.ss.take(5), ['1', '3'])
+
+    def test_scores_many(self):
+        self.ss.add_many(['a', 'b'], scores=[1, 2.5])
+
+        self.assertEquals(
+            self.ss.scores_many(['b', 'z', 'a', 'b'], chunk_size=3),
+            [2.5, None, 1, 2.5],
+        )
+        self.assertEquals(
+            self.ss.contains_many(['z', 'a']),
+            [False, True],
+        )
+        self.assertEquals(self.ss.scores_many([]), [])
+
+    def test_scores_many_pipelined(self):
+        # as on servers without ZMSCORE
+        self.ss._redis_version = (6, 0, 0)
+        self.test_scores_many()
+
     def test_peek(self):
         with self.assertRaises(KeyError):
             self.ss.peek()
@@ -134,6 +163,80 @@ class SortedSetTest(unittest.TestCase):
                 '1',
             )
 
+    def test_add_many(self):
+        scores = self.ss.add_many(range(5), chunk_size=2)
+
+        self.assertEquals(scores, [0] * 5)
+        self.assertEquals(len(self.ss), 5)
+
+        self.assertEquals(
+            self.ss.add_many(['a', 'b', 0], scores=[3, 1, 2]),
+            [3, 1, 2],
+        )
+        self.assertEquals(len(self.ss), 7)
+        self.assertEquals(self.ss.score(0), 2)
+
+        self.assertEquals(self.ss.add_many([]), [])
+
+        with self.assertRaises(ValueError):
+            self.ss.add_many(['a', 'b'], scores=[1])
+
+    def test_add_many_serialized(self):
+        self.assertEquals(
+            self.ss.add_many(['a', 'b'], scores=[0, 1], serialized=True),
+            [0, 1],
+        )
+        self.assertEquals(self.ss.take(2), ['a', 'b'])
+
+        with self.assertRaises(ValueError):
+            self.ss.add_many(['a'], serialized=True)
+
+    def test_add_nx(self):
+        self.assertEquals(self.ss.add('a', 1, mode=NX), INSERTED)
+        self.assertEquals(self.ss.add('a', 2, mode=NX), SKIPPED)
+        self.assertEquals(self.ss.score('a'), 1)
+
+    def test_add_xx(self):
+        self.assertEquals(self.ss.add('a', 1, mode=XX), SKIPPED)
+        self.assertFalse('a' in self.ss)
+
+        self.ss.add('a', 1)
+        self.assertEquals(self.ss.add('a', 2, mode=XX), UPDATED)
+        self.assertEquals(self.ss.add('a', 2, mode=XX), SKIPPED)
+        self.assertEquals(self.ss.score('a'), 2)
+
+    def test_add_gt_lt(self):
+        self.assertEquals(self.ss.add('a', 5, mode=GT), INSERTED)
+        self.assertEquals(self.ss.add('a', 4, mode=GT), SKIPPED)
+        self.assertEquals(self.ss.add('a', 6, mode=GT), UPDATED)
+        self.assertEquals(self.ss.add('a', 7, mode=LT), SKIPPED)
+        self.assertEquals(self.ss.add('a', 3, mode=LT), UPDATED)
+        self.assertEquals(self.ss.score('a'), 3)
+
+    def test_add_many_mode(self):
+        self.ss.add('a', 5)
+
+        self.assertEquals(
+            self.ss.add_many(
+                ['a', 'b', 'a', 'b'], scores=[3, 4, 4, 2], mode=LT,
+                chunk_size=3),
+            [UPDATED, INSERTED, SKIPPED, UPDATED],
+        )
+        self.assertEquals(self.ss.score('a'), 3)
+        self.assertEquals(self.ss.score('b'), 2)
+        self.assertEquals(self.ss.add_many([], mode=LT), [])
+
+        with self.assertRaises(ValueError):
+            self.ss.add('a', 1, mode='first')
+
+    def test_add_mode_script(self):
+        # as on servers without ZADD GT and LT
+        self.ss._redis_version = (6, 0, 0)
+
+        self.test_add_xx()
+        self.ss.clear()
+        self.test_add_many_mode()
+
     def test_take(self):
         for i in range(5):
             self.ss.add(i)
@@ -163,6 +266,381 @@ class SortedSetTest(unittest.TestCase):
             [],
         )
 
+    def test_take_without_zpopmin(self):
+        # pretend we're talking to a server older than 5.0
+        self.ss._redis_version = (4, 0, 0)
+
+        for i in range(5):
+            self.ss.add(i, score=i)
+
+        self.assertEquals(['0', '1'], self.ss.take(2))
+        self.assertEquals(['2', '3', '4'], self.ss.take(100))
+        self.assertEquals(len(self.ss), 0)
+
+    def test_take_ordering(self):
+        for i in range(5):
+            self.ss.add(i, score=-i)
+
+        self.assertEquals(['4', '3'], self.ss.take(2))
+        self.assertEquals(len(self.ss), 3)
+
+    def test_blocking_pop(self):
+        self.ss.add(0)
+        self.assertEquals(self.ss.pop(block=True, timeout=1), '0')
+
+        with self.assertRaises(KeyError):
+            self.ss.pop(block=True, timeout=0.05)
+
+        adder = threading.Timer(0.05, self.ss.add, args=(1,))
+        adder.start()
+
+        self.assertEquals(self.ss.pop(block=True, timeout=5), '1')
+        adder.join()
+
+    def test_blocking_take(self):
+        self.assertEquals(self.ss.take(2, block=True, timeout=0.05), [])
+
+        for i in range(3):
+            self.ss.add(i, score=i)
+
+        self.assertEquals(self.ss.take(2, block=True, timeout=1), ['0', '1'])
+
+        adder = threading.Timer(
+            0.05, self.ss.add_many, args=(['a', 'b'],))
+        adder.start()
+
+        self.assertEquals(self.ss.take(5, block=True, timeout=5), ['2'])
+        self.assertEquals(
+            len(self.ss.take(5, block=True, timeout=5)) +
+            len(self.ss.take(5)),
+            2,
+        )
+        adder.join()
+
+    def test_pop_any(self):
+        other = SortedSet(self.ss.redis, self.key + '_other')
+
+        try:
+            with self.assertRaises(KeyError):
+                pop_any([self.ss, other], timeout=0.05)
+
+            other.add('hey')
+            self.assertEquals(
+                pop_any([self.ss, other], timeout=1),
+                (other, 'hey'),
+            )
+
+            self.ss.add('yo')
+            other.add('hey')
+            self.assertEquals(
+                pop_any([self.ss, other], timeout=1),
+                (self.ss, 'yo'),
+            )
+        finally:
+            other.clear()
+
+    def test_hash_tag(self):
+        tagged = SortedSet(self.ss.redis, self.key, hash_tag=True)
+
+        try:
+            self.assertEquals(tagged.name, '{%s}' % self.key)
+            self.assertEquals(tagged.lock.key, '{%s}__lock' % self.key)
+
+            tagged.add('a')
+            self.assertEquals(tagged.pop(), 'a')
+        finally:
+            tagged.clear()
+
+        self.assertEquals(
+            SortedSet(redis.Redis(), '{q}:tasks', hash_tag=True).name,
+            '{q}:tasks',
+        )
+        self.assertEquals(
+            SortedSet(redis.Redis(), '{}tasks', hash_tag=True).name,
+            '{{}tasks}',
+        )
+
+    def test_claim_and_ack(self):
+        self.ss.add_many(range(5), scores=range(5))
+
+        self.assertEquals(self.ss.claim(2, lease=10), ['0', '1'])
+        self.assertEquals(len(self.ss), 3)
+        self.assertEquals(self.ss.in_flight(), 2)
+
+        self.assertEquals(self.ss.ack(['0', '1', '2']), 2)
+        self.assertEquals(self.ss.in_flight(), 0)
+        self.assertEquals(len(self.ss), 3)
+
+        self.assertEquals(self.ss.claim(0, lease=10), [])
+
+    def test_nack(self):
+        self.ss.add_many(range(5), scores=range(5))
+        self.ss.claim(2, lease=10)
+
+        self.assertEquals(self.ss.nack(['0']), 1)
+        self.assertEquals(self.ss.score('0'), 0)
+        self.assertEquals(self.ss.nack(['0']), 0)
+
+        self.assertEquals(self.ss.nack(['1'], delay=0), 1)
+        self.assertTrue(self.ss.score('1') > 1)
+
+        self.assertEquals(self.ss.in_flight(), 0)
+        self.assertEquals(len(self.ss), 5)
+
+    def test_requeue_expired(self):
+        self.ss.add_many(range(5), scores=range(5))
+        self.ss.claim(2, lease=-1)
+        self.ss.claim(2, lease=10)
+
+        self.assertEquals(self.ss.requeue_expired(), 2)
+        self.assertEquals(self.ss.in_flight(), 2)
+        self.assertEquals(self.ss.take(3), ['0', '1', '4'])
+
+    def test_clear_claims(self):
+        self.ss.add(0)
+        self.ss.claim(1, lease=10)
+
+        self.assertTrue(self.ss.clear())
+        self.assertEquals(self.ss.in_flight(), 0)
+
+    def test_iter_items(self):
+        self.assertEquals(list(self.ss.iter_items()), [])
+
+        self.ss.add_many(range(7), scores=range(7))
+
+        self.assertEquals(
+            list(self.ss.iter_items(page_size=3)),
+            [str(i) for i in range(7)],
+        )
+        self.assertEquals(
+            list(self.ss.iter_items(with_scores=True, page_size=7))[-1],
+            ('6', 6),
+        )
+        self.assertEquals(len(self.ss), 7)
+
+    def test_iter_range(self):
+        self.ss.add_many(range(10), scores=[0, 1, 1, 1, 1, 1, 2, 3, 4, 5])
+
+        res = list(self.ss.iter_range(with_scores=True, page_size=2))
+
+        # items sharing a score may come in any order
+        self.assertEquals(sorted(res, key=lambda pair: pair[1]), res)
+        self.assertEquals(
+            sorted(item for item, __ in res),
+            [str(i) for i in range(10)],
+        )
+        self.assertEquals(
+            sorted(self.ss.iter_range(1, '(3', page_size=3)),
+            [str(i) for i in range(1, 7)],
+        )
+        self.assertEquals(list(self.ss.iter_range(6, 7)), [])
+
+    def test_iter_range_while_adding(self):
+        self.ss.add_many(range(6), scores=range(6))
+
+        seen = []
+
+        for item in self.ss.iter_range(page_size=2):
+            seen.append(item)
+
+            if item == '2':
+                # shifts every item after it along by one
+                self.ss.add('new', -1)
+
+        self.assertEquals(seen, [str(i) for i in range(6)])
+
+    def test_peek_many(self):
+        self.assertEquals(self.ss.peek_many(3), [])
+
+        self.ss.add_many(range(5), scores=range(5))
+
+        self.assertEquals(self.ss.peek_many(2), [('0', 0), ('1', 1)])
+        self.assertEquals(
+            self.ss.peek_many(10, with_scores=False),
+            [str(i) for i in range(5)],
+        )
+        self.assertEquals(self.ss.peek_many(0), [])
+        self.assertEquals(len(self.ss), 5)
+
+    def test_items_between(self):
+        self.ss.add_many(range(10), scores=range(10))
+
+        self.assertEquals(self.ss.items_between(2, 4), ['2', '3', '4'])
+        self.assertEquals(
+            self.ss.items_between('(2', '+inf', limit=2, with_scores=True),
+            [('3', 3), ('4', 4)],
+        )
+        self.assertEquals(self.ss.items_between(2, 4, limit=0), [])
+        self.assertEquals(self.ss.items_between(20, 30), [])
+
+    def test_count_between(self):
+        self.ss.add_many(range(10), scores=range(10))
+
+        self.assertEquals(self.ss.count_between(2, 4), 3)
+        self.assertEquals(self.ss.count_between('-inf', '(5'), 5)
+
+    def test_remove_between(self):
+        self.ss.add_many(range(10), scores=range(10))
+        self.ss.claim(1, lease=10)
+
+        self.assertEquals(self.ss.remove_between(0, 4), 4)
+        self.assertEquals(self.ss.remove_between(0, 4), 0)
+        self.assertEquals(self.ss.take(10), [str(i) for i in range(5, 10)])
+        self.assertEquals(self.ss.in_flight(), 1)
+
+
+class OffloadedSortedSetTest(SortedSetTest):
+
+    def setUp(self):
+        self.key = 'offloaded_ss_test'
+        self.ss = SortedSet(redis.Redis(), self.key, offload=True)
+
+    # equal scores are ordered by content id, so these use distinct scores
+
+    def test_peek(self):
+        self.ss.add_many(range(2), scores=range(2))
+
+        self.assertEquals(self.ss.peek(position=1), '1')
+
+        with self.assertRaises(KeyError):
+            self.ss.peek(position=2)
+
+    def test_take(self):
+        self.ss.add_many(range(5), scores=range(5))
+
+        self.assertEquals(self.ss.take(2), ['0', '1'])
+        self.assertEquals(self.ss.take(5), ['2', '3', '4'])
+
+    def test_blocking_pop(self):
+        self.ss.add(0)
+
+        with self.assertRaises(TypeError):
+            self.ss.pop(block=True, timeout=0.05)
+
+        self.assertEquals(len(self.ss), 1)
+
+    def test_blocking_take(self):
+        self.ss.add(0)
+
+        with self.assertRaises(TypeError):
+            self.ss.take(1, block=True, timeout=0.05)
+
+        self.assertEquals(len(self.ss), 1)
+
+    def test_pop_any(self):
+        other = SortedSet(self.ss.redis, self.key + '_other')
+
+        with self.assertRaises(TypeError):
+            pop_any([other, self.ss], timeout=0.05)
+
+    def test_offloaded_storage(self):
+        self.ss.add('x' * 1000, 1)
+
+        member = self.ss.redis.zrange(self.key, 0, 0)[0]
+        self.assertTrue(len(member) < 1000)
+        self.assertEquals(
+            self.ss.redis.hget(self.ss.bodies_key, member),
+            b'x' * 1000,
+        )
+
+        self.assertEquals(self.ss.peek(), 'x' * 1000)
+        self.assertEquals(self.ss.score('x' * 1000), 1)
+        self.assertEquals(self.ss.take(2), ['x' * 1000])
+        self.assertEquals(self.ss.redis.hlen(self.ss.bodies_key), 0)
+
+    def test_add_mode_bodies(self):
+        self.assertEquals(self.ss.add('a', 1, mode=XX), SKIPPED)
+        self.assertEquals(self.ss.redis.hlen(self.ss.bodies_key), 0)
+
+        self.assertEquals(self.ss.add('a', 1, mode=NX), INSERTED)
+        self.assertEquals(self.ss.take(1), ['a'])
+
+    def test_bodies_removed(self):
+        self.ss.add_many(range(6), scores=range(6))
+
+        self.ss.pop()
+        self.ss.take(1)
+        self.ss.discard('2')
+        self.ss.claim(2, lease=10)
+        self.ss.ack(['3'])
+
+        # '4' is still claimed and '5' is still queued
+        self.assertEquals(self.ss.redis.hlen(self.ss.bodies_key), 2)
+        self.assertEquals(self.ss.nack(['4']), 1)
+        self.assertEquals(self.ss.take(2), ['4', '5'])
+        self.assertEquals(self.ss.redis.hlen(self.ss.bodies_key), 0)
+
+    def test_claimed_item_readded(self):
+        self.ss.add('a')
+        self.ss.claim(1, lease=10)
+        self.ss.add('a')
+
+        # acking the claim keeps the body of the queued copy
+        self.assertEquals(self.ss.ack(['a']), 1)
+        self.assertEquals(self.ss.pop(), 'a')
+
+    def test_missing_body(self):
+        self.ss.add_many(['a', 'b'], scores=[0, 1])
+        self.ss.redis.hdel(self.ss.bodies_key, self.ss._member('a'))
+
+        self.assertEquals(self.ss.take(2), ['b'])
+
+    def test_peek_missing_body(self):
+        self.ss.add_many(['a', 'b'], scores=[0, 1])
+        self.ss.redis.hdel(self.ss.bodies_key, self.ss._member('a'))
+
+        with self.assertRaises(KeyError):
+            self.ss.peek()
+
+        self.assertEquals(self.ss.peek(position=1), 'b')
+
+    def test_remove_between_bodies(self):
+        self.ss.add_many(range(3), scores=range(3))
+        self.ss.claim(1, lease=10)
+
+        self.assertEquals(self.ss.remove_between(0, 1), 1)
+        self.assertEquals(self.ss.redis.hlen(self.ss.bodies_key), 2)
+
+    def test_clear_claims(self):
+        super(OffloadedSortedSetTest, self).test_clear_claims()
+        self.assertFalse(self.ss.redis.exists(self.ss.bodies_key))
+
+
+class MeasuredSortedSetTest(SortedSetTest):
+    """
+    Rerun with metrics, which wrap the set's client to count round trips.
+
+    """
+
+    def setUp(self):
+        self.key = 'measured_ss_test'
+        self.ss = SortedSet(
+            redis.Redis(), self.key, metrics=HistogramMetrics())
+
+
+class MeasuredOffloadedSortedSetTest(OffloadedSortedSetTest):
+
+    def setUp(self):
+        self.key = 'measured_offloaded_ss_test'
+        self.ss = SortedSet(
+            redis.Redis(), self.key, offload=True, metrics=HistogramMetrics())
+
+    def test_discard_many_cold_script_cache(self):
+        self.ss.add_many(['a', 'b', 'c'], scores=[1, 2, 3])
+        self.ss.redis.script_flush()
+
+        self.assertEquals(self.ss.discard_many(['a', 'b', 'z']), 2)
+        self.assertEquals(self.ss.take(3), ['c'])
+        self.assertEquals(self.ss.redis.hlen(self.ss.bodies_key), 0)
+
+    def test_add_mode_cold_script_cache(self):
+        self.ss.redis.script_flush()
+
+        self.assertEquals(self.ss.add('c', 5, mode=NX), INSERTED)
+        self.assertEquals(self.ss.add_many(['c', 'd'], [1, 6], mode=NX),
+                          [SKIPPED, INSERTED])
+        self.assertEquals(self.ss.take(2), ['c', 'd'])
+
 
 class SerializerTest(unittest.TestCase):
 
@@ -221,6 +699,13 @@ class SerializerTest(unittest.TestCase):
             len(self.ss),
         )
 
+    def test_claim_cant_deserialize(self):
+        self.ss.add({'yo': 'foo'}, score=0)
+        self.ss.add({'yo': 'uhoh!'}, score=1)
+
+        self.assertEquals(self.ss.claim(2, lease=10), [{'yo': 'foo'}])
+        self.assertEquals(self.ss.in_flight(), 1)
+
     def test_cant_deserialize(self):
         self.ss.add({'yo': 'foo'}, score=0)
         self.ss.add({'yo': 'uhoh!'}, score=1)
@@ -232,6 +717,56 @@ class SerializerTest(unittest.TestCase):
              {'yo': 'hey'}],
         )
 
+    def test_batch_serializer(self):
+        calls = []
+
+        class BatchSerializer(object):
+            loads = int
+            dumps = str
+
+            def loads_many(self, strs):
+                calls.append(('loads_many', len(strs)))
+                return [int(s) for s in strs]
+
+            def dumps_many(self, items):
+                calls.append(('dumps_many', len(items)))
+                return [str(i) for i in items]
+
+        ss = SortedSet(
+            redis.Redis(), self.key + '3', serializer=BatchSerializer(),
+        )
+
+        try:
+            ss.add_many(range(5), scores=range(5))
+            self.assertEqual(ss.take(3), [0, 1, 2])
+            self.assertEqual(ss.pop(), 3)
+        finally:
+            ss.clear()
+
+        self.assertEqual(
+            calls,
+            [('dumps_many', 5), ('loads_many', 3), ('loads_many', 1)],
+        )
+
+    def test_batch_serializer_miscount(self):
+        class SplittingSerializer(object):
+            loads = str
+            dumps = str
+
+            def loads_many(self, strs):
+                # like joining members with commas, then splitting
+                return ','.join(strs).split(',')
+
+        ss = SortedSet(
+            redis.Redis(), self.key + '3', serializer=SplittingSerializer(),
+        )
+
+        try:
+            ss.add_many(['a,b', 'c'], scores=[0, 1])
+            self.assertEqual(ss.take(2), ['a,b', 'c'])
+        finally:
+            ss.clear()
+
     def test_bad_serializer(self):
         self.ss2.add(1, score=0)
         self.ss2.add(2, score=1)
@@ -486,6 +1021,83 @@ class ScheduledSetTest(unittest.TestCase):
             [],
         )
 
+    def test_take_ignores_lock(self):
+        self.ss.add('1', self.now)
+
+        with self.ss.lock:
+            self.assertEquals(self.ss.take(1), ['1'])
+
+    def test_take_many(self):
+        num_items = 2500
+        self.ss.add_many(range(num_items), scores=[self.now] * num_items)
+
+        self.assertEquals(len(self.ss.take(num_items)), num_items)
+        self.assertEquals(len(self.ss), 0)
+
+    def test_blocking_pop(self):
+        self.ss.add('1', time.time() + 0.05)
+
+        with self.assertRaises(KeyError):
+            self.ss.pop()
+
+        self.assertEquals(self.ss.pop(block=True, timeout=5), '1')
+
+        with self.assertRaises(KeyError):
+            self.ss.pop(block=True, timeout=0.05)
+
+        with self.assertRaises(TypeError):
+            pop_any([self.ss], timeout=0.05)
+
+    def test_wait_and_take(self):
+        self.assertEquals(self.ss.wait_and_take(2, max_wait=0.05), [])
+
+        self.ss.add('1', self.now)
+        self.ss.add('2', time.time() + 1000)
+        self.assertEquals(self.ss.wait_and_take(2, max_wait=1), ['1'])
+
+        started = time.time()
+        self.ss.add('3', started + 0.1)
+        self.assertEquals(self.ss.wait_and_take(2, max_wait=5), ['3'])
+        self.assertTrue(time.time() - started >= 0.1)
+
+        self.assertEquals(self.ss.wait_and_take(0), [])
+
+    def test_wait_and_take_subscribes_only_to_wait(self):
+        subscribers = []
+        pubsub = self.ss.redis.pubsub
+
+        def counted_pubsub(**kwargs):
+            subscribers.append(kwargs)
+            return pubsub(**kwargs)
+
+        self.ss.redis.pubsub = counted_pubsub
+        self.ss.add('1', self.now)
+
+        self.assertEquals(self.ss.wait_and_take(1, max_wait=5), ['1'])
+        self.assertEquals(len(subscribers), 0)
+
+        self.assertEquals(self.ss.wait_and_take(1, max_wait=0.05), [])
+        self.assertEquals(len(subscribers), 1)
+
+    def test_wait_and_take_woken_by_add(self):
+        self.ss.add('later', time.time() + 1000)
+
+        adder = threading.Timer(0.05, self.ss.add, args=('now',))
+        adder.start()
+
+        started = time.time()
+        self.assertEquals(self.ss.wait_and_take(1, max_wait=5), ['now'])
+        self.assertTrue(time.time() - started < 1)
+        adder.join()
+
+    def test_claim(self):
+        self.ss.add('1', self.now)
+        self.ss.add('2', self.now + 1000)
+
+        self.assertEquals(self.ss.claim(2, lease=10), ['1'])
+        self.assertEquals(self.ss.nack(['1'], delay=1000), 1)
+        self.assertEquals(self.ss.available(), 0)
+
     def test_length(self):
         for i in range(2):
             self.ss.add(i, self.now + 50)
@@ -498,6 +1110,22 @@ class ScheduledSetTest(unittest.TestCase):
             5,
         )
 
+    def test_add_many(self):
+        self.ss.add_many(
+            ['1', '2', '3'],
+            scores=[self.now - 1, self.now + 1000, self.now - 2],
+            chunk_size=1,
+        )
+
+        self.assertEquals(len(self.ss), 3)
+        self.assertEquals(self.ss.take(3), ['3', '1'])
+
+    def test_add_many_default_scores(self):
+        scores = self.ss.add_many(['1', '2'])
+
+        self.assertEquals(len(scores), 2)
+        self.assertTrue(all(score <= time.time() for score in scores))
+
     def test_length_available(self):
         for i in range(2):
             self.ss.add(i, self.now + 50)
@@ -581,3 +1209,35 @@ class ScheduledSetTest(unittest.TestCase):
             int(self.now - 1),
             int(self.ss.peek_score()),
         )
+
+    def test_iter_range(self):
+        self.ss.add_many(
+            range(3), scores=[self.now - 1, self.now, self.now + 1000])
+
+        # iterating includes items that aren't due yet
+        self.assertEquals(
+            list(self.ss.iter_range(page_size=1)),
+            ['0', '1', '2'],
+        )
+        self.assertEquals(
+            list(self.ss.iter_range(max_score=time.time())),
+            ['0', '1'],
+        )
+
+    def test_peek_many(self):
+        self.ss.add_many(
+            range(3), scores=[self.now - 1, self.now, self.now + 1000])
+
+        self.assertEquals(
+            self.ss.peek_many(3, with_scores=False),
+            ['0', '1'],
+        )
+
+
+class OffloadedScheduledSetTest(ScheduledSetTest):
+
+    def setUp(self):
+        self.key = 'offloaded_scheduled_set_test'
+        self.now = time.time() - 1
+
+        self.ss = ScheduledSet(redis.Redis(), self.key, offload=True)
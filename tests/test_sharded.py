@@ -0,0 +1,115 @@
+import json
+import unittest
+import time
+import redis
+
+from redset import ShardedSortedSet, ShardedScheduledSet
+
+
+class ShardedSortedSetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.key = 'sharded_ss_test'
+        self.ss = ShardedSortedSet(
+            [redis.Redis(), redis.Redis()], self.key, num_shards=4,
+        )
+
+    def tearDown(self):
+        self.ss.clear()
+
+    def test_repr(self):
+        str(self.ss)
+
+    def test_shards(self):
+        self.assertEqual(
+            [shard.name for shard in self.ss.shards],
+            ['%s__shard%d' % (self.key, i) for i in range(4)],
+        )
+
+        self.ss.add_many(range(100))
+
+        self.assertEqual(len(self.ss), 100)
+        self.assertTrue(
+            all(len(shard) for shard in self.ss.shards),
+            "items should be spread over every shard",
+        )
+
+    def test_add_and_lookup(self):
+        self.assertEqual(self.ss.add('a', score=3), 3)
+        self.assertEqual(self.ss.add_many(['b', 'c'], scores=[1, 2]), [1, 2])
+
+        self.assertTrue('a' in self.ss)
+        self.assertFalse('z' in self.ss)
+        self.assertEqual(self.ss.score('b'), 1)
+        self.assertEqual(self.ss.peek_score(), 1)
+
+        self.assertTrue(self.ss.discard('a'))
+        self.assertFalse(self.ss.discard('a'))
+        self.assertEqual(len(self.ss), 2)
+
+    def test_many_lookups(self):
+        self.ss.add_many(range(20), scores=range(1, 21))
+
+        self.assertEqual(
+            self.ss.scores_many([5, 50, 0, 19]),
+            [6, None, 1, 20],
+        )
+        self.assertEqual(
+            self.ss.contains_many([50, 0]),
+            [False, True],
+        )
+        self.assertEqual(self.ss.discard_many(range(10, 30)), 10)
+        self.assertEqual(len(self.ss), 10)
+
+    def test_take_ordering(self):
+        self.ss.add_many(range(20), scores=range(1, 21))
+
+        self.assertEqual(
+            self.ss.take(5),
+            [str(i) for i in range(5)],
+        )
+        self.assertEqual(self.ss.pop(), '5')
+        self.assertEqual(
+            self.ss.take(100),
+            [str(i) for i in range(6, 20)],
+        )
+
+        with self.assertRaises(KeyError):
+            self.ss.pop()
+
+        self.assertEqual(self.ss.take(0), [])
+
+    def test_take_skips_bad_items(self):
+        ss = ShardedSortedSet(
+            [redis.Redis()], self.key, num_shards=2, serializer=json)
+        ss.add_many(range(10), scores=range(1, 11))
+        shard = ss._shard_for(0)
+        shard.redis.zadd(shard.name, 'not json', 0.5)
+
+        self.assertEqual(ss.take(11), list(range(10)))
+
+
+class ShardedScheduledSetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.key = 'sharded_scheduled_set_test'
+        self.now = time.time() - 1
+        self.ss = ShardedScheduledSet(redis.Redis(), self.key, num_shards=3)
+
+    def tearDown(self):
+        self.ss.clear()
+
+    def test_schedule(self):
+        self.ss.add_many(
+            range(10),
+            scores=[self.now - i for i in range(5)] +
+                   [self.now + 1000] * 5,
+        )
+
+        self.assertEqual(len(self.ss), 10)
+        self.assertEqual(self.ss.available(), 5)
+        self.assertEqual(
+            self.ss.take(10),
+            [str(i) for i in reversed(range(5))],
+        )
+        self.assertEqual(self.ss.take(10), [])